@@ -0,0 +1,101 @@
+"""
+Recall-vs-latency benchmark for the FAISS index types in embedding.build_index.
+
+Uses a synthetic clustered embedding set by default, or real vectors from a
+.npy file or an EmbeddingCache vectors file. Ground truth comes from an exact
+flat index; each configuration reports build time, index size, recall@k and
+per-query latency across its accuracy knob (nprobe / efSearch).
+
+Usage:
+    python benchmarks/bench_ann.py [--n 100000] [--dim 256] [--metric cosine]
+    python benchmarks/bench_ann.py --vectors embeddings.npy
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embedding import build_index, prepare_vectors, save_index, set_search_params  # noqa: E402
+
+CONFIGS = [
+    ("flat", {}, [{}]),
+    ("ivf_flat", {}, [{"nprobe": p} for p in (1, 4, 16, 64)]),
+    ("ivf_pq", {}, [{"nprobe": p} for p in (4, 16, 64)]),
+    ("hnsw", {"hnsw_m": 32}, [{"ef_search": ef} for ef in (16, 64, 256)]),
+]
+
+
+def synthetic_embeddings(n: int, dim: int, clusters: int = 200, seed: int = 0) -> np.ndarray:
+    """Clustered Gaussian vectors, closer to real text embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+    labels = rng.integers(0, clusters, n)
+    return centers[labels] + 0.3 * rng.standard_normal((n, dim), dtype=np.float32)
+
+
+def load_vectors(path: str, dim: int | None) -> np.ndarray:
+    if path.endswith(".npy"):
+        return np.load(path).astype(np.float32)
+    if dim is None:
+        sys.exit("--dim is required for raw float32 vector files")
+    return np.fromfile(path, dtype=np.float32).reshape(-1, dim)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--n", type=int, default=50000, help="Synthetic corpus size")
+    arg_parser.add_argument("--dim", type=int, default=256)
+    arg_parser.add_argument("--vectors", help=".npy file or raw float32 file (e.g. an EmbeddingCache vectors file)")
+    arg_parser.add_argument("--metric", default="cosine", choices=["l2", "ip", "cosine"])
+    arg_parser.add_argument("--queries", type=int, default=500)
+    arg_parser.add_argument("--k", type=int, default=10)
+    args = arg_parser.parse_args()
+
+    vectors = load_vectors(args.vectors, args.dim) if args.vectors else synthetic_embeddings(args.n, args.dim)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), args.queries, replace=False)]
+    queries = prepare_vectors(queries + 0.05 * rng.standard_normal(queries.shape, dtype=np.float32), args.metric)
+
+    exact = build_index(vectors, "flat", args.metric)
+    _, truth = exact.search(queries, args.k)
+
+    print(f"{len(vectors)} vectors x {vectors.shape[1]}d, {args.queries} queries, metric={args.metric}, k={args.k}")
+    print(f"{'index':<10}{'params':<16}{'build s':>9}{'size MB':>9}{'recall':>8}{'ms/query':>10}{'batch QPS':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for index_type, build_kwargs, search_grid in CONFIGS:
+            start = time.perf_counter()
+            index = build_index(vectors, index_type, args.metric, **build_kwargs)
+            build_time = time.perf_counter() - start
+            path = os.path.join(tmp, f"{index_type}.faiss")
+            save_index(index, path)
+            size_mb = os.path.getsize(path) / 1e6
+
+            for params in search_grid:
+                set_search_params(index, **params)
+                start = time.perf_counter()
+                for q in queries[:100]:
+                    index.search(q[None, :], args.k)
+                single_ms = (time.perf_counter() - start) / min(100, len(queries)) * 1000
+                start = time.perf_counter()
+                _, found = index.search(queries, args.k)
+                batch_qps = len(queries) / (time.perf_counter() - start)
+                label = ",".join(f"{k}={v}" for k, v in params.items()) or "-"
+                print(
+                    f"{index_type:<10}{label:<16}{build_time:9.2f}{size_mb:9.1f}"
+                    f"{recall_at_k(found, truth):8.3f}{single_ms:10.3f}{batch_qps:11.0f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
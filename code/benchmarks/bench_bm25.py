@@ -0,0 +1,130 @@
+"""
+Benchmark the BM25 index and lexical prefiltering of vector search.
+
+Reports BM25 build time, memory and on-disk size, then per-query latency of
+BM25 search, full vector search, vector search restricted to BM25 candidates,
+and reciprocal rank fusion of the two. Uses the chunk files in --chunks-dir
+(e.g. chunks/) or synthetic wiki-like chunks, with FakeEmbedder vectors.
+
+Usage:
+    python benchmarks/bench_bm25.py [--chunks 100000]
+    python benchmarks/bench_bm25.py --chunks-dir chunks
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bm25 import BM25Index, reciprocal_rank_fusion  # noqa: E402
+from embedding import FakeEmbedder, iter_chunk_files  # noqa: E402
+from vector_store import VectorStore  # noqa: E402
+
+MATERIALS = ["Wooden", "Stone", "Iron", "Golden", "Diamond", "Netherite"]
+ITEMS = ["Pickaxe", "Sword", "Axe", "Shovel", "Hoe", "Helmet", "Chestplate", "Leggings", "Boots"]
+ENCHANTMENTS = ["Smite", "Sharpness", "Efficiency", "Fortune", "Unbreaking", "Protection", "Looting"]
+SECTIONS = ["Obtaining", "Usage", "Crafting", "Repairing", "Enchantments", "History", "Trivia"]
+FILLER = "the a block can be used to mine break craft repair with in from when by player mob drop item".split()
+
+
+def synthetic_chunks(count: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    chunks = []
+    for i in range(count):
+        title = f"{rng.choice(MATERIALS)} {rng.choice(ITEMS)} {i // 20}"
+        section = rng.choice(SECTIONS)
+        words = [rng.choice(FILLER) for _ in range(rng.randint(20, 120))]
+        words[rng.randrange(len(words))] = f"{rng.choice(ENCHANTMENTS)} {rng.choice(['I', 'II', 'III', 'IV', 'V'])}"
+        chunks.append(
+            {
+                "text": f"[{title} | {section}]\n{' '.join(words)}",
+                "metadata": {
+                    "title": title,
+                    "url": f"https://minecraft.wiki/w/{title.replace(' ', '_')}",
+                    "section": section,
+                    "content_type": "paragraph",
+                },
+            }
+        )
+    return chunks
+
+
+def time_per_query(func, queries) -> float:
+    start = time.perf_counter()
+    for i, query in enumerate(queries):
+        func(i, query)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--chunks", type=int, default=100000, help="Number of synthetic chunks")
+    arg_parser.add_argument("--chunks-dir", help="Folder of chunk files to index instead")
+    arg_parser.add_argument("--dim", type=int, default=256)
+    arg_parser.add_argument("--queries", type=int, default=200)
+    arg_parser.add_argument("--k", type=int, default=10)
+    arg_parser.add_argument("--candidates", type=int, default=1000, help="BM25 candidates for prefiltered search")
+    args = arg_parser.parse_args()
+
+    chunks = list(iter_chunk_files(args.chunks_dir)) if args.chunks_dir else synthetic_chunks(args.chunks)
+    rng = random.Random(1)
+    questions = [
+        f"how do I get {rng.choice(ENCHANTMENTS)} {rng.choice(['I', 'II', 'V'])} on a {rng.choice(MATERIALS)} {rng.choice(ITEMS)}"
+        for _ in range(args.queries)
+    ]
+    embedder = FakeEmbedder(args.dim)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with VectorStore(tmp) as store:
+            store.build(chunks, embedder.embed([chunk["text"] for chunk in chunks]))
+            store.save()
+
+        with VectorStore(tmp, read_only=True) as store:
+            start = time.perf_counter()
+            lexical = BM25Index()
+            lexical.sync(store)
+            build_time = time.perf_counter() - start
+            # Measure memory on a second build, since tracing slows the build down several times
+            tracemalloc.start()
+            traced = BM25Index()
+            traced.sync(store)
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del traced
+            path = os.path.join(tmp, "lexical.npz")
+            lexical.save(path)
+            start = time.perf_counter()
+            BM25Index.load(path)
+            load_time = time.perf_counter() - start
+            print(
+                f"BM25 over {len(lexical)} chunks, {len(lexical.postings)} terms: built in {build_time:.2f}s, "
+                f"{memory / 1e6:.1f} MB in memory, {os.path.getsize(path) / 1e6:.1f} MB on disk, loads in {load_time:.2f}s"
+            )
+
+            query_vectors = embedder.embed(questions)
+            lexical_hits = [[chunk_id for chunk_id, _ in lexical.search(q, args.candidates)] for q in questions]
+            vector_hits = store.search(query_vectors, args.k)
+            print(f"{'stage':<34}{'ms/query':>10}")
+            for label, func in (
+                ("bm25 search", lambda i, q: lexical.search(q, args.k)),
+                (f"bm25 top {args.candidates} candidates", lambda i, q: lexical.search(q, args.candidates)),
+                ("vector search (full index)", lambda i, q: store.search(query_vectors[i : i + 1], args.k)),
+                (
+                    "vector search (bm25 prefilter)",
+                    lambda i, q: store.search(query_vectors[i : i + 1], args.k, candidates=[lexical_hits[i]]),
+                ),
+                (
+                    "rrf fusion",
+                    lambda i, q: reciprocal_rank_fusion([[h["id"] for h in vector_hits[i]], lexical_hits[i][:50]]),
+                ),
+            ):
+                print(f"{label:<34}{time_per_query(func, questions):10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Measure the memory a loaded chunk corpus takes as chunk dicts and as a ChunkTable.
+
+Chunk files are loaded both ways from the same folder: as the list of ChunkType
+dicts iter_chunk_files yields, and with ChunkTable.from_folder. For each this
+reports bytes per chunk (tracemalloc, everything the load kept alive) and the
+time to load and to read every text back. It checks that the table converts
+back to exactly the dicts it was loaded from. Without --chunks-dir, synthetic
+pages (see bench_load_and_chunk.py) are chunked first.
+
+Usage:
+    python benchmarks/bench_chunk_memory.py [--pages 5000]
+    python benchmarks/bench_chunk_memory.py --chunks-dir chunks
+"""
+
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_load_and_chunk import write_synthetic_pages  # noqa: E402
+from chunk_table import ChunkTable  # noqa: E402
+from embedding import iter_chunk_files  # noqa: E402
+from main import load_and_chunk  # noqa: E402
+
+
+def measure(load) -> tuple[object, int, float]:
+    """Return (what `load` returned, bytes still allocated for it, seconds taken)."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = load()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size, elapsed
+
+
+def read_time(texts) -> float:
+    start = time.perf_counter()
+    for _ in texts:
+        pass
+    return time.perf_counter() - start
+
+
+def report(folder: str) -> None:
+    chunks, dict_bytes, dict_load = measure(lambda: list(iter_chunk_files(folder)))
+    (table, _), table_bytes, table_load = measure(lambda: ChunkTable.from_folder(folder))
+    if not chunks:
+        sys.exit(f"No chunks in {folder}")
+    if table.to_chunks() != chunks:
+        sys.exit("ChunkTable did not round-trip the chunk files")
+
+    count = len(chunks)
+    text_bytes = sum(len(chunk["text"].encode("utf-8")) for chunk in chunks)
+    print(
+        f"{count} chunks, {text_bytes / count:.0f} bytes of UTF-8 text each; "
+        f"{len(table.pages)} pages, {len(table.sections)} sections interned"
+    )
+    print(f"{'':<12}{'bytes/chunk':>12}{'total MB':>10}{'load s':>8}{'read texts s':>14}")
+    for name, size, load, read in (
+        ("dicts", dict_bytes, dict_load, read_time(chunk["text"] for chunk in chunks)),
+        ("ChunkTable", table_bytes, table_load, read_time(table.texts())),
+    ):
+        print(f"{name:<12}{size / count:12.0f}{size / 1e6:10.1f}{load:8.2f}{read:14.2f}")
+    print(f"ChunkTable uses {table_bytes / dict_bytes:.0%} of the memory; round trip to ChunkType is exact")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--pages", type=int, default=5000, help="Number of synthetic pages to chunk")
+    arg_parser.add_argument("--chunks-dir", help="Existing folder of chunk files to measure instead")
+    args = arg_parser.parse_args()
+
+    if args.chunks_dir:
+        report(args.chunks_dir)
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        json_dir, chunk_dir = os.path.join(tmp, "json"), os.path.join(tmp, "chunks")
+        os.makedirs(json_dir)
+        write_synthetic_pages(json_dir, args.pages)
+        load_and_chunk(json_dir, chunk_dir)
+        report(chunk_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Compare the token-aware splitter in chunking.chunk_page with the old character splitter.
+
+The old splitter re-summed the line buffer on every line (quadratic in the lines
+of each piece), measured characters and dropped the header from continuation
+chunks. For growing table sizes this reports split time, chunk count, total
+tokens sent to the embedding model and the largest chunk in tokens.
+
+It then chunks a set of pages that share most rows of a breaking calculator
+table, and reports what chunk dedupe (dedup.py) leaves to embed.
+
+Usage:
+    python benchmarks/bench_chunking.py [--rows 1000 10000 50000] [--max-tokens 256] [--pages 200]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chunking import TOKEN_MODEL, chunk_page  # noqa: E402
+from dedup import dedupe_chunks  # noqa: E402
+from tokens import count_tokens  # noqa: E402
+
+
+def legacy_split(chunks: list[dict], max_length: int) -> list[dict]:
+    """The splitting loop chunk_page used before it became token-aware."""
+    final_chunks = []
+    for chunk in chunks:
+        text = chunk["text"]
+        if len(text) > max_length:
+            lines = text.split("\n")
+            buffer = []
+            for line in lines:
+                buffer.append(line)
+                if sum(len(l) for l in buffer) > max_length:
+                    final_chunks.append({**chunk, "text": "\n".join(buffer)})
+                    buffer = []
+            if buffer:
+                final_chunks.append({**chunk, "text": "\n".join(buffer)})
+        else:
+            final_chunks.append(chunk)
+    return final_chunks
+
+
+def report(label: str, chunks: list[dict], elapsed: float) -> None:
+    tokens = [count_tokens(chunk["text"], TOKEN_MODEL) for chunk in chunks]
+    with_header = sum(chunk["text"].startswith("[") for chunk in chunks)
+    print(
+        f"  {label:<10} {elapsed * 1000:9.1f} ms  {len(chunks):6} chunks  {sum(tokens):9} tokens  "
+        f"max {max(tokens):5} tokens  {with_header / len(chunks):5.0%} with header"
+    )
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 50000])
+    arg_parser.add_argument("--max-tokens", type=int, default=256)
+    arg_parser.add_argument("--max-length", type=int, default=512, help="Character limit of the old splitter")
+    arg_parser.add_argument("--pages", type=int, default=200, help="Pages sharing a breaking table")
+    args = arg_parser.parse_args()
+
+    for rows in args.rows:
+        table = [["Version", "Java Edition change"]] + [
+            [f"1.{i}", f"Changed the texture of block {i}; it now drops {i % 7} items when mined."] for i in range(rows)
+        ]
+        content = [{"type": "table", "section": "History", "data": table}]
+        print(f"table with {rows} rows:")
+
+        start = time.perf_counter()
+        unsplit = chunk_page("Stone", "https://minecraft.wiki/w/Stone", content, max_tokens=10**12)
+        legacy = legacy_split(unsplit, args.max_length)
+        report("old", legacy, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        chunks = chunk_page("Stone", "https://minecraft.wiki/w/Stone", content, max_tokens=args.max_tokens)
+        report("new", chunks, time.perf_counter() - start)
+
+    # Each page lists the same tool tiers for 40 shared blocks plus a few rows of its own
+    shared = [[f"Block {i}", f"{i % 5}.5", "Pickaxe", "7.5", "1.15", "0.4"] for i in range(40)]
+    pages = [
+        [
+            {
+                "type": "calculator_table",
+                "section": "Breaking",
+                "data": [["Block", "Hardness", "Tool", "Default", "Wooden", "Diamond"]]
+                + shared
+                + [[f"Page {p} block {i}", "1.0", "Axe", "1.5", "0.75", "0.2"] for i in range(5)],
+                "parameters": {},
+                "legend_type": "breaking_table",
+            }
+        ]
+        for p in range(args.pages)
+    ]
+    print(f"{args.pages} pages sharing a 40-row breaking table:")
+    start = time.perf_counter()
+    chunks = [
+        chunk
+        for p, content in enumerate(pages)
+        for chunk in chunk_page(f"Page {p}", f"https://minecraft.wiki/w/Page_{p}", content)
+    ]
+    report("chunked", chunks, time.perf_counter() - start)
+    start = time.perf_counter()
+    canonical, _ = dedupe_chunks(chunks)
+    report("deduped", [chunk for i, chunk in enumerate(chunks) if canonical[i] == i], time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
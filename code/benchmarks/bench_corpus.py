@@ -0,0 +1,97 @@
+"""
+Compare the packed corpus store against the per-file JSON layout.
+
+Reports disk usage, full-corpus load time and random-access lookup time for
+json/-style page files versus a CorpusStore built from them.
+
+Usage:
+    python benchmarks/bench_corpus.py               # synthetic pages
+    python benchmarks/bench_corpus.py --source json
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_load_and_chunk import write_synthetic_pages  # noqa: E402
+from corpus import CorpusStore, import_page_folder  # noqa: E402
+
+
+def disk_usage(paths: list[str]) -> tuple[int, int]:
+    """Return (apparent bytes, allocated bytes) for the given files."""
+    apparent = allocated = 0
+    for path in paths:
+        st = os.stat(path)
+        apparent += st.st_size
+        allocated += st.st_blocks * 512
+    return apparent, allocated
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--source", help="Existing folder of page JSON (default: generate synthetic pages)")
+    arg_parser.add_argument("--pages", type=int, default=5000, help="Number of synthetic pages to generate")
+    arg_parser.add_argument("--lookups", type=int, default=1000, help="Random lookups to time")
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = args.source
+        if source is None:
+            source = os.path.join(tmp, "json")
+            os.makedirs(source)
+            write_synthetic_pages(source, args.pages)
+        files = [os.path.join(source, f) for f in os.listdir(source) if f.endswith(".json")]
+
+        store_path = os.path.join(tmp, "corpus", "pages.jsonl")
+        start = time.perf_counter()
+        with CorpusStore(store_path) as store:
+            import_page_folder(source, store)
+        import_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        titles = []
+        for filename in os.listdir(source):
+            if filename.endswith(".json"):
+                with open(os.path.join(source, filename), "r", encoding="utf-8") as f:
+                    titles.append(json.load(f)["title"])
+        files_load = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with CorpusStore(store_path) as store:
+            count = sum(1 for _ in store)
+        store_load = time.perf_counter() - start
+
+        sample = random.Random(0).sample(titles, min(args.lookups, len(titles)))
+        start = time.perf_counter()
+        for title in sample:
+            with open(os.path.join(source, f"{title}.json"), "r", encoding="utf-8") as f:
+                json.load(f)
+        files_lookup = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with CorpusStore(store_path) as store:
+            open_time = time.perf_counter() - start
+            for title in sample:
+                store.get_by_title(title)
+        store_lookup = time.perf_counter() - start
+
+        files_size = disk_usage(files)
+        store_size = disk_usage([store_path, store_path + ".idx"])
+
+    mb = 1 / 1e6
+    print(f"{count} pages (import took {import_time:.2f}s)")
+    print(f"{'':22}{'per-file':>12}{'packed':>12}")
+    print(f"{'disk (apparent MB)':22}{files_size[0] * mb:12.1f}{store_size[0] * mb:12.1f}")
+    print(f"{'disk (allocated MB)':22}{files_size[1] * mb:12.1f}{store_size[1] * mb:12.1f}")
+    print(f"{'full load (s)':22}{files_load:12.2f}{store_load:12.2f}")
+    print(f"{len(sample)} lookups (ms):{'':7}{files_lookup * 1000:12.1f}{store_lookup * 1000:12.1f}  (store open {open_time * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark near-duplicate chunk detection on a synthetic corpus with known duplicates.
+
+Pages get unique paragraphs plus boilerplate shared across pages: navbox-style
+lists copied verbatim and history tables copied with a small edit. Reports
+detection time, duplicates found against the planted ones, and the embedding
+tokens and flat-index bytes saved. With --chunks-dir, reports on real chunks.
+
+Usage:
+    python benchmarks/bench_dedup.py [--pages 2000] [--threshold 0.8]
+    python benchmarks/bench_dedup.py --chunks-dir chunks
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedup import THRESHOLD, dedupe_chunks  # noqa: E402
+from embedding import iter_chunk_files  # noqa: E402
+
+WORDS = (
+    "block item mob biome craft smelt mine drop spawn light redstone water lava stone iron gold diamond "
+    "emerald pickaxe shovel axe hoe sword nether end overworld village chest furnace table enchant brew"
+).split()
+
+
+def synthetic_corpus(pages: int, seed: int = 0) -> tuple[list[dict], int]:
+    """Return (chunks, number of planted duplicates)."""
+    rng = random.Random(seed)
+    navboxes = [
+        "\n".join(f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {j}" for j in range(30)) for _ in range(20)
+    ]
+    histories = [
+        "\n".join(f"1.{j} | {' '.join(rng.choices(WORDS, k=12))}" for j in range(15)) for _ in range(50)
+    ]
+    chunks, planted = [], 0
+    seen_navboxes, seen_histories = set(), set()
+    for p in range(pages):
+        title = f"Page {p}"
+
+        def chunk(section: str, text: str) -> dict:
+            metadata = {"title": title, "url": f"https://minecraft.wiki/w/Page_{p}", "section": section, "content_type": "list"}
+            return {"text": f"[{title} | {section}]\n{text}", "metadata": metadata}
+
+        for s in range(3):
+            chunks.append(chunk(f"Section {s}", " ".join(rng.choices(WORDS, k=80)) + f" page {p} section {s}"))
+        navbox = rng.randrange(len(navboxes))
+        planted += navbox in seen_navboxes
+        seen_navboxes.add(navbox)
+        chunks.append(chunk("Navigation", navboxes[navbox]))
+        history = rng.randrange(len(histories))
+        planted += history in seen_histories
+        seen_histories.add(history)
+        lines = histories[history].split("\n")
+        lines[rng.randrange(len(lines))] += " (edited)"  # A near-duplicate, not an exact one
+        chunks.append(chunk("History", "\n".join(lines)))
+    return chunks, planted
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--pages", type=int, default=2000)
+    arg_parser.add_argument("--chunks-dir", help="Folder of chunk files to analyse instead")
+    arg_parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    arg_parser.add_argument("--dimension", type=int, default=1536, help="Embedding dimension for the index size estimate")
+    args = arg_parser.parse_args()
+
+    if args.chunks_dir:
+        chunks, planted = list(iter_chunk_files(args.chunks_dir)), None
+    else:
+        chunks, planted = synthetic_corpus(args.pages)
+
+    start = time.perf_counter()
+    _, report = dedupe_chunks(chunks, args.threshold)
+    elapsed = time.perf_counter() - start
+    duplicates = report["chunks"] - report["unique"]
+    print(
+        f"{report['chunks']} chunks in {elapsed:.2f}s ({report['chunks'] / elapsed:.0f} chunks/s): "
+        f"{duplicates} duplicates ({report['exact_duplicates']} exact, {report['near_duplicates']} near)"
+        + (f", {planted} planted" if planted is not None else "")
+    )
+    print(
+        f"saved {report['tokens_saved']}/{report['tokens']} embedding tokens "
+        f"({report['tokens_saved'] / max(1, report['tokens']):.0%}), "
+        f"{duplicates * args.dimension * 4 / 1e6:.1f} MB of {args.dimension}-d float32 vectors"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Benchmark the batched embedding pipeline with the deterministic FakeEmbedder.
+
+A simulated per-request latency stands in for the network, so the effect of
+token-budgeted batching and request concurrency can be measured offline.
+
+Usage:
+    python benchmarks/bench_embedding.py [--texts N] [--latency S] [--concurrency 1 4 8]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embedding import FakeEmbedder, embed_batched  # noqa: E402
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--texts", type=int, default=20000)
+    arg_parser.add_argument("--latency", type=float, default=0.2, help="Simulated seconds per request")
+    arg_parser.add_argument("--batch-tokens", type=int, default=20000, help="Token budget per request")
+    arg_parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    args = arg_parser.parse_args()
+
+    texts = [f"[Block {i} | Introduction]\nBlock {i} is a block found in the Overworld. " * 3 for i in range(args.texts)]
+    embedder = FakeEmbedder(latency=args.latency)
+    embedder.max_batch_tokens = args.batch_tokens
+
+    reference = None
+    for concurrency in args.concurrency:
+        start = time.perf_counter()
+        matrix = embed_batched(texts, embedder, max_concurrency=concurrency)
+        elapsed = time.perf_counter() - start
+        if reference is None:
+            reference = matrix
+        same = (matrix == reference).all()
+        print(
+            f"concurrency={concurrency}: {len(texts)} texts in {elapsed:.2f}s "
+            f"({len(texts) / elapsed:.0f} texts/s, {matrix.dtype}{matrix.shape}, identical={same})"
+        )
+
+
+if __name__ == "__main__":
+    main()
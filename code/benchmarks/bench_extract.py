@@ -0,0 +1,110 @@
+"""
+Benchmark MinecraftWikiParser._extract on large calculator and droptable pages.
+
+Synthetic pages grow a breaking calculator (sliders plus radio groups, every
+field labelled) and a droptable tabber (many tables of drop rows) to each
+--sizes value. The tree is built once per page, so the times are extraction
+alone; ms per field / per row staying flat as pages grow means extraction is
+linear in widget size. With --html-dir, the --top saved pages with the most
+calculator fields and droptable rows are timed instead.
+
+Usage:
+    python benchmarks/bench_extract.py [--sizes 50 200 800] [--repeat 5]
+    python benchmarks/bench_extract.py --html-dir html [--top 5]
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from parser import MinecraftWikiParser, content_strainer, default_backend  # noqa: E402
+
+
+def page(body: str) -> str:
+    return f'<h1 id="firstHeading">Synthetic</h1><div class="mw-parser-output"><h2>Obtaining</h2>{body}</div>'
+
+
+def calculator_page(fields: int) -> str:
+    """A calculator with `fields` sliders and `fields` radios (in groups of 10), each with its label."""
+    sliders = "".join(
+        f'<span class="calculator-field-label" data-for="s{i}">Slider {i}</span>'
+        f'<span class="calculator-field" id="s{i}" data-calculator-type="range" data-calculator-min="0" '
+        f'data-calculator-max="5" data-calculator-datalist="0;1;2;3;4;5"></span>'
+        for i in range(fields)
+    )
+    groups = "".join(
+        f'<div role="radiogroup" aria-label="Group {g}">'
+        + "".join(
+            f'<span class="calculator-field-label" data-for="r{g}-{i}">Option {i}</span>'
+            f'<span class="calculator-field" id="r{g}-{i}" data-calculator-type="radio"></span>'
+            for i in range(10)
+        )
+        + "</div>"
+        for g in range(max(1, fields // 10))
+    )
+    rows = "".join(f"<tr><td>Block {i}</td><td>{i / 10}</td><td>{i}</td></tr>" for i in range(fields))
+    table = f"<table><tr><th>Block</th><th>Hardness</th><th>Wooden</th></tr>{rows}</table>"
+    return page(f'<div class="calculator-container"><div class="calculator-controls">{sliders}{groups}</div>{table}</div>')
+
+
+def droptable_page(rows: int) -> str:
+    """A droptable tabber of `rows` drop rows, in tables of 10."""
+    tables = "".join(
+        '<div class="tabber-tab"><table><tr><th>Item</th><th>Roll chance</th><th>Quantity</th></tr>'
+        + "".join(f'<tr><td><a title="Item {t}-{i}"></a></td><td>{i}%</td><td>1–{i}</td></tr>' for i in range(10))
+        + "</table></div>"
+        for t in range(max(1, rows // 10))
+    )
+    return page(f'<div class="droptable-tabber">{tables}</div>')
+
+
+def time_extract(html: str, backend: str, repeat: int) -> float:
+    """Best-of-`repeat` milliseconds for _extract on an already built tree."""
+    soup = BeautifulSoup(html, backend, parse_only=content_strainer())
+    parser = MinecraftWikiParser.from_dict({"title": None, "url": "", "content": None})
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parser._extract(soup)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 800], help="Fields / drop rows per page")
+    arg_parser.add_argument("--html-dir", help="Folder of saved page HTML to pick the largest pages from")
+    arg_parser.add_argument("--top", type=int, default=5, help="Pages timed from --html-dir")
+    arg_parser.add_argument("--backend", default=default_backend())
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    print(f"_extract ms (best of {args.repeat}, {args.backend}):")
+    if args.html_dir:
+        pages = []
+        for path in glob.glob(os.path.join(args.html_dir, "*.html")):
+            with open(path, "r", encoding="utf-8") as f:
+                html = f.read()
+            size = html.count("calculator-field") + html.count("<tr")  # fields and table rows
+            pages.append((size, os.path.basename(path), html))
+        if not pages:
+            sys.exit(f"No .html files in {args.html_dir}")
+        for size, name, html in sorted(pages, reverse=True)[: args.top]:
+            print(f"  {name:<40}{time_extract(html, args.backend, args.repeat):8.2f}  ({size} fields + rows)")
+        return
+
+    print(f"  {'size':>6}{'calculator':>12}{'per field':>11}{'droptable':>11}{'per row':>9}")
+    for size in args.sizes:
+        calculator = time_extract(calculator_page(size), args.backend, args.repeat)
+        droptable = time_extract(droptable_page(size), args.backend, args.repeat)
+        print(f"  {size:>6}{calculator:12.2f}{calculator / (2 * size):11.4f}{droptable:11.2f}{droptable / size:9.4f}")
+
+
+if __name__ == "__main__":
+    main()
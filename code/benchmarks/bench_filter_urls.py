@@ -0,0 +1,62 @@
+"""
+Micro-benchmark crawler.filter_urls on output/minecraft_urls_all.txt.
+
+Compares the original `any(keyword in url ...)` loop with the compiled UrlFilter
+and checks both keep exactly the same URLs.
+
+Usage:
+    python benchmarks/bench_filter_urls.py [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crawler import NAMESPACE_BLACKLIST, URL_BLACKLIST, UrlFilter  # noqa: E402
+
+URLS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "output", "minecraft_urls_all.txt")
+
+
+def naive_filter(urls: list[str], blacklist: list[str]) -> list[str]:
+    return [url for url in urls if not any(keyword in url for keyword in blacklist)]
+
+
+def best_of(repeat: int, func) -> tuple[float, list[str]]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    with open(URLS_FILE, "r", encoding="utf-8") as f:
+        urls = [line.strip() for line in f if line.strip()]
+
+    naive_time, naive_kept = best_of(args.repeat, lambda: naive_filter(urls, URL_BLACKLIST + NAMESPACE_BLACKLIST))
+    url_filter = None
+
+    def compiled():
+        nonlocal url_filter
+        url_filter = UrlFilter(URL_BLACKLIST, NAMESPACE_BLACKLIST)
+        return list(url_filter.filter(urls))
+
+    compiled_time, compiled_kept = best_of(args.repeat, compiled)
+
+    print(f"{len(urls)} URLs, {len(compiled_kept)} kept")
+    print(f"naive any():  {naive_time * 1000:8.1f} ms")
+    print(f"UrlFilter:    {compiled_time * 1000:8.1f} ms  ({naive_time / compiled_time:.1f}x)")
+    print(f"identical output: {naive_kept == compiled_kept}")
+    print("top rules:", ", ".join(f"{rule}={count}" for rule, count in url_filter.rejected.most_common(5)))
+
+
+if __name__ == "__main__":
+    main()
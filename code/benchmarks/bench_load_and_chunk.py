@@ -0,0 +1,71 @@
+"""
+Benchmark main.load_and_chunk throughput on a directory of cached page JSON.
+
+Usage:
+    python benchmarks/bench_load_and_chunk.py              # synthetic pages
+    python benchmarks/bench_load_and_chunk.py --source json
+    python benchmarks/bench_load_and_chunk.py --workers 1 2 4 8   # scaling with cores
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import load_and_chunk  # noqa: E402
+
+
+def write_synthetic_pages(folder: str, count: int) -> None:
+    """Write `count` cached page JSON files shaped like MinecraftWikiParser.save_to_file output."""
+    for i in range(count):
+        title = f"Block {i}"
+        page = {
+            "title": title,
+            "url": f"https://minecraft.wiki/w/Block_{i}",
+            "content": [
+                {"type": "infobox", "section": "Introduction", "data": {"Rarity": "Common", "Tool": "Pickaxe"}},
+                {"type": "paragraph", "section": "Introduction", "text": f"{title} is a block. " * 20},
+                {"type": "list", "section": "Obtaining", "items": [f"Source {j}" for j in range(10)]},
+                {
+                    "type": "table",
+                    "section": "History",
+                    "data": [["Version", "Change"]] + [[f"1.{j}", f"Changed thing {j}"] for j in range(30)],
+                },
+            ],
+        }
+        with open(os.path.join(folder, f"{title}.json"), "w", encoding="utf-8") as f:
+            json.dump(page, f, ensure_ascii=False, indent=2)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--source", help="Existing folder of cached page JSON (default: generate synthetic pages)")
+    arg_parser.add_argument("--pages", type=int, default=2000, help="Number of synthetic pages to generate")
+    arg_parser.add_argument("--workers", type=int, nargs="+", default=[1], help="Worker counts to compare")
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = args.source
+        if source is None:
+            source = os.path.join(tmp, "json")
+            os.makedirs(source)
+            write_synthetic_pages(source, args.pages)
+
+        baseline = None
+        for workers in args.workers:
+            start = time.perf_counter()
+            count = load_and_chunk(source, os.path.join(tmp, f"chunks_{workers}"), workers=workers)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(
+                f"load_and_chunk (workers={workers}): {count} pages in {elapsed:.2f}s "
+                f"({count / elapsed:.0f} pages/s, {baseline / elapsed:.2f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Golden-output check and per-page parse-time benchmark for MinecraftWikiParser backends.
+
+Every saved HTML fixture in benchmarks/fixtures is parsed with each installed
+backend in parser.PARSER_BACKENDS; the extracted ContentBlocks must equal the
+fixture's .expected.json exactly. Parse time per page is reported per backend,
+next to the original full-page "html.parser" tree for reference. With --archive,
+pages come from an HTML archive (see html_archive.py) instead, for timings on a
+fixed snapshot of the wiki; those pages have no golden outputs. The golden
+comparison also runs under pytest (tests/test_parser.py).
+
+Usage:
+    python benchmarks/bench_parse.py [--html-dir DIR] [--repeat N] [--update]
+    python benchmarks/bench_parse.py --archive html_archive [--limit 500]
+
+Exits non-zero if any backend's output differs from the golden output.
+"""
+
+import argparse
+import glob
+import importlib.util
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from html_archive import HtmlArchive  # noqa: E402
+from parser import PARSER_BACKENDS, MinecraftWikiParser  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def installed_backends() -> list[str]:
+    return [b for b in PARSER_BACKENDS if b == "html.parser" or importlib.util.find_spec(b) is not None]
+
+
+def parse_full_tree(url: str, html: str) -> MinecraftWikiParser:
+    """Parse the way the parser originally did: one html.parser tree for the whole page."""
+    parser = MinecraftWikiParser.from_dict({"title": None, "url": url, "content": None})
+    soup = BeautifulSoup(html, "html.parser")
+    parser.title = soup.find("h1", {"id": "firstHeading"}).get_text()
+    parser._extract(soup)
+    return parser
+
+
+def time_per_page(func, pages: list[tuple[str, str]], repeat: int) -> float:
+    """Best-of-`repeat` average milliseconds per page."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for url, html in pages:
+            func(url, html)
+        best = min(best, time.perf_counter() - start)
+    return best / len(pages) * 1000
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--html-dir", default=FIXTURES_DIR, help="Folder of saved page HTML (default: fixtures)")
+    arg_parser.add_argument("--archive", help="HTML archive folder to take pages from instead")
+    arg_parser.add_argument("--limit", type=int, help="Pages taken from --archive (default all)")
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--update", action="store_true", help="Rewrite golden outputs using html.parser")
+    args = arg_parser.parse_args()
+
+    pages = []
+    if args.archive:
+        with HtmlArchive(args.archive) as archive:
+            for url, html in archive:
+                if args.limit is not None and len(pages) >= args.limit:
+                    break
+                pages.append((url, url, html))  # No golden output path
+        if not pages:
+            sys.exit(f"No pages in the archive at {args.archive}")
+    else:
+        for path in sorted(glob.glob(os.path.join(args.html_dir, "*.html"))):
+            name = os.path.splitext(os.path.basename(path))[0]
+            with open(path, "r", encoding="utf-8") as f:
+                pages.append((path, f"https://minecraft.wiki/w/{name}", f.read()))
+        if not pages:
+            sys.exit(f"No .html files in {args.html_dir}")
+
+    failures = 0
+    for path, url, html in pages if not args.archive else ():
+        golden_path = path[: -len(".html")] + ".expected.json"
+        if args.update:
+            parser = MinecraftWikiParser(url, html=html, backend="html.parser")
+            with open(golden_path, "w", encoding="utf-8") as f:
+                json.dump({"title": parser.title, "url": url, "content": parser.content}, f, indent=2, ensure_ascii=False)
+            continue
+        if not os.path.exists(golden_path):
+            continue
+        with open(golden_path, "r", encoding="utf-8") as f:
+            golden = json.load(f)
+        for backend in installed_backends():
+            parser = MinecraftWikiParser(url, html=html, backend=backend)
+            if parser.title != golden["title"] or parser.content != golden["content"]:
+                failures += 1
+                print(f"MISMATCH {os.path.basename(path)} [{backend}]")
+
+    url_html = [(url, html) for _, url, html in pages]
+    print(f"{len(pages)} pages, ms/page (best of {args.repeat}):")
+    print(f"  {'html.parser (full tree)':<26}{time_per_page(parse_full_tree, url_html, args.repeat):8.2f}")
+    for backend in installed_backends():
+        ms = time_per_page(lambda url, html: MinecraftWikiParser(url, html=html, backend=backend), url_html, args.repeat)
+        print(f"  {backend + ' (content only)':<26}{ms:8.2f}")
+
+    if failures:
+        sys.exit(f"{failures} golden-output mismatches")
+    print("golden outputs: not checked (archive pages)" if args.archive else "golden outputs: all backends identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Load-test the retrieval HTTP server with the deterministic FakeEmbedder.
+
+Builds a throwaway vector store of synthetic chunks, serves it on a free local
+port and fires questions from concurrent keep-alive clients. A simulated
+per-request embedding latency stands in for the network, so the effect of
+micro-batching and the LRU caches can be measured offline.
+
+Usage:
+    python benchmarks/bench_retrieval.py [--chunks 50000] [--clients 16] [--requests 4000]
+    python benchmarks/bench_retrieval.py --repeat 0.5 --latency 0.02
+"""
+
+import argparse
+import http.client
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embedding import FakeEmbedder  # noqa: E402
+from retrieval import Retriever, make_server  # noqa: E402
+from vector_store import VectorStore  # noqa: E402
+
+CONFIGS = [
+    ("no batching, no cache", {"max_batch_size": 1, "cache_size": 0}),
+    ("batching, no cache", {"cache_size": 0}),
+    ("batching + cache", {}),
+]
+
+
+def build_store(folder: str, count: int, embedder: FakeEmbedder, index_type: str) -> None:
+    chunks = [
+        {
+            "text": f"[Block {i // 10} | Section {i % 10}]\nBlock {i // 10} is a block found in biome {i % 37}.",
+            "metadata": {
+                "title": f"Block {i // 10}",
+                "url": f"https://minecraft.wiki/w/Block_{i // 10}",
+                "section": f"Section {i % 10}",
+                "content_type": "paragraph",
+            },
+        }
+        for i in range(count)
+    ]
+    with VectorStore(folder, index_type=index_type) as store:
+        store.build(chunks, embedder.embed([chunk["text"] for chunk in chunks]))
+        store.save()
+
+
+def run_clients(port: int, questions: list[str], clients: int, k: int) -> list[float]:
+    latencies: list[float] = []
+    lock = threading.Lock()
+    shares = [questions[i::clients] for i in range(clients)]
+
+    def client(share: list[str]) -> None:
+        connection = http.client.HTTPConnection("127.0.0.1", port)
+        local = []
+        for question in share:
+            start = time.perf_counter()
+            connection.request("GET", "/search?" + urlencode({"q": question, "k": k}))
+            response = connection.getresponse()
+            body = response.read()
+            local.append(time.perf_counter() - start)
+            if response.status != 200:
+                raise RuntimeError(f"HTTP {response.status}: {body[:200]}")
+        connection.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(share,)) for share in shares]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--chunks", type=int, default=50000)
+    arg_parser.add_argument("--dim", type=int, default=256)
+    arg_parser.add_argument("--index-type", default="flat", choices=["flat", "ivf_flat", "ivf_pq", "hnsw"])
+    arg_parser.add_argument("--clients", type=int, default=16)
+    arg_parser.add_argument("--requests", type=int, default=4000)
+    arg_parser.add_argument("--repeat", type=float, default=0.3, help="Fraction of questions that repeat earlier ones")
+    arg_parser.add_argument("--latency", type=float, default=0.01, help="Simulated seconds per embedding request")
+    arg_parser.add_argument("--k", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    rng = random.Random(0)
+    questions = []
+    for i in range(args.requests):
+        if questions and rng.random() < args.repeat:
+            questions.append(rng.choice(questions))
+        else:
+            questions.append(f"where do I find block {rng.randrange(args.chunks // 10)} (question {i})")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        build_store(tmp, args.chunks, FakeEmbedder(args.dim), args.index_type)
+        print(
+            f"{args.chunks} chunks ({args.index_type}, {args.dim}d), {args.requests} requests from {args.clients} clients, "
+            f"{args.repeat:.0%} repeats, {args.latency * 1000:.0f} ms embedding latency"
+        )
+        for label, kwargs in CONFIGS:
+            embedder = FakeEmbedder(args.dim, latency=args.latency)
+            with VectorStore(tmp, read_only=True) as store, Retriever(store, embedder, **kwargs) as retriever:
+                server = make_server(retriever, port=0)
+                threading.Thread(target=server.serve_forever, daemon=True).start()
+                start = time.perf_counter()
+                latencies = np.array(run_clients(server.server_port, questions, args.clients, args.k)) * 1000
+                elapsed = time.perf_counter() - start
+                server.shutdown()
+                server.server_close()
+                stats = retriever.stats()
+            print(
+                f"{label:<24} p50 {np.percentile(latencies, 50):7.2f} ms  p99 {np.percentile(latencies, 99):7.2f} ms  "
+                f"{len(latencies) / elapsed:7.0f} QPS  mean batch {stats['mean_batch_size']:5.1f}  "
+                f"cache hits {stats['result_cache_hits']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Measure the import time of each entry point module, as `python -X importtime` reports it.
+
+Each module is imported in a fresh interpreter, several times, from an empty
+working directory. For every module this reports the median import time, the
+median wall time of the whole process over a bare `python -c pass`, which heavy
+third-party packages were loaded, and the slowest imports it pulled in. It also
+flags import-time side effects: files created in the working directory or the
+code folder (e.g. a log file).
+
+Usage:
+    python benchmarks/bench_startup.py [--repeat 5] [--top 3] [--modules main retrieval]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+CODE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTRY_POINTS = [
+    "blocks",
+    "chunking",
+    "parser",
+    "crawler",
+    "main",
+    "dedup",
+    "embedding",
+    "vector_store",
+    "retrieval",
+    "pipeline",
+]
+
+HEAVY_PACKAGES = ["numpy", "faiss", "openai", "bs4", "lxml", "requests", "dotenv", "tiktoken"]
+
+
+def import_profile(module: str | None, cwd: str) -> tuple[float, float, dict[str, tuple[int, int]]]:
+    """
+    Import `module` (nothing if None) in a new interpreter.
+
+    Returns:
+        tuple: (import ms, wall ms, {module imported: (self us, cumulative us)}).
+    """
+    env = {**os.environ, "PYTHONPATH": CODE_DIR, "PYTHONDONTWRITEBYTECODE": "1"}
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}" if module else "pass"],
+        cwd=cwd,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    wall = (time.perf_counter() - start) * 1000
+    imports = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        imports[name.strip()] = (int(self_us), int(cumulative_us))
+    return (imports[module][1] / 1000 if module else 0.0), wall, imports
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--modules", nargs="+", default=ENTRY_POINTS)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--top", type=int, default=3, help="Slowest nested imports listed per module")
+    args = arg_parser.parse_args()
+
+    code_files = set(os.listdir(CODE_DIR))
+    with tempfile.TemporaryDirectory() as cwd:
+        bare = [import_profile(None, cwd) for _ in range(args.repeat)]
+        baseline = statistics.median(run[1] for run in bare)
+        startup_modules = set(bare[-1][2])  # imported by the interpreter itself (site, encodings, ...)
+        print(f"bare interpreter: {baseline:.0f} ms\n")
+        print(f"{'module':<14}{'import ms':>10}{'+wall ms':>10}  heavy packages loaded / slowest imports")
+        for module in args.modules:
+            runs = [import_profile(module, cwd) for _ in range(args.repeat)]
+            import_ms = statistics.median(run[0] for run in runs)
+            wall_ms = statistics.median(run[1] for run in runs) - baseline
+            imports = runs[-1][2]
+            heavy = [package for package in HEAVY_PACKAGES if package in imports]
+            nested = sorted(
+                (cumulative, name)
+                for name, (_, cumulative) in imports.items()
+                if name != module and "." not in name and name not in startup_modules
+            )[::-1][: args.top]
+            slowest = ", ".join(f"{name} {cumulative / 1000:.0f}" for cumulative, name in nested)
+            print(f"{module:<14}{import_ms:10.1f}{wall_ms:10.1f}  [{', '.join(heavy) or '-'}] {slowest}")
+
+        created = sorted(set(os.listdir(cwd)))
+        created += sorted(f"code/{name}" for name in set(os.listdir(CODE_DIR)) - code_files)
+        print(f"\nfiles created by importing: {', '.join(created) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+End-to-end pipeline benchmark on a synthetic wiki, checked against a stored baseline.
+
+For each corpus size, a WikiStub (see synthetic_wiki.py) serves that many
+MediaWiki-style pages, sitemaps and robots.txt over local HTTP, and the
+pipeline runs one stage at a time: crawl (sitemaps, robots.txt and the URL
+filter), parse (fetch and _extract), chunk (chunk_page), embed (FakeEmbedder
+through the embedding cache) and index (dedupe, FAISS and BM25). Each stage
+runs in its own process and reads the previous stage's output from disk. For
+every stage this reports items per second (URLs for crawl, pages otherwise)
+and peak resident memory: the larger of the stage process and its worker
+processes. Nothing leaves the machine, so runs are repeatable.
+
+With --baseline, a stage is flagged when its throughput drops, or its peak
+memory grows, by more than --tolerance against the stored run of the same
+size, and the exit status is 1. --save-baseline stores this run's results,
+replacing those of the same sizes. Baselines only compare on the same machine.
+
+Usage:
+    python benchmarks/bench_suite.py                          # 1k, 10k and 100k pages
+    python benchmarks/bench_suite.py --sizes 1000 --save-baseline
+    python benchmarks/bench_suite.py --sizes 1000 --baseline
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import get_context
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_wiki import WikiStub  # noqa: E402
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+BASELINE_FILE = os.path.join(BENCHMARKS_DIR, "baseline.json")
+
+SIZES = (1_000, 10_000, 100_000)  # pages
+
+STAGES = ("crawl", "parse", "chunk", "embed", "index")
+
+TOLERANCE = 0.2  # fraction throughput may drop, or peak memory grow, before a stage is flagged
+
+DIMENSION = 64  # FakeEmbedder vector size
+
+RATE = 1e6  # requests per second; the stub's robots.txt sets no Crawl-delay
+
+
+def run_stage(stage: str, work_dir: str, sitemap_url: str, robots_url: str, parse_workers: int | None) -> dict:
+    """Run one pipeline stage in this (fresh) process and return its throughput and peak memory."""
+    # Imported here so that every stage process pays for, and measures, only its own imports
+    from crawler import iter_page_urls
+    from embedding import FakeEmbedder
+    from http_client import HttpClient
+    from metrics import configure_logging
+    from pipeline import Pipeline
+
+    configure_logging(os.path.join(work_dir, "pipeline.log"), filemode="a")
+    pipeline = Pipeline(
+        work_dir=work_dir,
+        cache_dir=os.path.join(work_dir, "embedding_cache"),
+        embedder=FakeEmbedder(DIMENSION),
+        crawl=partial(iter_page_urls, sitemap_url=sitemap_url, robots_url=robots_url),
+        metrics_path=os.path.join(work_dir, f"metrics-{stage}.json"),
+        client=HttpClient(),  # No HTTP cache: every page is really fetched
+        robots_url=robots_url,
+        rate=RATE,
+        parse_workers=parse_workers,
+    )
+    start = time.perf_counter()
+    counts = pipeline.run([stage], fresh=True)
+    seconds = time.perf_counter() - start
+    items = counts[stage] if stage in counts else len(os.listdir(pipeline.chunk_dir))
+    peak_kb = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    )
+    return {"items": items, "seconds": seconds, "items_per_s": items / seconds, "peak_rss_mb": peak_kb / 1024}
+
+
+def run_size(pages: int, parse_workers: int | None) -> dict[str, dict]:
+    results = {}
+    with WikiStub(pages) as stub, tempfile.TemporaryDirectory() as work_dir:
+        for stage in STAGES:
+            # A new process per stage, so peak memory is the stage's own
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("fork")) as pool:
+                results[stage] = pool.submit(
+                    run_stage, stage, work_dir, stub.sitemap_url, stub.robots_url, parse_workers
+                ).result()
+    return results
+
+
+def compare(results: dict[str, dict], baseline: dict[str, dict], tolerance: float) -> tuple[dict[str, str], list[str]]:
+    """
+    Returns:
+        tuple: ({stage: change against the baseline, for display}, regression messages).
+    """
+    changes, regressions = {}, []
+    for stage, now in results.items():
+        before = baseline.get(stage)
+        if before is None:
+            continue
+        speed = now["items_per_s"] / before["items_per_s"] - 1
+        memory = now["peak_rss_mb"] / before["peak_rss_mb"] - 1
+        changes[stage] = f"{speed:+.0%} speed, {memory:+.0%} memory"
+        if speed < -tolerance:
+            regressions.append(f"{stage}: {-speed:.0%} slower")
+        if memory > tolerance:
+            regressions.append(f"{stage}: {memory:.0%} more peak memory")
+    return changes, regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="Corpus sizes, in pages")
+    arg_parser.add_argument("--parse-workers", type=int, help="Parser processes (defaults to CPU count)")
+    arg_parser.add_argument(
+        "--baseline", nargs="?", const=BASELINE_FILE, metavar="PATH", help=f"Compare with a stored run (default {BASELINE_FILE})"
+    )
+    arg_parser.add_argument("--save-baseline", nargs="?", const=BASELINE_FILE, metavar="PATH", help="Store this run")
+    arg_parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = arg_parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        if not os.path.exists(args.baseline):
+            sys.exit(f"No baseline at {args.baseline}; create one with --save-baseline")
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    all_results = {}
+    regressions = []
+    for pages in args.sizes:
+        results = all_results[str(pages)] = run_size(pages, args.parse_workers)
+        changes, size_regressions = compare(results, baseline.get(str(pages), {}), args.tolerance)
+        regressions += [f"{pages} pages, {message}" for message in size_regressions]
+        print(f"\n{pages} pages")
+        print(f"  {'stage':<8}{'items':>9}{'seconds':>10}{'items/s':>10}{'peak MB':>10}  vs baseline")
+        for stage, result in results.items():
+            print(
+                f"  {stage:<8}{result['items']:9d}{result['seconds']:10.2f}{result['items_per_s']:10.0f}"
+                f"{result['peak_rss_mb']:10.0f}  {changes.get(stage, '-')}"
+            )
+
+    if args.save_baseline:
+        stored = {}
+        if os.path.exists(args.save_baseline):
+            with open(args.save_baseline, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        stored.update(all_results)
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(stored, f, indent=2)
+        print(f"\nSaved baseline for {', '.join(all_results)} pages to {args.save_baseline}")
+
+    if regressions:
+        print("\nRegressions (tolerance {:.0%}):\n  ".format(args.tolerance) + "\n  ".join(regressions))
+        sys.exit(1)
+    if baseline:
+        print(f"\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
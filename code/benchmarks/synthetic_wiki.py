@@ -0,0 +1,325 @@
+"""
+Synthetic MediaWiki-style corpus and a local HTTP stub serving it, for benchmarks.
+
+Every page is generated on request from its number, so any corpus size costs
+no disk and the same page always has the same HTML. Pages are laid out like
+minecraft.wiki articles (h1#firstHeading, div.mw-parser-output inside the site
+chrome) and cover every block type the parser extracts: paragraphs, h2/h3/h4
+sections, nested lists, wikitables, infoboxes, droptable tabbers and
+calculator containers. As on the real wiki, some content repeats across pages:
+navboxes verbatim and breaking-table rows from a shared pool, so chunk dedupe
+has work to do.
+
+WikiStub serves robots.txt, a sitemap index, gzipped sitemaps and the pages
+over HTTP on localhost. The sitemaps also list URLs the crawler must drop:
+blacklisted titles, blacklisted namespaces, and paths robots.txt disallows.
+
+Usage (standalone, to browse or crawl by hand):
+    python benchmarks/synthetic_wiki.py [--pages 1000] [--port 8000]
+"""
+
+import argparse
+import gzip
+import html
+import multiprocessing
+import random
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    "block item mob biome craft smelt mine drop spawn light redstone water lava stone iron gold diamond "
+    "emerald pickaxe shovel axe hoe sword nether end overworld village chest furnace table enchant brew "
+    "obsidian beacon hopper piston observer comparator lantern torch ladder fence gate door slab stair"
+).split()
+
+TOOLS = ["Wooden", "Stone", "Iron", "Diamond", "Netherite", "Golden"]
+
+SITEMAP_SIZE = 10_000  # URLs per sitemap file
+
+LASTMOD = "2024-01-01T00:00:00Z"
+
+SITEMAP_XMLNS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+TITLE_PREFIX = "Synthetic_Block_"
+
+CHROME = (
+    '<div id="mw-navigation"><ul>'
+    + "".join(f'<li><a href="/w/Portal_{i}">Portal {i}</a></li>' for i in range(40))
+    + '</ul></div><div id="mw-head"><form action="/search"><input name="search"></form></div>'
+)
+
+
+def page_title(number: int) -> str:
+    return f"{TITLE_PREFIX}{number}"
+
+
+def sentence(rng: random.Random, words: int = 14) -> str:
+    text = " ".join(rng.choices(WORDS, k=words))
+    return text[0].upper() + text[1:] + "."
+
+
+def linked(rng: random.Random, text: str) -> str:
+    """Wrap a random word of `text` in a wiki link, as article prose mostly is."""
+    words = text.split(" ")
+    i = rng.randrange(len(words))
+    word = words[i].rstrip(".")
+    words[i] = words[i].replace(word, f'<a href="/w/{word.title()}" title="{word.title()}">{word}</a>', 1)
+    return " ".join(words)
+
+
+def edit_section(name: str) -> str:
+    return (
+        f'<span class="mw-headline" id="{name.replace(" ", "_")}">{name}</span><span class="mw-editsection">'
+        '<span class="mw-editsection-bracket">[</span><a href="#">edit</a>'
+        '<span class="mw-editsection-divider"> | </span><a href="#">edit source</a>'
+        '<span class="mw-editsection-bracket">]</span></span>'
+    )
+
+
+@lru_cache(maxsize=None)
+def navboxes() -> list[str]:
+    """Navigation lists shared verbatim by many pages."""
+    rng = random.Random(1)
+    return [
+        "<ul>"
+        + "".join(f'<li><a href="/w/{w.title()}_{j}">{w.title()} {j}</a></li>' for j, w in enumerate(rng.choices(WORDS, k=30)))
+        + "</ul>"
+        for _ in range(20)
+    ]
+
+
+@lru_cache(maxsize=None)
+def breaking_rows() -> list[str]:
+    """Breaking-table rows repeated across the calculators of many pages."""
+    rng = random.Random(2)
+    return [
+        f"<tr><td>{w.title()} {i}</td><td>{rng.randrange(1, 50) / 2}</td>"
+        + "".join(f"<td>{rng.randrange(1, 100) / 20}</td>" for _ in TOOLS[:4])
+        + "</tr>"
+        for i, w in enumerate(rng.choices(WORDS, k=400))
+    ]
+
+
+def infobox(rng: random.Random) -> str:
+    rows = [
+        ("Rarity", rng.choice(["Common", "Uncommon", "Rare", "Epic"])),
+        ("Renewable", rng.choice(["Yes", "No"])),
+        ("Stackable", f"Yes ({rng.choice([16, 64])})"),
+        ("Tool", f'<a href="/w/Pickaxe" title="{rng.choice(TOOLS)} Pickaxe"><img alt="Pickaxe" src="/p.png"></a>'),
+        ("Blast resistance", str(rng.randrange(1, 1200))),
+        ("Hardness", str(rng.randrange(1, 50) / 2)),
+        ("Luminous", rng.choice(["Yes", "No"])),
+        ("Flammable", rng.choice(["Yes", "No"])),
+    ]
+    body = "".join(f"<tr><th>{key}</th><td>{value}</td></tr>" for key, value in rows)
+    return f'<div class="infobox notheme"><table><tbody><tr><td colspan="2">Image</td></tr>{body}</tbody></table></div>'
+
+
+def droptable(rng: random.Random) -> str:
+    tabs = []
+    for tab in ["Without Fortune", "Fortune I", "Fortune II", "Fortune III"][: rng.randrange(1, 5)]:
+        rows = "".join(
+            f'<tr><td><a href="/w/{w.title()}" title="{w.title()}"><img alt="{w.title()}" src="/i.png"></a></td>'
+            f"<td>{rng.randrange(1, 101)}%</td><td>1–{rng.randrange(1, 6)}</td></tr>"
+            for w in rng.choices(WORDS, k=rng.randrange(2, 8))
+        )
+        tabs.append(
+            f'<div class="tabber-tab" data-title="{tab}"><table class="wikitable droptable"><tbody>'
+            f"<tr><th>Item</th><th>Roll chance</th><th>Quantity</th></tr>{rows}</tbody></table></div>"
+        )
+    return f'<div class="droptable-tabber">{"".join(tabs)}</div>'
+
+
+def calculator(rng: random.Random) -> str:
+    sliders = "".join(
+        f'<span class="calculator-field-label" data-for="{name}">{name.title()}</span>'
+        f'<span class="calculator-field" id="{name}" data-calculator-type="range" data-calculator-min="0" '
+        f'data-calculator-max="{top}" data-calculator-datalist="{";".join(map(str, range(top + 1)))}"></span>'
+        for name, top in (("efficiency", 5), ("haste", 2), ("fatigue", 4))
+    )
+    radios = "".join(
+        f'<span class="calculator-field-label" data-for="tool-{tool.lower()}">{tool}</span>'
+        f'<span class="calculator-field" id="tool-{tool.lower()}" data-calculator-type="radio"></span>'
+        for tool in TOOLS
+    )
+    groups = (
+        f'<div role="radiogroup" aria-label="Tool">{radios}</div>'
+        '<div role="radiogroup" aria-label="Underwater"><span class="calculator-field-label" data-for="uw">Yes</span>'
+        '<span class="calculator-field" id="uw" data-calculator-type="radio"></span></div>'
+    )
+    header = "<tr><th>Block</th><th>Hardness</th>" + "".join(f"<th>{tool}</th>" for tool in TOOLS[:4]) + "</tr>"
+    rows = "".join(rng.sample(breaking_rows(), rng.randrange(5, 40)))
+    return (
+        f'<div class="calculator-container" data-calculator="breaking"><div class="calculator-controls">'
+        f'{sliders}{groups}</div><table class="wikitable calculator-table"><tbody>{header}{rows}</tbody></table></div>'
+    )
+
+
+def nested_list(rng: random.Random) -> str:
+    """A ul or ol whose items sometimes hold a list of their own."""
+    items = []
+    for _ in range(rng.randrange(3, 8)):
+        item = linked(rng, sentence(rng, 8))
+        if rng.random() < 0.4:
+            tag = rng.choice(["ul", "ol"])
+            item += f"<{tag}>" + "".join(f"<li>{sentence(rng, 6)}</li>" for _ in range(rng.randrange(2, 5))) + f"</{tag}>"
+        items.append(f"<li>{item}</li>")
+    tag = rng.choice(["ul", "ol"])
+    return f"<{tag}>{''.join(items)}</{tag}>"
+
+
+def history(rng: random.Random) -> str:
+    rows = "".join(
+        f"<tr><td>1.{v}</td><td>{sentence(rng, rng.randrange(6, 20))}</td></tr>" for v in range(rng.randrange(3, 25))
+    )
+    return f'<table class="wikitable"><tbody><tr><th>Version</th><th>Change</th></tr>{rows}</tbody></table>'
+
+
+def paragraphs(rng: random.Random, count: int) -> str:
+    return "".join(
+        "<p>" + " ".join(linked(rng, sentence(rng)) for _ in range(rng.randrange(2, 7))) + "\n</p>" for _ in range(count)
+    )
+
+
+def page_html(number: int) -> str:
+    """The full HTML of page `number`, as the wiki would serve it."""
+    rng = random.Random(number)
+    title = page_title(number).replace("_", " ")
+    body = [
+        infobox(rng),
+        paragraphs(rng, rng.randrange(1, 4)),
+        f"<h2>{edit_section('Obtaining')}</h2>",
+        paragraphs(rng, 1),
+        droptable(rng),
+        f"<h3>{edit_section('Breaking')}</h3>",
+        calculator(rng),
+        f"<h2>{edit_section('Usage')}</h2>",
+        nested_list(rng),
+    ]
+    for sub in range(rng.randrange(0, 4)):
+        body.append(f"<h3>{edit_section(f'Use {sub}')}</h3>")
+        body.append(paragraphs(rng, rng.randrange(1, 3)))
+        if rng.random() < 0.5:
+            body.append(f"<h4>{edit_section(f'Detail {sub}')}</h4>")
+            body.append(nested_list(rng))
+    body += [
+        f"<h2>{edit_section('History')}</h2>",
+        history(rng),
+        f"<h2>{edit_section('Navigation')}</h2>",
+        rng.choice(navboxes()),
+    ]
+    return (
+        f'<!DOCTYPE html><html lang="en"><head><meta charset="UTF-8"><title>{html.escape(title)} – Minecraft Wiki'
+        f'</title></head><body class="mediawiki">{CHROME}'
+        f'<h1 id="firstHeading" class="firstHeading"><span class="mw-page-title-main">{html.escape(title)}</span></h1>'
+        f'<div id="mw-content-text"><div class="mw-parser-output">{"".join(body)}</div></div>'
+        '<div id="footer"><ul><li>Content is available under CC BY-NC-SA 3.0</li></ul></div></body></html>'
+    )
+
+
+def sitemap_urls(pages: int, base_url: str, sitemap: int) -> list[str]:
+    """Page URLs listed in one sitemap file, including some the crawler has to filter out."""
+    urls = []
+    for number in range(sitemap * SITEMAP_SIZE, min(pages, (sitemap + 1) * SITEMAP_SIZE)):
+        urls.append(f"{base_url}/w/{page_title(number)}")
+        if number % 20 == 0:
+            urls.append(f"{base_url}/w/Talk:{page_title(number)}")  # namespace blacklist
+            urls.append(f"{base_url}/w/{page_title(number)}/Bedrock_Edition")  # substring blacklist
+        if number % 50 == 0:
+            urls.append(f"{base_url}/w/Special:Random_{number}")  # disallowed by robots.txt
+    return urls
+
+
+class WikiStub:
+    """
+    A synthetic wiki of `pages` pages served over HTTP on localhost, in a child process.
+
+    Use as a context manager; `base_url` and the sitemap / robots URLs are set once it is running.
+    """
+
+    def __init__(self, pages: int, port: int = 0):
+        self.pages = pages
+        self.port = port
+        self.process = None
+        self.base_url = None
+
+    @property
+    def sitemap_url(self) -> str:
+        return f"{self.base_url}/sitemaps/index.xml"
+
+    @property
+    def robots_url(self) -> str:
+        return f"{self.base_url}/robots.txt"
+
+    def __enter__(self) -> "WikiStub":
+        # Served from its own process so the caller stays single-threaded (and safe to fork)
+        ready = multiprocessing.get_context("fork").Queue()
+        self.process = multiprocessing.get_context("fork").Process(
+            target=serve, args=(self.pages, self.port, ready), daemon=True
+        )
+        self.process.start()
+        self.base_url = f"http://127.0.0.1:{ready.get(timeout=30)}"
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.process.terminate()
+        self.process.join()
+
+
+def serve(pages: int, port: int, ready=None) -> None:
+    """Serve the synthetic wiki until killed, putting the bound port on `ready` once listening."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, as the pooled client expects
+
+        def do_GET(self):
+            base_url = f"http://{self.headers.get('Host', f'127.0.0.1:{server.server_port}')}"
+            path = self.path
+            if path == "/robots.txt":
+                self.reply(b"User-agent: *\nDisallow: /w/Special:\n", "text/plain")
+            elif path == "/sitemaps/index.xml":
+                count = max(1, -(-pages // SITEMAP_SIZE))
+                locs = "".join(f"<sitemap><loc>{base_url}/sitemaps/sitemap-{i}.xml.gz</loc></sitemap>" for i in range(count))
+                body = f'<?xml version="1.0" encoding="UTF-8"?><sitemapindex xmlns="{SITEMAP_XMLNS}">{locs}</sitemapindex>'
+                self.reply(body.encode(), "application/xml")
+            elif path.startswith("/sitemaps/sitemap-") and path.endswith(".xml.gz"):
+                sitemap = int(path[len("/sitemaps/sitemap-") : -len(".xml.gz")])
+                entries = "".join(
+                    f"<url><loc>{html.escape(url)}</loc><lastmod>{LASTMOD}</lastmod></url>"
+                    for url in sitemap_urls(pages, base_url, sitemap)
+                )
+                body = f'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="{SITEMAP_XMLNS}">{entries}</urlset>'
+                self.reply(gzip.compress(body.encode(), compresslevel=1), "application/x-gzip")
+            elif path.startswith(f"/w/{TITLE_PREFIX}") and path[len(f"/w/{TITLE_PREFIX}") :].isdigit():
+                number = int(path[len(f"/w/{TITLE_PREFIX}") :])
+                if number < pages:
+                    self.reply(page_html(number).encode(), "text/html; charset=UTF-8")
+                else:
+                    self.reply(b"Not found", "text/plain", 404)
+            else:
+                self.reply(b"Not found", "text/plain", 404)
+
+        def reply(self, body: bytes, content_type: str, status: int = 200) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    if ready is not None:
+        ready.put(server.server_port)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--pages", type=int, default=1000)
+    arg_parser.add_argument("--port", type=int, default=8000)
+    args = arg_parser.parse_args()
+    print(f"Serving {args.pages} pages; sitemap index at http://127.0.0.1:{args.port}/sitemaps/index.xml")
+    serve(args.pages, args.port)
@@ -0,0 +1,73 @@
+"""
+Types of the content blocks MinecraftWikiParser extracts from a page.
+
+Kept free of third-party imports so that code which only reads parsed pages
+(chunking, the pipeline, type checkers) does not pay for the HTML parser.
+"""
+
+from typing import Literal, TypedDict, Union
+
+
+# --- Block Types ---
+class ParagraphBlock(TypedDict):
+    type: Literal["paragraph"]
+    section: str
+    text: str
+
+
+class ListBlock(TypedDict):
+    type: Literal["list"]
+    section: str
+    items: list[str]
+
+
+class TableBlock(TypedDict):
+    type: Literal["table"]
+    section: str
+    data: list[list[str]]
+
+
+class InfoboxBlock(TypedDict):
+    type: Literal["infobox"]
+    section: str
+    data: dict[str, str]
+
+
+class DropTableBlock(TypedDict):
+    type: Literal["droptable"]
+    section: str
+    data: list[list[list[str]]]  # tables → rows → columns
+
+
+class CalculatorParameter(TypedDict):
+    type: Literal["slider", "radio"]
+    min: str | None
+    max: str | None
+    options: list[str]
+
+
+class CalculatorTableBlock(TypedDict):
+    type: Literal["calculator_table"]
+    section: str
+    data: list[list[str]]  # rows → columns
+    parameters: dict[str, CalculatorParameter]
+    legend_type: str
+
+
+# --- Union of all blocks ---
+ContentBlock = Union[
+    ParagraphBlock,
+    ListBlock,
+    TableBlock,
+    InfoboxBlock,
+    DropTableBlock,
+    CalculatorTableBlock,
+]
+
+
+# --- Main page type ---
+class ContentItem(TypedDict):
+    title: str
+    url: str
+    content: list[ContentBlock]
+
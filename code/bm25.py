@@ -0,0 +1,223 @@
+import logging
+import math
+import os
+import re
+from array import array
+from collections import Counter
+from collections.abc import Iterable
+
+import numpy as np
+
+from vector_store import VectorStore
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+K1 = 1.2  # BM25 term-frequency saturation
+
+B = 0.75  # BM25 document-length normalisation
+
+COMPACT_RATIO = 0.25  # compact once this fraction of indexed chunks has been removed
+
+RRF_K = 60  # reciprocal rank fusion damping constant
+
+LEXICAL_FILE = "lexical.npz"  # BM25 index file name inside a vector store folder
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    BM25 inverted index over chunk texts, keyed by VectorStore chunk ids.
+
+    Postings are two typed arrays per term, uint32 document numbers and uint16
+    term frequencies, which are read as numpy views at query time without
+    copying. Chunks are added by appending to the postings; removing one only
+    clears its live flag, and the postings are rewritten without removed chunks
+    once enough have piled up (see `compact`).
+    """
+
+    def __init__(self, k1: float = K1, b: float = B):
+        self.k1 = k1
+        self.b = b
+        self.postings: dict[str, tuple[array, array]] = {}  # term → (doc numbers, term frequencies)
+        self.chunk_ids = array("q")  # doc number → chunk id
+        self.lengths = array("I")  # doc number → token count
+        self.live = bytearray()  # doc number → 1 unless removed
+        self.numbers: dict[int, int] = {}  # chunk id → doc number
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.numbers)
+
+    def __contains__(self, chunk_id: int) -> bool:
+        return chunk_id in self.numbers
+
+    def add(self, chunk_id: int, text: str) -> None:
+        """Index a chunk, replacing any earlier text indexed under the same id."""
+        if chunk_id in self.numbers:
+            self.remove(chunk_id)
+        tokens = tokenize(text)
+        number = len(self.chunk_ids)
+        self.chunk_ids.append(chunk_id)
+        self.lengths.append(len(tokens))
+        self.live.append(1)
+        self.numbers[chunk_id] = number
+        self.total_length += len(tokens)
+        for term, count in Counter(tokens).items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = (array("I"), array("H"))
+            postings[0].append(number)
+            postings[1].append(min(count, 0xFFFF))
+
+    def remove(self, chunk_id: int) -> bool:
+        number = self.numbers.pop(chunk_id, None)
+        if number is None:
+            return False
+        self.live[number] = 0
+        self.total_length -= self.lengths[number]
+        return True
+
+    def compact(self) -> None:
+        """Renumber live chunks and rewrite the postings without removed ones."""
+        live = np.frombuffer(self.live, dtype=np.uint8).astype(bool)
+        renumber = np.cumsum(live, dtype=np.int64) - 1
+        postings = {}
+        for term, (numbers, counts) in self.postings.items():
+            numbers = np.frombuffer(numbers, dtype=np.uint32)
+            keep = live[numbers]
+            if keep.any():
+                postings[term] = (
+                    array("I", renumber[numbers[keep]].astype(np.uint32).tobytes()),
+                    array("H", np.frombuffer(counts, dtype=np.uint16)[keep].tobytes()),
+                )
+        self.postings = postings
+        self.chunk_ids = array("q", np.frombuffer(self.chunk_ids, dtype=np.int64)[live].tobytes())
+        self.lengths = array("I", np.frombuffer(self.lengths, dtype=np.uint32)[live].tobytes())
+        self.live = bytearray(b"\x01" * len(self.chunk_ids))
+        self.numbers = {int(chunk_id): number for number, chunk_id in enumerate(self.chunk_ids)}
+
+    def maybe_compact(self) -> None:
+        removed = len(self.chunk_ids) - len(self.numbers)
+        if removed and removed >= COMPACT_RATIO * len(self.chunk_ids):
+            self.compact()
+
+    def search(self, query: str, k: int = 10, candidates: Iterable[int] | None = None) -> list[tuple[int, float]]:
+        """
+        Score chunks against a query with BM25.
+
+        Args:
+            query (str): The query text.
+            k (int): Number of results to return.
+            candidates (iterable of int | None): Chunk ids to restrict scoring to.
+
+        Returns:
+            list of tuple: (chunk id, score) pairs, best first. Chunks sharing no term with the
+            query are never returned.
+        """
+        if not self.numbers:
+            return []
+        live = np.frombuffer(self.live, dtype=np.uint8)
+        lengths = np.frombuffer(self.lengths, dtype=np.uint32)
+        count = len(self.numbers)
+        average_length = self.total_length / count or 1.0
+        scores = np.zeros(len(self.chunk_ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            numbers = np.frombuffer(postings[0], dtype=np.uint32)
+            frequencies = np.frombuffer(postings[1], dtype=np.uint16).astype(np.float32)
+            document_frequency = int(live[numbers].sum())
+            if not document_frequency:
+                continue
+            idf = math.log(1 + (count - document_frequency + 0.5) / (document_frequency + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * lengths[numbers] / average_length)
+            scores[numbers] += idf * frequencies * (self.k1 + 1) / (frequencies + norm)
+
+        scores *= live
+        if candidates is not None:
+            mask = np.zeros(len(scores), dtype=bool)
+            mask[[self.numbers[chunk_id] for chunk_id in candidates if chunk_id in self.numbers]] = True
+            scores *= mask
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched])]
+        return [(int(self.chunk_ids[number]), float(scores[number])) for number in matched]
+
+    def sync(self, store: VectorStore) -> tuple[int, int]:
+        """
+        Bring the index in line with a VectorStore's chunks: index new ids, drop removed ones.
+
+        Chunk ids are derived from chunk text, so ids present in both never need re-indexing.
+
+        Returns:
+            tuple: (chunks added, chunks removed).
+        """
+        store_ids = store.ids()
+        removed = [chunk_id for chunk_id in self.numbers if chunk_id not in store_ids]
+        for chunk_id in removed:
+            self.remove(chunk_id)
+        added = [chunk_id for chunk_id in store_ids if chunk_id not in self.numbers]
+        for chunk_id, row in store.get(added).items():
+            self.add(chunk_id, row["text"])
+        self.maybe_compact()
+        logging.info(f"BM25 index synced: {len(added)} added, {len(removed)} removed, {len(self)} chunks")
+        return len(added), len(removed)
+
+    def save(self, path: str) -> None:
+        """Write the index (compacted) as a single .npz file, atomically."""
+        self.compact()
+        terms = list(self.postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(self.postings[term][0]) for term in terms])
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            params=np.array([self.k1, self.b]),
+            terms=np.frombuffer("\n".join(terms).encode("utf-8"), dtype=np.uint8),
+            offsets=offsets,
+            numbers=np.concatenate([np.frombuffer(self.postings[t][0], dtype=np.uint32) for t in terms] or [np.empty(0, np.uint32)]),
+            counts=np.concatenate([np.frombuffer(self.postings[t][1], dtype=np.uint16) for t in terms] or [np.empty(0, np.uint16)]),
+            chunk_ids=np.frombuffer(self.chunk_ids, dtype=np.int64),
+            lengths=np.frombuffer(self.lengths, dtype=np.uint32),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with np.load(path) as data:
+            k1, b = data["params"]
+            index = cls(float(k1), float(b))
+            terms = data["terms"].tobytes().decode("utf-8").split("\n") if len(data["terms"]) else []
+            offsets, numbers, counts = data["offsets"], data["numbers"], data["counts"]
+            for i, term in enumerate(terms):
+                start, end = offsets[i], offsets[i + 1]
+                index.postings[term] = (array("I", numbers[start:end].tobytes()), array("H", counts[start:end].tobytes()))
+            index.chunk_ids = array("q", data["chunk_ids"].tobytes())
+            index.lengths = array("I", data["lengths"].tobytes())
+        index.live = bytearray(b"\x01" * len(index.chunk_ids))
+        index.numbers = {int(chunk_id): number for number, chunk_id in enumerate(index.chunk_ids)}
+        index.total_length = int(np.frombuffer(index.lengths, dtype=np.uint32).sum())
+        return index
+
+
+def reciprocal_rank_fusion(
+    rankings: Iterable[Iterable[int]], k: int = RRF_K, weights: Iterable[float] | None = None
+) -> list[tuple[int, float]]:
+    """
+    Fuse several ranked id lists with reciprocal rank fusion: score(id) = sum of weight / (k + rank).
+
+    Returns:
+        list of tuple: (id, fused score) pairs, best first.
+    """
+    rankings = list(rankings)
+    weights = list(weights) if weights is not None else [1.0] * len(rankings)
+    scores: dict[int, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,201 @@
+import json
+import os
+from array import array
+from collections.abc import Iterable, Iterator, Sequence
+
+from chunking import ChunkType
+
+METADATA_KEYS = ("title", "url", "section", "content_type")  # key order chunk_page writes metadata in
+
+_MISSING = object()  # Interned in place of a metadata key a chunk does not have
+
+
+class _Interned:
+    """Append-only table of distinct values, each stored once and referred to by its index."""
+
+    def __init__(self):
+        self.values: list = []
+        self.index: dict = {}
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def add(self, value) -> int:
+        i = self.index.get(value)
+        if i is None:
+            i = self.index[value] = len(self.values)
+            self.values.append(value)
+        return i
+
+
+class Chunk:
+    """
+    A view of one chunk in a ChunkTable: just the table and a row number.
+
+    Reads like a ChunkType (chunk["text"], chunk["metadata"]), so it can be passed
+    to code written for chunk dicts; to_dict() returns the dict itself.
+    """
+
+    __slots__ = ("table", "row")
+
+    def __init__(self, table: "ChunkTable", row: int):
+        self.table = table
+        self.row = row
+
+    def __getitem__(self, key: str):
+        if key == "text":
+            return self.table.text(self.row)
+        if key == "metadata":
+            return self.table.metadata(self.row)
+        raise KeyError(key)
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    @property
+    def text(self) -> str:
+        return self.table.text(self.row)
+
+    @property
+    def url(self) -> str:
+        return self.table.pages.values[self.table.page_rows[self.row]][1]
+
+    def to_dict(self) -> ChunkType:
+        return self.table.to_chunk(self.row)
+
+    def __repr__(self) -> str:
+        return f"Chunk({self.row}, {self.text[:40]!r})"
+
+
+class ChunkTable(Sequence):
+    """
+    Columnar, interned store for many chunks, converting losslessly to and from ChunkType dicts.
+
+    A chunk dict costs two dicts plus its own copies of the title, url and
+    section strings (json.load never shares them), several hundred bytes before
+    the text. Here each distinct (title, url) page, section and content type is
+    stored once, and a chunk is a row in a few typed arrays: the indexes into
+    those tables and the offset of its text in one UTF-8 buffer. The
+    "[title | section]" line chunk_page starts every text with is not stored,
+    just flagged, and rebuilt on access.
+
+    Metadata with keys other than METADATA_KEYS, or in another order, is kept
+    as given so that to_chunk always returns an equal dict.
+    """
+
+    def __init__(self, chunks: Iterable[ChunkType] = ()):
+        self.pages = _Interned()  # (title, url)
+        self.sections = _Interned()
+        self.content_types = _Interned()
+        self.page_rows = array("I")
+        self.section_rows = array("I")
+        self.content_type_rows = array("B")
+        self.has_header = array("B")  # 1 if the text started with "[title | section]\n"
+        self.offsets = array("Q", [0])  # text of row i is buffer[offsets[i]:offsets[i + 1]]
+        self.buffer = bytearray()
+        self.irregular: dict[int, dict] = {}  # row → metadata that does not fit the columns
+        self.extend(chunks)
+
+    def __len__(self) -> int:
+        return len(self.page_rows)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [Chunk(self, i) for i in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        return Chunk(self, row)
+
+    def append(self, chunk: ChunkType) -> int:
+        """Add a chunk, returning its row."""
+        row = len(self)
+        metadata = chunk["metadata"]
+        if tuple(metadata) != METADATA_KEYS[: len(metadata)] or len(metadata) < 2:
+            self.irregular[row] = metadata
+            title = url = section = content_type = _MISSING
+        else:
+            title, url = metadata["title"], metadata["url"]
+            section = metadata.get("section", _MISSING)
+            content_type = metadata.get("content_type", _MISSING)
+        self.page_rows.append(self.pages.add((title, url)))
+        self.section_rows.append(self.sections.add(section))
+        self.content_type_rows.append(self.content_types.add(content_type))
+
+        text = chunk["text"]
+        header = self._header(title, section)
+        stripped = header is not None and text.startswith(header)
+        self.has_header.append(stripped)
+        self.buffer += (text[len(header) :] if stripped else text).encode("utf-8")
+        self.offsets.append(len(self.buffer))
+        return row
+
+    def extend(self, chunks: Iterable[ChunkType]) -> None:
+        for chunk in chunks:
+            self.append(chunk)
+
+    @staticmethod
+    def _header(title, section) -> str | None:
+        if title is _MISSING or section is _MISSING:
+            return None
+        return f"[{title} | {section}]\n"
+
+    def text(self, row: int) -> str:
+        text = self.buffer[self.offsets[row] : self.offsets[row + 1]].decode("utf-8")
+        if self.has_header[row]:
+            title, _ = self.pages.values[self.page_rows[row]]
+            return self._header(title, self.sections.values[self.section_rows[row]]) + text
+        return text
+
+    def metadata(self, row: int) -> dict[str, str]:
+        """The chunk's metadata, as a new dict."""
+        if row in self.irregular:
+            return dict(self.irregular[row])
+        title, url = self.pages.values[self.page_rows[row]]
+        values = (
+            title,
+            url,
+            self.sections.values[self.section_rows[row]],
+            self.content_types.values[self.content_type_rows[row]],
+        )
+        return {key: value for key, value in zip(METADATA_KEYS, values) if value is not _MISSING}
+
+    def to_chunk(self, row: int) -> ChunkType:
+        return {"text": self.text(row), "metadata": self.metadata(row)}
+
+    def to_chunks(self, rows: Iterable[int] | None = None) -> list[ChunkType]:
+        """Chunk dicts for `rows` (default all), e.g. to write back as JSON."""
+        return [self.to_chunk(row) for row in (range(len(self)) if rows is None else rows)]
+
+    def texts(self) -> Iterator[str]:
+        return (self.text(row) for row in range(len(self)))
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the columns and text buffer (excluding the interned tables)."""
+        columns = (self.page_rows, self.section_rows, self.content_type_rows, self.has_header, self.offsets)
+        return sum(column.itemsize * len(column) for column in columns) + len(self.buffer)
+
+    @classmethod
+    def from_folder(cls, folder: str) -> tuple["ChunkTable", list[tuple[str, range]]]:
+        """
+        Load every per-page chunk file in a folder (as written by main.load_and_chunk), in filename order.
+
+        Returns:
+            tuple: (the table, (page URL, its rows) for each non-empty chunk file).
+        """
+        table = cls()
+        pages = []
+        for filename in sorted(os.listdir(folder)):
+            if not filename.endswith(".json"):
+                continue
+            with open(os.path.join(folder, filename), "r", encoding="utf-8") as f:
+                chunks = json.load(f)
+            if chunks:
+                start = len(table)
+                table.extend(chunks)
+                pages.append((chunks[0]["metadata"]["url"], range(start, len(table))))
+        return table, pages
@@ -1,18 +1,69 @@
-from parser import ContentItem
+import json
+import os
+import re
+from functools import lru_cache
 from typing import TypedDict
 
+from blocks import ContentBlock
+from tokens import count_tokens
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+LEGENDS_PATH = os.path.join(ROOT_DIR, "..", "output", "legends.json")
+
+MAX_CHUNK_TOKENS = 256  # tokens per chunk, including the [title | section] header
+
+OVERLAP_TOKENS = 0  # tokens of trailing lines/sentences repeated at the start of the next piece
+
+TOKEN_MODEL = "text-embedding-ada-002"  # tokenizer chunks are measured with (see embedding.EMBEDDING_MODEL)
+
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(\[])")
+
 
 class ChunkType(TypedDict):
     text: str
     metadata: dict[str, str]
 
 
-def chunk_page(title: str, url: str, content: list[ContentItem], max_length: int = 512) -> list[ChunkType]:
+class Legend(TypedDict):
+    description: str
+    legend: list[str]
+
+
+# A unit of text the splitter never breaks, unless it is too large on its own, paired with the
+# header row of the table it belongs to (repeated at the top of every piece that starts inside it).
+Unit = tuple[str, str | None]
+
+
+def chunk_page(
+    title: str,
+    url: str,
+    content: list[ContentBlock],
+    max_tokens: int = MAX_CHUNK_TOKENS,
+    overlap: int = OVERLAP_TOKENS,
+    model: str = TOKEN_MODEL,
+    legends: dict[str, Legend] | None = None,
+) -> list[ChunkType]:
     """
     Chunk a parsed page into smaller sections for embedding.
     Each chunk contains metadata: title, url, section, and text.
+
+    Blocks longer than `max_tokens` are split with split_units: every piece keeps
+    the [title | section] header and, for tables, the header row, so tables come
+    out as row groups. Calculator tables also carry their legend (see legends.json).
+
+    Rows repeated within one table are dropped (see dedupe_rows). Content repeated
+    across pages is left to chunk dedupe at indexing time (see dedup.py), which
+    records where every copy came from.
+
+    Args:
+        legends (dict | None): Legends by legend_type (defaults to output/legends.json).
     """
     chunks = []
+    units: list[list[Unit]] = []  # how each chunk may be split, parallel to `chunks`
+    headers: list[str] = []  # header line(s) every piece of a chunk starts with, parallel to `chunks`
+    if legends is None:
+        legends = load_legends()
 
     for block in content:
         # For paragraphs and lists, chunk directly
@@ -28,6 +79,7 @@ def chunk_page(title: str, url: str, content: list[ContentItem], max_length: int
                     },
                 }
             )
+            units.append([(sentence, None) for sentence in split_sentences(block["text"])])
         elif block["type"] == "list":
             # Combine list items into one chunk (or split if too long)
             list_text = "\n".join(block["items"])
@@ -42,9 +94,11 @@ def chunk_page(title: str, url: str, content: list[ContentItem], max_length: int
                     },
                 }
             )
+            units.append([(item, None) for item in block["items"]])
         elif block["type"] == "table":
             # Flatten table rows for embedding
-            table_text = "\n".join([" | ".join(row) for row in block["data"]])
+            rows = dedupe_rows([" | ".join(row) for row in block["data"]])
+            table_text = "\n".join(rows)
             chunks.append(
                 {
                     "text": f"[{title} | {block['section']}]\n{table_text}",
@@ -56,9 +110,11 @@ def chunk_page(title: str, url: str, content: list[ContentItem], max_length: int
                     },
                 }
             )
+            units.append(table_units(rows))
         elif block["type"] == "infobox":
             # Flatten infobox key-value pairs
-            infobox_text = "\n".join([f"{k}: {v}" for k, v in block["data"].items()])
+            lines = [f"{k}: {v}" for k, v in block["data"].items()]
+            infobox_text = "\n".join(lines)
             chunks.append(
                 {
                     "text": f"[{title} | {block['section']}]\n{infobox_text}",
@@ -70,9 +126,11 @@ def chunk_page(title: str, url: str, content: list[ContentItem], max_length: int
                     },
                 }
             )
+            units.append([(line, None) for line in lines])
         elif block["type"] == "droptable":
             # Flatten droptable key-value pairs
-            droptable_text = "\n\n".join("\n".join(" | ".join(row) for row in table) for table in block["data"])
+            tables = [dedupe_rows([" | ".join(row) for row in table]) for table in block["data"]]
+            droptable_text = "\n\n".join("\n".join(rows) for rows in tables)
             chunks.append(
                 {
                     "text": f"[{title} | {block['section']}]\n{droptable_text.strip()}",
@@ -84,9 +142,11 @@ def chunk_page(title: str, url: str, content: list[ContentItem], max_length: int
                     },
                 }
             )
+            units.append([unit for rows in tables for unit in table_units(rows)])
         elif block["type"] == "calculator_table":
             # Flatten calculator table key-value pairs
-            calculator_table_text = "\n".join([" | ".join(row) for row in block["data"]])
+            rows = dedupe_rows([" | ".join(row) for row in block["data"]])
+            calculator_table_text = "\n".join(rows)
 
             lines = []
             for name, p in block["parameters"].items():
@@ -96,9 +156,13 @@ def chunk_page(title: str, url: str, content: list[ContentItem], max_length: int
                     lines.append(f"{name} (radio): {', '.join(p['options'])}")
             params_text = "\n".join(lines)
 
+            header = f"[{title} | {block['section']}]"
+            legend = legends.get(block.get("legend_type", ""))
+            if legend:
+                header += f"\n{legend_text(legend)}"
             chunks.append(
                 {
-                    "text": f"[{title} | {block['section']}]\n{calculator_table_text}\nParameters: {params_text}",
+                    "text": f"{header}\n{calculator_table_text}\nParameters: {params_text}",
                     "metadata": {
                         "title": title,
                         "url": url,
@@ -107,31 +171,165 @@ def chunk_page(title: str, url: str, content: list[ContentItem], max_length: int
                     },
                 }
             )
-        # NOTE: Can extend this for other block types as needed
-        # Only need to extend if parser.py adds new block types
+            units.append(table_units(rows) + [(f"Parameters: {params_text}", None)])
+            headers.append(header)
+            continue
+        else:
+            # NOTE: Can extend this for other block types as needed
+            # Only need to extend if parser.py adds new block types
+            continue
+        headers.append(f"[{title} | {block['section']}]")
 
-    # Optionally, split chunks further if text is too long for your embedding model
-    # NOTE: KIV - implement smarter splitting if needed
+    # Split chunks that are too long for the embedding model
     final_chunks = []
-    for chunk in chunks:
-        text = chunk["text"]
-        if len(text) > max_length:
-            # Simple split by sentences or lines
-            lines = text.split("\n")
-            buffer = []
-            for line in lines:
-                buffer.append(line)
-                if sum(len(l) for l in buffer) > max_length:
-                    final_chunks.append({**chunk, "text": "\n".join(buffer)})
-                    buffer = []
-            if buffer:
-                final_chunks.append({**chunk, "text": "\n".join(buffer)})
-        else:
+    for chunk, chunk_units, header in zip(chunks, units, headers):
+        if count_tokens(chunk["text"], model) <= max_tokens:
             final_chunks.append(chunk)
+            continue
+        separator = " " if chunk["metadata"]["content_type"] == "paragraph" else "\n"
+        for text in split_units(header, chunk_units, max_tokens, overlap, model, separator):
+            final_chunks.append({**chunk, "text": text})
 
     return final_chunks
 
 
+def split_sentences(text: str) -> list[str]:
+    return [sentence for sentence in SENTENCE_PATTERN.split(text.strip()) if sentence]
+
+
+@lru_cache(maxsize=None)
+def load_legends(path: str = LEGENDS_PATH) -> dict[str, Legend]:
+    """Load table legends by legend_type; an empty dict if the file does not exist."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def legend_text(legend: Legend) -> str:
+    return f"Legend: {'; '.join(legend['legend'])}"
+
+
+def dedupe_rows(rows: list[str]) -> list[str]:
+    """
+    Drop rows repeated within a flattened table, keeping its header row.
+
+    Data rows are compared with each other only, so a row that matches the header
+    is kept; an empty or header-only table is returned as it is.
+    """
+    seen = set()
+    kept = rows[:1]
+    for row in rows[1:]:
+        if row in seen:
+            continue
+        seen.add(row)
+        kept.append(row)
+    return kept
+
+
+def table_units(rows: list[str]) -> list[Unit]:
+    """Units for a flattened table: the first row is its header, repeated on every piece of the table."""
+    if not rows:
+        return []
+    return [(rows[0], None)] + [(row, rows[0]) for row in rows[1:]]
+
+
+def _split_oversized(text: str, budget: int, model: str) -> list[str]:
+    """Break a single unit longer than `budget` tokens on sentences, then on words."""
+    parts: list[str] = []
+    for sentence in split_sentences(text) or [text]:
+        if count_tokens(sentence, model) <= budget:
+            parts.append(sentence)
+            continue
+        words: list[str] = []
+        tokens = 0
+        for word in sentence.split():
+            n = count_tokens(word, model) + 1
+            if words and tokens + n > budget:
+                parts.append(" ".join(words))
+                words, tokens = [], 0
+            words.append(word)
+            tokens += n
+        if words:
+            parts.append(" ".join(words))
+    return parts
+
+
+def split_units(
+    header: str,
+    units: list[Unit],
+    max_tokens: int = MAX_CHUNK_TOKENS,
+    overlap: int = OVERLAP_TOKENS,
+    model: str = TOKEN_MODEL,
+    separator: str = "\n",
+) -> list[str]:
+    """
+    Pack units greedily into pieces of at most `max_tokens` tokens.
+
+    Every piece starts with `header` and, when it starts inside a table, that
+    table's header row. Each unit's tokens are counted once and pieces are
+    tracked with a running total, so the split is linear in the input. Up to
+    `overlap` tokens of trailing units are repeated at the start of the next
+    piece. A unit too long to fit on its own is split on sentences, then words.
+
+    Returns:
+        list of str: The piece texts.
+    """
+    header_tokens = count_tokens(header, model) + 1
+
+    def budget_for(table_header: str | None) -> int:
+        table_tokens = count_tokens(table_header, model) + 1 if table_header else 0
+        return max(1, max_tokens - header_tokens - table_tokens)
+
+    # Count every unit once (plus one for its separator), breaking up any that could never fit
+    counted: list[tuple[str, str | None, int]] = []
+    for text, table_header in units:
+        budget = budget_for(table_header)
+        n = count_tokens(text, model) + 1
+        if n <= budget:
+            counted.append((text, table_header, n))
+        else:
+            for part in _split_oversized(text, budget - 1, model):
+                counted.append((part, table_header, count_tokens(part, model) + 1))
+
+    pieces: list[str] = []
+    piece: list[tuple[str, str | None, int]] = []
+    tokens = 0
+    budget = 0
+
+    def flush() -> None:
+        lines = [header]
+        if piece[0][1] is not None:
+            lines.append(piece[0][1])  # Piece starts inside a table: repeat its header row
+        pieces.append("\n".join(lines) + "\n" + separator.join(text for text, _, _ in piece))
+
+    for unit in counted:
+        text, table_header, n = unit
+        starts_piece = not piece
+        if piece and tokens + n > budget:
+            flush()
+            starts_piece = True
+            # Carry trailing units of the same table into the next piece as overlap
+            carried: list[tuple[str, str | None, int]] = []
+            carried_tokens = 0
+            for previous in reversed(piece[1:]):
+                if previous[1] != table_header or carried_tokens + previous[2] > overlap:
+                    break
+                carried.insert(0, previous)
+                carried_tokens += previous[2]
+            if carried and carried_tokens + n > budget_for(table_header):
+                carried, carried_tokens = [], 0
+            piece, tokens = carried, carried_tokens
+        if starts_piece:
+            # Whether or not overlap was carried, the new piece repeats this unit's table header row
+            budget = budget_for(table_header)
+        piece.append(unit)
+        tokens += n
+    if piece:
+        flush()
+    return pieces
+
+
 # Example usage:
 # parsed = ... # Load your parsed ContentItem
 # chunks = chunk_page(parsed)
@@ -0,0 +1,196 @@
+import json
+import logging
+import os
+from collections.abc import Iterator
+
+
+class CorpusStore:
+    """
+    Append-only JSON Lines corpus with an offset index for random access by URL or title.
+
+    Each line is one compact record: {"url": ..., "title": ..., "data": ...}. Writing a
+    URL again appends a new version and the index points at the latest one; deleting
+    appends a tombstone. The index is kept in a sidecar file and rebuilt from the
+    JSON Lines file if it is missing or out of date, so the data file is the only
+    source of truth.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index_path = path + ".idx"
+        self.offsets: dict[str, tuple[int, int]] = {}  # url → (byte offset, byte length) of latest record
+        self.url_titles: dict[str, str | None] = {}  # url → title of latest record
+        self.titles: dict[str, str] = {}  # title → url
+        self.indexed_size = 0  # bytes of the data file covered by the index
+        self.dirty = False
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._open()
+
+    def _open(self) -> None:
+        self._load_index()
+        self.file = open(self.path, "a+b")
+        self.file.truncate(self.indexed_size)  # Drop any partial record left by an interrupted write
+
+    def __enter__(self) -> "CorpusStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self.offsets
+
+    def _load_index(self) -> None:
+        """Load the sidecar index, then scan any records appended after it was last written."""
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            self.indexed_size = index["size"]
+            for url, (offset, length, title) in index["records"].items():
+                self.offsets[url] = (offset, length)
+                self.url_titles[url] = title
+                if title:
+                    self.titles[title] = url
+
+        data_size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if data_size < self.indexed_size:
+            # Data file was replaced or truncated; the index cannot be trusted
+            self._reset()
+        if data_size > self.indexed_size:
+            self._scan_from(self.indexed_size)
+
+    def _scan_from(self, offset: int) -> None:
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Partial record from an interrupted write; truncated away when the file is opened
+                record = json.loads(line)
+                self._index_record(record, offset, len(line))
+                offset += len(line)
+        self.indexed_size = offset
+        self.dirty = True
+
+    def _index_record(self, record: dict, offset: int, length: int) -> None:
+        url = record["url"]
+        self.offsets.pop(url, None)
+        old_title = self.url_titles.pop(url, None)
+        if old_title and self.titles.get(old_title) == url:
+            del self.titles[old_title]
+        if record.get("deleted"):
+            return
+        self.offsets[url] = (offset, length)
+        self.url_titles[url] = record.get("title")
+        if record.get("title"):
+            self.titles[record["title"]] = url
+
+    def _reset(self) -> None:
+        self.offsets, self.url_titles, self.titles, self.indexed_size = {}, {}, {}, 0
+
+    def _append(self, record: dict) -> None:
+        line = (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        self.file.write(line)
+        self._index_record(record, self.indexed_size, len(line))
+        self.indexed_size += len(line)
+        self.dirty = True
+
+    def put(self, url: str, title: str | None, data) -> None:
+        """Append a record for a URL, superseding any earlier version."""
+        self._append({"url": url, "title": title, "data": data})
+
+    def delete(self, url: str) -> None:
+        """Append a tombstone so the URL no longer resolves."""
+        if url in self.offsets:
+            self._append({"url": url, "deleted": True})
+
+    def get(self, url: str):
+        """Return the data stored for a URL, or None. Reads only that one record from disk."""
+        location = self.offsets.get(url)
+        if location is None:
+            return None
+        offset, length = location
+        self.file.flush()
+        self.file.seek(offset)
+        return json.loads(self.file.read(length))["data"]
+
+    def get_by_title(self, title: str):
+        url = self.titles.get(title)
+        return self.get(url) if url else None
+
+    def __iter__(self) -> Iterator[tuple[str, object]]:
+        """Stream (url, data) for every live record in file order, reading sequentially."""
+        self.file.flush()
+        live = {offset for offset, _ in self.offsets.values()}
+        with open(self.path, "rb") as f:
+            offset = 0
+            for line in f:
+                if offset in live:
+                    record = json.loads(line)
+                    yield record["url"], record["data"]
+                offset += len(line)
+                if offset >= self.indexed_size:
+                    break
+
+    def flush(self) -> None:
+        """Flush appended records and write the index sidecar atomically."""
+        self.file.flush()
+        if not self.dirty:
+            return
+        records = {url: [offset, length, self.url_titles.get(url)] for url, (offset, length) in self.offsets.items()}
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"size": self.indexed_size, "records": records}, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.index_path)
+        self.dirty = False
+
+    def close(self) -> None:
+        self.flush()
+        self.file.close()
+
+    def compact(self) -> None:
+        """Rewrite the file keeping only the latest version of each live record."""
+        tmp_path = self.path + ".compact"
+        with CorpusStore(tmp_path) as compacted:
+            for url, data in self:
+                compacted.put(url, self.url_titles.get(url), data)
+        self.file.close()
+        os.replace(tmp_path, self.path)
+        os.replace(tmp_path + ".idx", self.index_path)
+        self._reset()
+        self._open()
+
+
+def import_page_folder(folder: str, store: CorpusStore) -> int:
+    """Import per-page JSON files (as written by MinecraftWikiParser.save_to_file) into a store."""
+    count = 0
+    for filename in sorted(os.listdir(folder)):
+        if not filename.endswith(".json"):
+            continue
+        with open(os.path.join(folder, filename), "r", encoding="utf-8") as f:
+            page = json.load(f)
+        store.put(page["url"], page["title"], page["content"])
+        count += 1
+    store.flush()
+    logging.info(f"Imported {count} pages from {folder} into {store.path}")
+    return count
+
+
+def import_chunk_folder(folder: str, store: CorpusStore) -> int:
+    """Import per-page chunk files (as written by main.load_and_chunk) into a store, one record per page."""
+    count = 0
+    for filename in sorted(os.listdir(folder)):
+        if not filename.endswith(".json"):
+            continue
+        with open(os.path.join(folder, filename), "r", encoding="utf-8") as f:
+            chunks = json.load(f)
+        if not chunks:
+            continue  # Nothing to key the record by
+        metadata = chunks[0]["metadata"]
+        store.put(metadata["url"], metadata["title"], chunks)
+        count += 1
+    store.flush()
+    logging.info(f"Imported {count} chunk files from {folder} into {store.path}")
+    return count
@@ -1,144 +1,340 @@
-import requests
-import gzip
+import io
 import logging
-import time
+import os
+import queue
+import re
+import threading
+import zlib
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
 from urllib.robotparser import RobotFileParser
-from bs4 import BeautifulSoup
 import xml.etree.ElementTree as ET
 
-# Configure logging to write to file
-logging.basicConfig(
-    filename="output.txt",
-    level=logging.INFO,
-    format="%(asctime)s - %(message)s",
-    filemode="w",  # 'w' to overwrite, 'a' to append
-)
+import http_client
+from metrics import configure_logging, inc
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+URLS_FILE = os.path.join(ROOT_DIR, "minecraft_urls.txt")  # crawled page URLs and their lastmod dates
 
 SITEMAP_URL = "https://minecraft.wiki/images/sitemaps/index.xml"
 
-HEADERS = {"User-Agent": "FriendlyResearchBot/1.0 (contact: limjiantao@gmail.com)"}
+ROBOTS_URL = "https://minecraft.wiki/robots.txt"
 
 CRAWL_DELAY = 1  # seconds
 
+SITEMAP_WORKERS = 4  # sitemap files downloaded in parallel
+
+PAGE_PATH = "/w/"  # Page titles follow this in wiki URLs
+
+SITEMAP_NS = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+
+# Keywords rejected anywhere in a URL
+URL_BLACKLIST = [
+    "Bedrock_Edition",
+    "Bedrock_Editor",
+    "Calculators",
+    "Character_Creator",
+    "Education_Edition",
+    "LEGO_Minecraft",
+    "Launcher",
+    "Console",
+    "MinecraftEdu",
+    "Minecraft_",
+    "Nintendo",
+    "PlayStation",
+    "Pocket_Edition",
+    "Technical_blocks",
+    "Wii",
+    "Xbox",
+    "Category",
+    "Movie",
+    "talk:",
+]
 
-def fetch_sitemap_index(url) -> list[ET.Element]:
-    """Fetch and parse the sitemap index XML."""
+# Namespaces rejected at the start of a page title
+NAMESPACE_BLACKLIST = [
+    "Talk:",
+    "Minecraft_Wiki:",
+    "MediaWiki:",
+    "Template:",
+    "Module:",
+    "Dungeons:",
+    "Earth:",
+    "Story_Mode:",
+    "Legends:",
+    "Forum:",
+    "Tutorial:",
+]
+
+# (url, lastmod) pair as listed in a sitemap
+SitemapEntry = tuple[str, str | None]
+
+
+def fetch_sitemap_index(url) -> list[str]:
+    """Fetch and parse the sitemap index XML, returning the sitemap locations it lists."""
     logging.info(f"Fetching sitemap index from {url}")
-    response = requests.get(url, headers=HEADERS)
+    response = http_client.get(url)
     response.raise_for_status()
-    soup = BeautifulSoup(response.text, "xml")
-    return soup.find_all("loc")
+    return [
+        elem.text.strip()
+        for _, elem in ET.iterparse(io.BytesIO(response.content))
+        if elem.tag.rpartition("}")[2] == "loc" and elem.text
+    ]
+
 
+def fetch_sitemap(url) -> Iterator[SitemapEntry]:
+    """
+    Stream (url, lastmod) entries from a gzipped sitemap file.
 
-def fetch_sitemap(url) -> ET.Element:
-    """Fetch and decompress a gzipped sitemap file."""
+    The body is gunzipped and parsed incrementally as it downloads, and each <url>
+    element is discarded once read, so memory use does not depend on sitemap size.
+    """
     logging.info(f"Fetching sitemap: {url}")
-    response = requests.get(url, headers=HEADERS)
-    response.raise_for_status()
-    data = gzip.decompress(response.content)
-    return ET.fromstring(data)
+    decompressor = None
+    xml_parser = ET.XMLPullParser(events=("start", "end"))
+    root = None
+
+    def read_entries() -> Iterator[SitemapEntry]:
+        nonlocal root
+        for event, elem in xml_parser.read_events():
+            if event == "start":
+                if root is None:
+                    root = elem
+            elif elem.tag == f"{SITEMAP_NS}url":
+                yield elem.findtext(f"{SITEMAP_NS}loc"), elem.findtext(f"{SITEMAP_NS}lastmod")
+                root.clear()  # Drop every <url> read so far
+
+    for chunk in http_client.get_client().iter_content(url):
+        if decompressor is None:
+            # Servers sometimes send the sitemap already decoded (Content-Encoding: gzip)
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if chunk[:2] == b"\x1f\x8b" else False
+        xml_parser.feed(decompressor.decompress(chunk) if decompressor else chunk)
+        yield from read_entries()
 
+    if decompressor:
+        xml_parser.feed(decompressor.flush())
+    xml_parser.close()
+    yield from read_entries()
 
-def extract_urls_from_sitemap(root, robot_parser) -> list[str]:
-    """Extract URLs from a sitemap XML root, filtering by robots.txt rules."""
-    urls = []
-    for url in root.findall("{http://www.sitemaps.org/schemas/sitemap/0.9}url"):
-        loc = url.find("{http://www.sitemaps.org/schemas/sitemap/0.9}loc").text
 
+def extract_urls_from_sitemap(entries: Iterable[SitemapEntry], robot_parser) -> Iterator[SitemapEntry]:
+    """Filter sitemap (url, lastmod) entries by robots.txt rules."""
+    for loc, lastmod in entries:
         # Check if URL is allowed by robots.txt
         if robot_parser.can_fetch("*", loc):
-            urls.append(loc)
+            yield loc, lastmod
         else:
-            logging.warning(f"Skipped (disallowed by robots.txt): {loc}")
+            logging.debug(f"Skipped (disallowed by robots.txt): {loc}")
+            inc("urls_disallowed_total")
 
-    return urls
 
+def save_urls_to_file(urls: Iterable[str | SitemapEntry], filename) -> int:
+    """
+    Save URLs to a text file, one per line, followed by a tab and the lastmod date if known.
 
-def save_urls_to_file(urls, filename) -> None:
-    """Save a list of URLs to a text file."""
+    Accepts plain URLs or (url, lastmod) entries, and consumes them lazily.
+    """
+    count = 0
     with open(filename, "w", encoding="utf-8") as f:
-        for url in urls:
-            f.write(url + "\n")
-    logging.info(f"Saved {len(urls)} URLs to {filename}")
+        for entry in urls:
+            url, lastmod = entry if isinstance(entry, tuple) else (entry, None)
+            f.write(f"{url}\t{lastmod}\n" if lastmod else url + "\n")
+            count += 1
+    logging.info(f"Saved {count} URLs to {filename}")
+    return count
+
 
+def load_urls_from_file(filename) -> dict[str, str | None]:
+    """Load URLs (and lastmod dates, where present) saved by save_urls_to_file."""
+    urls = {}
+    with open(filename, "r", encoding="utf-8") as f:
+        for line in f:
+            url, _, lastmod = line.strip().partition("\t")
+            if url:
+                urls[url] = lastmod or None
+    return urls
+
+
+def iter_all_urls(
+    workers: int = SITEMAP_WORKERS, sitemap_url: str = SITEMAP_URL, robots_url: str = ROBOTS_URL
+) -> Iterator[SitemapEntry]:
+    """
+    Stream (url, lastmod) entries from all Minecraft Wiki sitemaps.
 
-def collect_all_urls() -> list[str]:
-    """Collect all URLs from Minecraft Wiki sitemaps (run once per month)."""
+    Sitemaps are downloaded in parallel and their entries handed over through a
+    bounded queue, so memory stays flat however many URLs there are.
+    """
     # Parse robots.txt
     rp = RobotFileParser()
-    rp.set_url("https://minecraft.wiki/robots.txt")
+    rp.set_url(robots_url)
     rp.read()
 
     logging.info("Starting URL collection from sitemaps...")
 
     # Fetch the sitemap index
-    sitemap_locations = fetch_sitemap_index(SITEMAP_URL)
+    sitemap_locations = fetch_sitemap_index(sitemap_url)
 
-    all_urls = []
+    entries: queue.Queue = queue.Queue(maxsize=10_000)
+    stop = threading.Event()
+    done = object()  # Sentinel each worker puts when its sitemap is finished
 
-    # Process all sitemaps
-    for sitemap_loc in sitemap_locations:
-        root = fetch_sitemap(sitemap_loc.string)
-        urls = extract_urls_from_sitemap(root, rp)
-        all_urls.extend(urls)
+    def put(item) -> bool:
+        # Give up if the consumer has stopped reading, instead of blocking forever
+        while not stop.is_set():
+            try:
+                entries.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
 
-        # Small delay between sitemap files to be polite
-        time.sleep(0.1)
+    def worker(sitemap_loc: str) -> None:
+        try:
+            for entry in extract_urls_from_sitemap(fetch_sitemap(sitemap_loc), rp):
+                if not put(entry):
+                    return
+        finally:
+            put(done)
 
-    return all_urls
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(worker, loc) for loc in sitemap_locations]
+        try:
+            remaining = len(futures)
+            while remaining:
+                item = entries.get()
+                if item is done:
+                    remaining -= 1
+                else:
+                    yield item
+        finally:
+            stop.set()
 
+    # Surface any download or parse errors
+    for future in futures:
+        future.result()
+    http_client.get_client().report_stats()
 
-def filter_urls(urls: list[str], blacklist: list[str]) -> list[str]:
-    """Filter out URLs that contains any of the specified keywords."""
-    filtered = []
-    for url in urls:
-        if any(keyword in url for keyword in blacklist):
-            logging.info(f"Filtered out URL: {url}")
-        else:
-            filtered.append(url)
-    logging.info(f"Filtered URLs count: {len(filtered)}")
-    return filtered
+
+def collect_all_urls() -> dict[str, str | None]:
+    """Collect all URLs (mapped to their lastmod dates) from Minecraft Wiki sitemaps."""
+    return dict(iter_all_urls())
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """
+    Build a regex alternation for literal words, merging common prefixes into a trie.
+
+    A trie-shaped pattern lets the regex engine reject most positions after one
+    character instead of trying every alternative in turn.
+    """
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}  # End of a word
+
+    def build(node: dict) -> str:
+        is_end = "" in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        if is_end:
+            return f"(?:{body})?"
+        return body
+
+    return build(trie)
+
+
+class UrlFilter:
+    """
+    URL blacklist compiled once into trie-shaped regexes.
+
+    Substring rules match anywhere in the URL; prefix rules only match at the start
+    of the page title (right after "/w/"), which is how wiki namespaces like
+    "Talk:" or "Module:" appear.
+    """
+
+    def __init__(self, substrings: Iterable[str] = (), prefixes: Iterable[str] = ()):
+        self.substrings = list(substrings)
+        self.prefixes = list(prefixes)
+        # Kept as two patterns: each starts with a literal, which the regex engine scans for quickly
+        self.prefix_pattern = (
+            re.compile(f"{re.escape(PAGE_PATH)}({_trie_pattern(self.prefixes)})") if self.prefixes else None
+        )
+        self.substring_pattern = re.compile(_trie_pattern(self.substrings)) if self.substrings else None
+        self.kept = 0
+        self.rejected: Counter[str] = Counter()  # rule → number of URLs it rejected
+
+    def match(self, url: str) -> str | None:
+        """Return the rule that rejects the URL, or None if it is allowed."""
+        if self.prefix_pattern:
+            m = self.prefix_pattern.search(url)
+            if m:
+                return m.group(1)
+        if self.substring_pattern:
+            m = self.substring_pattern.search(url)
+            if m:
+                return m.group(0)
+        return None
+
+    def filter(self, urls: Iterable, key: Callable[..., str] | None = None) -> Iterator:
+        """Lazily yield the items whose URL is not blacklisted, counting rejections per rule."""
+        match = self.match
+        rejected = self.rejected
+        for item in urls:
+            rule = match(key(item) if key else item)
+            if rule is None:
+                self.kept += 1
+                yield item
+            else:
+                rejected[rule] += 1
+
+    def log_stats(self) -> None:
+        for rule, count in self.rejected.items():
+            inc("urls_filtered_total", count, {"rule": rule})
+        inc("urls_kept_total", self.kept)
+        total_rejected = sum(self.rejected.values())
+        top_rules = ", ".join(f"{rule}: {count}" for rule, count in self.rejected.most_common())
+        logging.info(f"Filtered URLs count: {self.kept} kept, {total_rejected} filtered out ({top_rules})")
+
+
+def filter_urls(
+    urls: Iterable, blacklist: "list[str] | UrlFilter", key: Callable[..., str] | None = None
+) -> Iterator:
+    """
+    Filter out URLs that contains any of the specified keywords.
+
+    Lazily yields the items kept; `key` extracts the URL from each item (e.g. from
+    (url, lastmod) sitemap entries). `blacklist` is a list of substrings or a
+    prebuilt UrlFilter (for prefix rules). Stats are logged once, at the end.
+    """
+    url_filter = blacklist if isinstance(blacklist, UrlFilter) else UrlFilter(substrings=blacklist)
+    yield from url_filter.filter(urls, key=key)
+    url_filter.log_stats()
+
+
+def iter_page_urls(
+    workers: int = SITEMAP_WORKERS, sitemap_url: str = SITEMAP_URL, robots_url: str = ROBOTS_URL
+) -> Iterator[SitemapEntry]:
+    """
+    Stream the (url, lastmod) sitemap entries of every page to crawl: allowed by robots.txt and not blacklisted.
+
+    `sitemap_url` and `robots_url` point the crawl elsewhere, e.g. at a local mirror or stub.
+    """
+    url_filter = UrlFilter(URL_BLACKLIST, NAMESPACE_BLACKLIST)
+    return filter_urls(iter_all_urls(workers, sitemap_url, robots_url), url_filter, key=lambda entry: entry[0])
 
 
 def fetch_page(url) -> str:
-    r = requests.get(url, headers=HEADERS, timeout=10)
+    r = http_client.get(url)
     r.raise_for_status()
     return r.text
 
 
 if __name__ == "__main__":
-    urls = collect_all_urls()
-    blacklist = [
-        "Bedrock_Edition",
-        "Bedrock_Editor",
-        "Calculators",
-        "Character_Creator",
-        "Education_Edition",
-        "LEGO_Minecraft",
-        "Launcher",
-        "Console",
-        "MinecraftEdu",
-        "Minecraft_",
-        "Nintendo",
-        "PlayStation",
-        "Pocket_Edition",
-        "Technical_blocks",
-        "Wii",
-        "Xbox",
-        "Talk:",
-        "Minecraft_Wiki:",
-        "MediaWiki:",
-        "Template:",
-        "Category",
-        "Module:",
-        "Dungeons:",
-        "Earth:",
-        "Story_Mode:",
-        "Legends:",
-        "Forum:",
-        "Tutorial:",
-        "Movie",
-        "talk:",
-    ]
-    filtered_urls = filter_urls(urls, blacklist)
-    save_urls_to_file(filtered_urls, "minecraft_urls.txt")
+    configure_logging()
+    save_urls_to_file(iter_page_urls(), URLS_FILE)
@@ -0,0 +1,174 @@
+import argparse
+import logging
+import re
+import zlib
+from collections.abc import Sequence
+from typing import TypedDict
+
+import numpy as np
+
+from chunking import TOKEN_MODEL, ChunkType
+from tokens import count_tokens
+
+NUM_PERM = 64  # MinHash permutations per signature
+
+BANDS = 16  # LSH bands; NUM_PERM / BANDS rows each, so pairs above ~0.5 similarity become candidates
+
+THRESHOLD = 0.8  # estimated Jaccard similarity at which two chunks count as near-duplicates
+
+SHINGLE_SIZE = 3  # words per shingle
+
+PRIME = (1 << 32) + 15  # smallest prime above the 32-bit shingle hashes
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+class DedupReport(TypedDict):
+    chunks: int
+    unique: int
+    exact_duplicates: int
+    near_duplicates: int
+    tokens: int
+    tokens_saved: int
+
+
+def chunk_body(text: str) -> str:
+    """Chunk text without its leading "[title | section]" header, which differs on every page."""
+    first, _, rest = text.partition("\n")
+    if first.startswith("[") and first.endswith("]"):
+        return rest
+    return text
+
+
+def shingle_hashes(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """CRC32 hashes of the distinct word n-grams of a text (lowercased, punctuation ignored)."""
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < size:
+        return np.empty(0, dtype=np.uint64)
+    grams = {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+    return np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.uint64, count=len(grams))
+
+
+class MinHasher:
+    """MinHash signatures from universal hashing (a * x + b) mod p of 32-bit shingle hashes."""
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        # a, b and x are all below 2**32, so a * x + b cannot overflow uint64 before the modulo
+        self.a = rng.integers(1, (1 << 32) - 1, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, (1 << 32) - 1, num_perm, dtype=np.uint64)
+        self.num_perm = num_perm
+
+    def signature(self, hashes: np.ndarray) -> np.ndarray:
+        if not len(hashes):
+            return np.full(self.num_perm, np.iinfo(np.uint64).max, dtype=np.uint64)
+        return ((np.outer(hashes, self.a) + self.b) % np.uint64(PRIME)).min(axis=0)
+
+
+def find_duplicates(
+    texts: Sequence[str], threshold: float = THRESHOLD, num_perm: int = NUM_PERM, bands: int = BANDS
+) -> list[int]:
+    """
+    Map every text to the index of its canonical copy: the first text it duplicates, or itself.
+
+    Exact duplicates (after whitespace and case normalisation) are found by
+    hashing. Near-duplicates are found with MinHash LSH: texts sharing any band
+    of their signature are candidates, and a candidate counts if its estimated
+    Jaccard similarity with the earlier text is at least `threshold`. Texts too
+    short to shingle are only matched exactly.
+
+    Returns:
+        list of int: canonical[i] <= i for each text; canonical[i] == i for texts kept.
+    """
+    canonical = list(range(len(texts)))
+    exact: dict[str, int] = {}
+    minhasher = MinHasher(num_perm)
+    rows = num_perm // bands
+    buckets: list[dict[bytes, list[int]]] = [{} for _ in range(bands)]
+    signatures: dict[int, np.ndarray] = {}
+
+    for i, text in enumerate(texts):
+        normalized = " ".join(text.split()).lower()
+        first = exact.setdefault(normalized, i)
+        if first != i:
+            canonical[i] = canonical[first]
+            continue
+
+        hashes = shingle_hashes(normalized)
+        if not len(hashes):
+            continue
+        signature = minhasher.signature(hashes)
+        signatures[i] = signature
+        match = None
+        keys = [signature[band * rows : (band + 1) * rows].tobytes() for band in range(bands)]
+        for band, key in enumerate(keys):
+            for candidate in buckets[band].get(key, ()):
+                if match is None or candidate < match:
+                    if np.mean(signatures[candidate] == signature) >= threshold:
+                        match = candidate
+        if match is not None:
+            canonical[i] = canonical[match]
+            continue
+        for band, key in enumerate(keys):
+            buckets[band].setdefault(key, []).append(i)  # Only canonical texts are matched against
+    return canonical
+
+
+def dedupe_chunks(
+    chunks: Sequence[ChunkType], threshold: float = THRESHOLD, model: str = TOKEN_MODEL
+) -> tuple[list[int], DedupReport]:
+    """
+    Find duplicate chunks across a corpus, comparing chunk bodies without their page headers.
+
+    Returns:
+        tuple: (canonical index for every chunk as in find_duplicates, DedupReport). Tokens
+        saved are the tokens of every chunk that need not be embedded.
+    """
+    bodies = [chunk_body(chunk["text"]) for chunk in chunks]
+    canonical = find_duplicates(bodies, threshold)
+    report: DedupReport = {
+        "chunks": len(chunks),
+        "unique": 0,
+        "exact_duplicates": 0,
+        "near_duplicates": 0,
+        "tokens": 0,
+        "tokens_saved": 0,
+    }
+    for i, chunk in enumerate(chunks):
+        tokens = count_tokens(chunk["text"], model)
+        report["tokens"] += tokens
+        if canonical[i] == i:
+            report["unique"] += 1
+            continue
+        report["tokens_saved"] += tokens
+        exact = " ".join(bodies[i].split()).lower() == " ".join(bodies[canonical[i]].split()).lower()
+        report["exact_duplicates" if exact else "near_duplicates"] += 1
+    return canonical, report
+
+
+def log_report(report: DedupReport, dimension: int | None = None) -> None:
+    """Log how much embedding volume (and, given the vector dimension, flat index size) dedupe saved."""
+    duplicates = report["chunks"] - report["unique"]
+    saved = f"{report['tokens_saved']}/{report['tokens']} tokens"
+    if dimension:
+        saved += f", {duplicates * dimension * 4 / 1e6:.1f} MB of vectors"
+    logging.info(
+        f"Dedupe: {duplicates}/{report['chunks']} chunks are duplicates "
+        f"({report['exact_duplicates']} exact, {report['near_duplicates']} near); saved {saved}"
+    )
+
+
+if __name__ == "__main__":
+    from embedding import iter_chunk_files
+    from metrics import configure_logging
+
+    arg_parser = argparse.ArgumentParser(description="Report exact and near-duplicate chunks in a chunk folder")
+    arg_parser.add_argument("folder", help="Folder of chunk files (e.g. chunks/)")
+    arg_parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    arg_parser.add_argument("--dimension", type=int, default=1536, help="Embedding dimension for the size estimate")
+    args = arg_parser.parse_args()
+
+    configure_logging()
+    _, report = dedupe_chunks(list(iter_chunk_files(args.folder)), args.threshold)
+    log_report(report, args.dimension)
+    print(report)
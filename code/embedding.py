@@ -1,18 +1,137 @@
+import hashlib
+import json
+import logging
 import os
-import numpy as np
-from openai import OpenAI
-from dotenv import load_dotenv
-import faiss
+import random
+import threading
+import time
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING
 
+from chunking import ChunkType
+from metrics import COUNT_BUCKETS, inc, observe
+from tokens import count_tokens
 
-load_dotenv()
-api_key = os.getenv("OPENAI_API_KEY")
+if TYPE_CHECKING:
+    import numpy as np
+    from openai import OpenAI
 
-# Initialize OpenAI client
-client = OpenAI(api_key=api_key)
+    from embedding_cache import EmbeddingCache
 
+EMBEDDING_MODEL = "text-embedding-ada-002"
 
-def embed_texts(texts: list[str], model="text-embedding-ada-002"):
+MAX_BATCH_INPUTS = 2048  # OpenAI limit on inputs per embeddings request
+
+MAX_BATCH_TOKENS = 300_000  # OpenAI limit on tokens summed across a request
+
+MAX_CONCURRENCY = 4  # embedding requests in flight at once
+
+MAX_RETRIES = 6
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+METRICS = ("l2", "ip", "cosine")
+
+_client: "OpenAI | None" = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> "OpenAI":
+    """
+    Return the OpenAI client, creating it on first use.
+
+    openai (slow to import) and the API key (from the environment or .env) are
+    only needed once something is embedded with OpenAI.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            from dotenv import load_dotenv
+            from openai import OpenAI
+
+            load_dotenv()
+            _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return _client
+
+
+class Embedder:
+    """
+    Embedding provider interface.
+
+    Subclasses implement `embed` and describe their request limits so the
+    pipeline can batch inputs to fit them.
+    """
+
+    model: str
+    dimension: int
+    max_batch_inputs: int = MAX_BATCH_INPUTS
+    max_batch_tokens: int = MAX_BATCH_TOKENS
+    retryable_errors: tuple[type[Exception], ...] = ()
+
+    def embed(self, texts: list[str]) -> "np.ndarray":
+        """Embed a batch of texts, returning a (len(texts), dimension) float32 array."""
+        raise NotImplementedError
+
+
+class OpenAIEmbedder(Embedder):
+    """Embeddings from the OpenAI API."""
+
+    # Output sizes of the OpenAI embedding models
+    DIMENSIONS = {
+        "text-embedding-ada-002": 1536,
+        "text-embedding-3-small": 1536,
+        "text-embedding-3-large": 3072,
+    }
+
+    def __init__(self, model: str = EMBEDDING_MODEL, client: "OpenAI | None" = None):
+        import openai
+
+        self.model = model
+        self.dimension = self.DIMENSIONS[model]
+        self.client = client
+        self.retryable_errors = (
+            openai.RateLimitError,
+            openai.APITimeoutError,
+            openai.APIConnectionError,
+            openai.InternalServerError,
+        )
+
+    def embed(self, texts: list[str]) -> "np.ndarray":
+        import numpy as np
+
+        client = self.client or get_client()
+        response = client.embeddings.create(model=self.model, input=texts)
+        return np.asarray([data_point.embedding for data_point in response.data], dtype=np.float32)
+
+
+class FakeEmbedder(Embedder):
+    """
+    Deterministic local embedder for tests and benchmarks.
+
+    Each text maps to a fixed unit vector seeded by its hash, so identical texts
+    always get identical vectors and no network access is needed.
+    """
+
+    def __init__(self, dimension: int = 64, model: str = "fake", latency: float = 0.0):
+        self.model = model
+        self.dimension = dimension
+        self.latency = latency  # simulated seconds per request
+
+    def embed(self, texts: list[str]) -> "np.ndarray":
+        import numpy as np
+
+        if self.latency:
+            time.sleep(self.latency)
+        vectors = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for i, text in enumerate(texts):
+            seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+            vectors[i] = np.random.default_rng(seed).standard_normal(self.dimension, dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors
+
+
+def embed_texts(texts: list[str], model=EMBEDDING_MODEL):
     """
     Generate embeddings for a list of texts using OpenAI's embedding model.
 
@@ -23,24 +142,298 @@ def embed_texts(texts: list[str], model="text-embedding-ada-002"):
     Returns:
         list of np.ndarray: The embeddings for the input texts.
     """
-    response = client.embeddings.create(model=model, input=texts)
+    import numpy as np
+
+    response = get_client().embeddings.create(model=model, input=texts)
     embeddings = [np.array(data_point.embedding) for data_point in response.data]
     return embeddings
 
 
-def create_faiss_index(embeddings: list[np.ndarray]):
+def batch_by_tokens(
+    texts: Sequence[str], model: str, max_tokens: int = MAX_BATCH_TOKENS, max_inputs: int = MAX_BATCH_INPUTS
+) -> Iterator[tuple[int, int]]:
+    """
+    Split texts into consecutive batches that fit a provider's token and input limits.
+
+    Yields:
+        tuple[int, int]: (start, end) index ranges into `texts`.
+    """
+    start = 0
+    tokens = 0
+    for i, text in enumerate(texts):
+        n = count_tokens(text, model)
+        if i > start and (tokens + n > max_tokens or i - start >= max_inputs):
+            yield start, i
+            start, tokens = i, 0
+        tokens += n
+    if start < len(texts):
+        yield start, len(texts)
+
+
+def _embed_with_retry(embedder: Embedder, texts: list[str], max_retries: int = MAX_RETRIES) -> "np.ndarray":
+    """Embed one batch, retrying rate limits and transient errors with exponential backoff and jitter."""
+    for attempt in range(max_retries + 1):
+        start = time.perf_counter()
+        try:
+            vectors = embedder.embed(texts)
+        except embedder.retryable_errors as e:
+            inc("embed_errors_total", labels={"error": type(e).__name__})
+            if attempt == max_retries:
+                raise
+            delay = min(60, 2**attempt) + random.uniform(0, 1)
+            logging.warning(f"Embedding batch failed ({e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+        observe("embed_batch_seconds", time.perf_counter() - start, {"model": embedder.model})
+        observe("embed_batch_texts", len(texts), buckets=COUNT_BUCKETS)
+        return vectors
+
+
+def embed_batched(
+    texts: Sequence[str], embedder: Embedder, max_concurrency: int = MAX_CONCURRENCY
+) -> "np.ndarray":
+    """
+    Embed texts in token-budgeted batches, several requests at a time.
+
+    Vectors are written straight into one preallocated float32 matrix.
+
+    Args:
+        texts (sequence of str): The texts to embed.
+        embedder (Embedder): The embedding provider.
+        max_concurrency (int): Maximum number of requests in flight.
+
+    Returns:
+        np.ndarray: A (len(texts), embedder.dimension) float32 matrix, rows in input order.
+    """
+    import numpy as np
+
+    matrix = np.empty((len(texts), embedder.dimension), dtype=np.float32)
+    batches = batch_by_tokens(texts, embedder.model, embedder.max_batch_tokens, embedder.max_batch_inputs)
+    done = 0
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        pending = {}
+
+        def submit_next() -> None:
+            batch = next(batches, None)
+            if batch is not None:
+                start, end = batch
+                pending[pool.submit(_embed_with_retry, embedder, list(texts[start:end]))] = batch
+
+        for _ in range(max_concurrency):
+            submit_next()
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                start, end = pending.pop(future)
+                matrix[start:end] = future.result()
+                done += end - start
+                submit_next()
+            logging.info(f"Embedded {done}/{len(texts)} texts")
+    return matrix
+
+
+def iter_chunk_files(folder: str) -> Iterator[ChunkType]:
+    """Stream chunks from the per-page chunk files written by main.load_and_chunk."""
+    for filename in sorted(os.listdir(folder)):
+        if not filename.endswith(".json"):
+            continue
+        with open(os.path.join(folder, filename), "r", encoding="utf-8") as f:
+            yield from json.load(f)
+
+
+def embed_chunks(
+    chunks: Iterable[ChunkType],
+    embedder: Embedder,
+    max_concurrency: int = MAX_CONCURRENCY,
+    cache: "EmbeddingCache | None" = None,
+) -> "tuple[np.ndarray, list[dict[str, str]]]":
+    """
+    Embed chunks (e.g. from iter_chunk_files), keeping their metadata aligned with the rows.
+
+    With an EmbeddingCache (see embedding_cache.py), only chunks whose text has
+    not been embedded before are sent to the provider.
+
+    Returns:
+        tuple: (float32 embedding matrix, list of chunk metadata in row order).
+    """
+    texts = []
+    metadata = []
+    for chunk in chunks:
+        texts.append(chunk["text"])
+        metadata.append(chunk["metadata"])
+    if cache is not None:
+        return cache.embed(texts, embedder, max_concurrency), metadata
+    return embed_batched(texts, embedder, max_concurrency), metadata
+
+
+def _as_matrix(embeddings: "np.ndarray | list[np.ndarray]") -> "np.ndarray":
+    """Return embeddings as a contiguous float32 matrix, without copying if they already are one."""
+    import numpy as np
+
+    if isinstance(embeddings, np.ndarray):
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+    return np.vstack(embeddings).astype(np.float32)
+
+
+def prepare_vectors(vectors: "np.ndarray | list[np.ndarray]", metric: str = "l2") -> "np.ndarray":
+    """Convert vectors (documents or queries) to the form an index of the given metric expects."""
+    import faiss
+
+    matrix = _as_matrix(vectors)
+    if metric == "cosine":
+        matrix = matrix.copy()
+        faiss.normalize_L2(matrix)  # Cosine similarity is inner product on unit vectors
+    return matrix
+
+
+def _pq_subquantizers(dimension: int) -> int:
+    """Pick a PQ subquantizer count that divides the dimension (at least 8 dims each)."""
+    for m in (96, 64, 48, 32, 24, 16, 8, 4, 2, 1):
+        if dimension % m == 0 and dimension // m >= 8:
+            return m
+    return 1
+
+
+def build_index(
+    embeddings: "np.ndarray | list[np.ndarray]",
+    index_type: str = "flat",
+    metric: str = "l2",
+    nlist: int | None = None,
+    pq_m: int | None = None,
+    pq_nbits: int = 8,
+    hnsw_m: int = 32,
+    nprobe: int = 16,
+    ef_search: int = 64,
+    train_size: int | None = None,
+    seed: int = 0,
+    ids: "np.ndarray | None" = None,
+):
+    """
+    Build a FAISS index of the given type over the embeddings.
+
+    Args:
+        embeddings (np.ndarray or list of np.ndarray): The embeddings to index.
+        index_type (str): One of INDEX_TYPES: exact "flat", or approximate "ivf_flat", "ivf_pq", "hnsw".
+        metric (str): One of METRICS. For "cosine", vectors are L2-normalised and searched by
+            inner product; queries must go through prepare_vectors(queries, "cosine") too.
+        nlist (int | None): IVF cell count (defaults to ~4 * sqrt(n)).
+        pq_m (int | None): PQ subquantizer count; must divide the dimension.
+        pq_nbits (int): Bits per PQ code.
+        hnsw_m (int): HNSW graph degree.
+        nprobe (int): IVF cells visited per query.
+        ef_search (int): HNSW search beam width.
+        train_size (int | None): Vectors sampled to train IVF/PQ (defaults to a size FAISS is happy with).
+        seed (int): Seed for the training sample.
+        ids (np.ndarray | None): int64 ids for the rows, returned by search in place of row numbers.
+            IVF indexes store ids natively; other types are wrapped in an IndexIDMap2. Either way
+            vectors can be looked up by id with index.reconstruct.
+
+    Returns:
+        faiss.Index: The populated index.
+    """
+    import faiss
+    import numpy as np
+
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}; expected one of {INDEX_TYPES}")
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric {metric!r}; expected one of {METRICS}")
+
+    matrix = prepare_vectors(embeddings, metric)
+    n, dimension = matrix.shape
+    faiss_metric = faiss.METRIC_L2 if metric == "l2" else faiss.METRIC_INNER_PRODUCT
+
+    if index_type in ("ivf_flat", "ivf_pq"):
+        # FAISS wants ~39+ training points per cell
+        nlist = nlist or max(1, int(4 * np.sqrt(n)))
+        nlist = max(1, min(nlist, n // 39))
+    if index_type == "ivf_pq" and n < 2**pq_nbits:
+        # Each PQ codebook needs at least 2**pq_nbits training points
+        pq_nbits = max(1, int(np.log2(max(n, 2))))
+        logging.warning(f"Only {n} vectors to train on; using {pq_nbits}-bit PQ codes")
+    if index_type == "flat":
+        description = "Flat"
+    elif index_type == "ivf_flat":
+        description = f"IVF{nlist},Flat"
+    elif index_type == "ivf_pq":
+        description = f"IVF{nlist},PQ{pq_m or _pq_subquantizers(dimension)}x{pq_nbits}"
+    else:
+        description = f"HNSW{hnsw_m}"
+    index = faiss.index_factory(dimension, description, faiss_metric)
+    if ids is not None and index_type in ("ivf_flat", "ivf_pq"):
+        # IVF indexes keep their own ids (and IndexIDMap's remove_ids is broken over them)
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+    elif ids is not None:
+        index = faiss.IndexIDMap2(index)
+
+    if not index.is_trained:
+        train_size = min(n, train_size or max(50 * nlist, 40 * 2**pq_nbits))
+        sample = matrix
+        if train_size < n:
+            sample = matrix[np.random.default_rng(seed).choice(n, train_size, replace=False)]
+        index.train(sample)
+
+    if ids is not None:
+        index.add_with_ids(matrix, np.ascontiguousarray(ids, dtype=np.int64))
+    else:
+        index.add(matrix)
+    set_search_params(index, nprobe=nprobe, ef_search=ef_search)
+    logging.info(f"Built {description} index ({metric}) over {n} vectors")
+    return index
+
+
+def set_search_params(index, nprobe: int | None = None, ef_search: int | None = None) -> None:
+    """Set query-time accuracy/speed knobs on IVF (nprobe) or HNSW (efSearch) indexes."""
+    import faiss
+
+    if isinstance(index, faiss.IndexIDMap):
+        index = faiss.downcast_index(index.index)
+    if nprobe is not None:
+        try:
+            faiss.extract_index_ivf(index).nprobe = nprobe
+        except RuntimeError:
+            pass  # Not an IVF index
+    if ef_search is not None and hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search
+
+
+def save_index(index, path: str) -> None:
+    """Write an index to disk atomically."""
+    import faiss
+
+    tmp_path = path + ".tmp"
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_index(path: str, mmap: bool = True):
+    """
+    Load an index written by save_index.
+
+    With `mmap`, index data is memory-mapped read-only rather than read into RAM,
+    so start-up is fast and processes share pages; unsupported index types fall
+    back to a normal read.
+    """
+    import faiss
+
+    if mmap:
+        try:
+            return faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            logging.warning(f"Index {path} cannot be memory-mapped; reading it into memory")
+    return faiss.read_index(path)
+
+
+def create_faiss_index(embeddings: "np.ndarray | list[np.ndarray]", index_type: str = "flat", metric: str = "l2", **kwargs):
     """
     Create a FAISS index from the given embeddings.
 
     Args:
-        embeddings (list of np.ndarray): The embeddings to index.
-        dimension (int): The dimensionality of the embeddings.
+        embeddings (np.ndarray or list of np.ndarray): The embeddings to index.
+        index_type (str): Index structure; see build_index.
+        metric (str): Distance metric; see build_index.
 
     Returns:
         faiss.Index: The FAISS index containing the embeddings.
     """
-    dimension = embeddings[0].shape[0] if embeddings else 0
-    index = faiss.IndexFlatL2(dimension)
-    embedding_matrix = np.vstack(embeddings).astype("float32")
-    index.add(embedding_matrix)
-    return index
+    return build_index(embeddings, index_type=index_type, metric=metric, **kwargs)
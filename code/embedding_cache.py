@@ -0,0 +1,195 @@
+import hashlib
+import json
+import logging
+import os
+import re
+from collections.abc import Iterable, Sequence
+
+import numpy as np
+
+from embedding import MAX_CONCURRENCY, Embedder, embed_batched
+from metrics import inc
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CACHE_DIR = os.path.join(ROOT_DIR, "embedding_cache")
+
+KEY_SIZE = 16  # bytes of blake2b digest per cache key
+
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed embedding cache.
+
+    Vectors live in a flat float32 file that is memory-mapped for reads, and a
+    parallel file of fixed-size keys (hash of model name + chunk text) gives the
+    row of each vector. New vectors are appended; `compact` rewrites both files
+    keeping only rows still referenced. Files are versioned by a generation
+    number recorded in meta.json, so a crash mid-compaction never mixes keys
+    from one generation with vectors from another.
+    """
+
+    def __init__(self, model: str, dimension: int, folder: str = CACHE_DIR):
+        self.model = model
+        self.dimension = dimension
+        self.folder = os.path.join(folder, re.sub(r"[^\w.-]", "_", model))
+        os.makedirs(self.folder, exist_ok=True)
+        self.meta_path = os.path.join(self.folder, "meta.json")
+        self.generation = 0
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["dimension"] != dimension:
+                raise ValueError(f"Cache at {self.folder} holds {meta['dimension']}-d vectors, not {dimension}-d")
+            self.generation = meta["generation"]
+        else:
+            self._write_meta()
+
+        self.hits = 0
+        self.misses = 0
+        self.rows: dict[bytes, int] = {}
+        self._load()
+
+    def _paths(self, generation: int) -> tuple[str, str]:
+        return (
+            os.path.join(self.folder, f"keys.{generation}.bin"),
+            os.path.join(self.folder, f"vectors.{generation}.f32"),
+        )
+
+    def _write_meta(self) -> None:
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"model": self.model, "dimension": self.dimension, "generation": self.generation}, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def _load(self) -> None:
+        keys_path, vectors_path = self._paths(self.generation)
+        for path in (keys_path, vectors_path):
+            open(path, "ab").close()
+
+        row_bytes = self.dimension * 4
+        # An interrupted append can leave the two files at different lengths; keep only complete rows
+        count = min(os.path.getsize(keys_path) // KEY_SIZE, os.path.getsize(vectors_path) // row_bytes)
+        for path, size in ((keys_path, count * KEY_SIZE), (vectors_path, count * row_bytes)):
+            with open(path, "r+b") as f:
+                f.truncate(size)
+
+        with open(keys_path, "rb") as f:
+            data = f.read()
+        self.rows = {data[i * KEY_SIZE : (i + 1) * KEY_SIZE]: i for i in range(count)}
+        self.keys_file = open(keys_path, "ab")
+        self.vectors_file = open(vectors_path, "ab")
+        self._vectors = None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, text: str) -> bool:
+        return self.key(text) in self.rows
+
+    def key(self, text: str) -> bytes:
+        return hashlib.blake2b(f"{self.model}\0{text}".encode("utf-8"), digest_size=KEY_SIZE).digest()
+
+    def vectors(self) -> np.ndarray:
+        """Memory-mapped (rows, dimension) view of every cached vector."""
+        if self._vectors is None or len(self._vectors) != len(self.rows):
+            self.vectors_file.flush()
+            if not self.rows:
+                return np.empty((0, self.dimension), dtype=np.float32)
+            _, vectors_path = self._paths(self.generation)
+            self._vectors = np.memmap(vectors_path, dtype=np.float32, mode="r", shape=(len(self.rows), self.dimension))
+        return self._vectors
+
+    def add(self, keys: Sequence[bytes], vectors: np.ndarray) -> None:
+        """Append vectors for keys not already cached."""
+        for key, vector in zip(keys, vectors):
+            if key in self.rows:
+                continue
+            self.vectors_file.write(np.ascontiguousarray(vector, dtype=np.float32).tobytes())
+            self.keys_file.write(key)
+            self.rows[key] = len(self.rows)
+
+    def flush(self) -> None:
+        self.keys_file.flush()
+        self.vectors_file.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self.keys_file.close()
+        self.vectors_file.close()
+        self._vectors = None
+
+    def __enter__(self) -> "EmbeddingCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def embed(self, texts: Sequence[str], embedder: Embedder, max_concurrency: int = MAX_CONCURRENCY) -> np.ndarray:
+        """
+        Embed texts, sending only cache misses (each distinct text once) to the provider.
+
+        Returns:
+            np.ndarray: A (len(texts), dimension) float32 matrix, rows in input order.
+        """
+        if embedder.model != self.model or embedder.dimension != self.dimension:
+            raise ValueError(f"Cache is for {self.model}, not {embedder.model}")
+
+        keys = [self.key(text) for text in texts]
+        missing: dict[bytes, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in self.rows:
+                missing.setdefault(key, text)
+
+        if missing:
+            new_vectors = embed_batched(list(missing.values()), embedder, max_concurrency)
+            self.add(list(missing), new_vectors)
+            self.flush()
+
+        hits = len(texts) - sum(1 for key in keys if key in missing)
+        self.hits += hits
+        self.misses += len(texts) - hits
+        inc("embedding_cache_hits_total", hits)
+        inc("embedding_cache_misses_total", len(texts) - hits)
+        logging.info(
+            f"Embedding cache: {hits}/{len(texts)} hits, {len(missing)} distinct texts sent to {embedder.model}"
+        )
+
+        vectors = self.vectors()
+        return np.asarray(vectors[np.fromiter((self.rows[key] for key in keys), dtype=np.int64, count=len(keys))])
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def compact(self, live_texts: Iterable[str]) -> int:
+        """
+        Drop every cached vector whose text is not in `live_texts` (e.g. all current chunk texts).
+
+        Returns:
+            int: Number of rows evicted.
+        """
+        live_keys = {self.key(text) for text in live_texts}
+        keep = sorted(row for key, row in self.rows.items() if key in live_keys)
+        key_by_row = {row: key for key, row in self.rows.items()}
+        evicted = len(self.rows) - len(keep)
+        if not evicted:
+            return 0
+
+        vectors = self.vectors()
+        new_keys_path, new_vectors_path = self._paths(self.generation + 1)
+        with open(new_keys_path, "wb") as keys_file, open(new_vectors_path, "wb") as vectors_file:
+            for start in range(0, len(keep), 65536):
+                rows = keep[start : start + 65536]
+                keys_file.write(b"".join(key_by_row[row] for row in rows))
+                vectors_file.write(np.ascontiguousarray(vectors[rows]).tobytes())
+
+        self.close()
+        old_paths = self._paths(self.generation)
+        self.generation += 1
+        self._write_meta()  # Switch generations atomically, then clean up the old files
+        for path in old_paths:
+            os.remove(path)
+        self._load()
+        logging.info(f"Embedding cache: compacted, evicted {evicted} rows, {len(self.rows)} remain")
+        return evicted
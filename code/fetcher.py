@@ -0,0 +1,348 @@
+import logging
+import os
+import threading
+import time
+from collections.abc import Collection, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from urllib.robotparser import RobotFileParser
+
+import requests
+
+from crawler import CRAWL_DELAY, ROBOTS_URL
+from html_archive import HtmlArchive
+from http_client import CachedResponse, HttpClient, get_client
+from metrics import REGISTRY, SIZE_BUCKETS, inc, observe, timer
+from parser import MinecraftWikiParser, page_filename, page_title
+
+MAX_CONCURRENCY = 8  # simultaneous in-flight HTTP requests
+
+ARCHIVE_FLUSH_PAGES = 500  # pages archived between index writes, bounding the rescan after a crash
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting how often requests may be started."""
+
+    def __init__(self, rate: float, capacity: int = 1):
+        """
+        Args:
+            rate (float): Tokens added per second (i.e. sustained requests per second).
+            capacity (int): Maximum number of tokens that can accumulate (burst size).
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a token is available, then consume it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+
+def get_crawl_delay(robots_url: str = ROBOTS_URL, user_agent: str = "*") -> float | None:
+    """Read the Crawl-delay directive from robots.txt, or None if it is missing or unreadable."""
+    rp = RobotFileParser()
+    rp.set_url(robots_url)
+    try:
+        rp.read()
+    except OSError as e:
+        logging.warning(f"Could not read robots.txt from {robots_url}: {e}")
+        return None
+    delay = rp.crawl_delay(user_agent)
+    return float(delay) if delay is not None else None
+
+
+def resolve_rate(rate: float | None, robots_url: str | None = ROBOTS_URL) -> float:
+    """
+    Work out the request rate to use, never exceeding what robots.txt allows.
+
+    Args:
+        rate (float | None): Requested requests per second, or None for the polite default.
+        robots_url (str | None): robots.txt location, or None to skip reading it.
+
+    Returns:
+        float: Requests per second.
+    """
+    crawl_delay = get_crawl_delay(robots_url) if robots_url else None
+    if crawl_delay:
+        robots_rate = 1 / crawl_delay
+        return robots_rate if rate is None else min(rate, robots_rate)
+    if rate is None:
+        return 1 / CRAWL_DELAY
+    return rate
+
+
+def _fetch(url: str, bucket: TokenBucket, client: HttpClient) -> CachedResponse | None:
+    """Fetch a page once the rate limiter allows it. Returns the response, or None on failure."""
+    bucket.acquire()
+    start = time.perf_counter()
+    try:
+        response = client.get(url)
+    except requests.RequestException as e:
+        logging.error(f"Failed to fetch page: {url} ({e})")
+        inc("fetch_errors_total")
+        return None
+    status = "304" if response.not_modified else str(response.status_code)
+    observe("fetch_seconds", time.perf_counter() - start, {"status": status})
+    inc("fetch_pages_total", labels={"status": status})
+    if response.status_code != 200:
+        logging.error(f"Failed to fetch page: {url}")
+        return None
+    observe("fetch_bytes", len(response.content), buckets=SIZE_BUCKETS)
+    return response
+
+
+def _parse_and_save(url: str, html: str, folder: str) -> tuple[str | None, dict]:
+    """
+    Parse fetched HTML and save it as JSON. Runs inside a worker process.
+
+    Returns:
+        tuple: (saved filename or None, the worker's metrics recorded since its last task).
+    """
+    with timer("parse_seconds"):
+        parser = MinecraftWikiParser(url, html=html)
+    filename = parser.save_to_file(folder)
+    inc("parse_pages_total", labels={"result": "saved" if filename else "empty"})
+    return filename, REGISTRY.pop_state()
+
+
+def _is_saved(html: str, folder: str) -> bool:
+    """Whether the JSON file a page's HTML would be saved as already exists in `folder`."""
+    title = page_title(html)
+    return title is not None and os.path.exists(os.path.join(folder, page_filename(title)))
+
+
+def iter_fetch_and_parse(
+    urls: Iterable[str],
+    folder: str,
+    max_concurrency: int = MAX_CONCURRENCY,
+    rate: float | None = None,
+    parse_workers: int | None = None,
+    robots_url: str | None = ROBOTS_URL,
+    client: HttpClient | None = None,
+    reparse_unchanged: Collection[str] = (),
+    skip_unchanged: bool = True,
+    archive: HtmlArchive | None = None,
+) -> Iterator[tuple[str, str | None]]:
+    """
+    Fetch pages concurrently under a rate limit and parse them in a process pool, yielding results as they finish.
+
+    Network requests run on a thread pool while BeautifulSoup parsing runs on
+    separate processes, so fetching and parsing overlap. `urls` is consumed
+    lazily, a bounded window at a time, so it may be a stream (e.g. a queue fed
+    by the crawler). Pages the server reports as unchanged (HTTP 304) are not
+    re-parsed unless `skip_unchanged` is False or their JSON file is missing from
+    `folder`; otherwise their saved JSON is left as is.
+    With an `archive`, every page's raw HTML is stored so it can be re-parsed
+    later without the network (see iter_replay).
+
+    Args:
+        urls (iterable of str): Page URLs to fetch.
+        folder (str): Folder to save parsed JSON files into.
+        max_concurrency (int): Maximum number of requests in flight at once.
+        rate (float | None): Requests per second; capped by robots.txt Crawl-delay.
+        parse_workers (int | None): Number of parser processes (defaults to CPU count).
+        robots_url (str | None): robots.txt location, or None to skip reading it.
+        client (HttpClient | None): HTTP client to use (defaults to the shared caching client).
+        reparse_unchanged (collection of str): URLs to parse even when the server reports them unchanged.
+        skip_unchanged (bool): False parses every page, even those the server reports unchanged.
+        archive (HtmlArchive | None): Archive to store the raw HTML of fetched pages in.
+
+    Yields:
+        tuple: (URL, saved JSON filename) for every page fetched and parsed, or (URL, None)
+            for pages the server reported as unchanged, in completion order. Failed pages are omitted.
+    """
+    os.makedirs(folder, exist_ok=True)
+    client = client or get_client()
+    rate = resolve_rate(rate, robots_url)
+    # No bursts: requests start at least 1 / rate apart, so the Crawl-delay holds from the first request
+    # and after idle spells; concurrency only overlaps their latency
+    bucket = TokenBucket(rate, capacity=1)
+    logging.info(f"Fetching pages ({max_concurrency} concurrent, {rate:.2f} req/s)")
+
+    pending: set[Future] = set()
+    url_iter = iter(urls)
+    reparse_unchanged = set(reparse_unchanged)
+    requested = saved = unchanged = archived = 0
+
+    # Forked workers start with a copy of this process's metrics; reset them so only their own get merged back
+    with ThreadPoolExecutor(max_workers=max_concurrency) as fetch_pool, ProcessPoolExecutor(
+        max_workers=parse_workers, initializer=REGISTRY.reset
+    ) as parse_pool:
+        fetches: dict[Future, str] = {}
+        parses: dict[Future, str] = {}
+
+        def submit_fetch() -> bool:
+            nonlocal requested
+            url = next(url_iter, None)
+            if url is None:
+                return False
+            future = fetch_pool.submit(_fetch, url, bucket, client)
+            fetches[future] = url
+            pending.add(future)
+            requested += 1
+            return True
+
+        # Keep a bounded window of fetches queued so memory does not grow with the URL list
+        for _ in range(max_concurrency * 2):
+            if not submit_fetch():
+                break
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.discard(future)
+                if future in fetches:
+                    url = fetches.pop(future)
+                    response = future.result()
+                    if response is not None and archive is not None:
+                        # An unchanged page's body is already archived unless this archive is new
+                        if not response.not_modified or url not in archive:
+                            archive.put(url, response.content, response.encoding)
+                            inc("archive_pages_total")
+                            archived += 1
+                            if archived % ARCHIVE_FLUSH_PAGES == 0:
+                                archive.flush()
+                    if (
+                        response is not None
+                        and response.not_modified
+                        and skip_unchanged
+                        and url not in reparse_unchanged
+                        and _is_saved(response.text, folder)
+                    ):
+                        unchanged += 1
+                        yield url, None
+                    elif response is not None:
+                        parse_future = parse_pool.submit(_parse_and_save, url, response.text, folder)
+                        parses[parse_future] = url
+                        pending.add(parse_future)
+                    submit_fetch()
+                else:
+                    url = parses.pop(future)
+                    try:
+                        filename, worker_metrics = future.result()
+                    except Exception as e:
+                        logging.error(f"Failed to parse page: {url} ({e})")
+                        inc("parse_errors_total")
+                        continue
+                    REGISTRY.merge(worker_metrics)
+                    if filename:
+                        saved += 1
+                        yield url, filename
+
+    if archive is not None:
+        archive.flush()
+    logging.info(f"Saved {saved}/{requested} pages to {folder} ({unchanged} unchanged)")
+    client.report_stats()
+
+
+def iter_replay(
+    archive: HtmlArchive,
+    folder: str,
+    urls: Iterable[str] | None = None,
+    parse_workers: int | None = None,
+) -> Iterator[tuple[str, str]]:
+    """
+    Re-parse archived pages in a process pool without the network, yielding results as they finish.
+
+    Pages are parsed and saved exactly as iter_fetch_and_parse does, so a
+    change to the parser can be re-run over a fixed snapshot at disk and CPU speed.
+
+    Args:
+        archive (HtmlArchive): Archive written by earlier fetches.
+        folder (str): Folder to save parsed JSON files into.
+        urls (iterable of str | None): Pages to replay, consumed lazily; None replays the
+            whole archive, reading it sequentially. URLs not in the archive are skipped.
+        parse_workers (int | None): Number of parser processes (defaults to CPU count).
+
+    Yields:
+        tuple: (URL, saved JSON filename) for every page parsed, in completion order.
+    """
+    os.makedirs(folder, exist_ok=True)
+
+    def pages() -> Iterator[tuple[str, str]]:
+        if urls is None:
+            yield from archive
+            return
+        for url in urls:
+            html = archive.get(url)
+            if html is None:
+                logging.error(f"Page not in archive: {url}")
+                inc("replay_missing_total")
+                continue
+            yield url, html
+
+    page_iter = pages()
+    window = 2 * (parse_workers or os.cpu_count() or 1)
+    requested = saved = 0
+    with ProcessPoolExecutor(max_workers=parse_workers, initializer=REGISTRY.reset) as parse_pool:
+        parses: dict[Future, str] = {}
+
+        def submit_parse() -> bool:
+            nonlocal requested
+            page = next(page_iter, None)
+            if page is None:
+                return False
+            parses[parse_pool.submit(_parse_and_save, *page, folder)] = page[0]
+            requested += 1
+            return True
+
+        # Keep a bounded window of pages in flight so memory does not grow with the archive
+        for _ in range(window):
+            if not submit_parse():
+                break
+
+        while parses:
+            done, _ = wait(parses, return_when=FIRST_COMPLETED)
+            for future in done:
+                url = parses.pop(future)
+                submit_parse()
+                try:
+                    filename, worker_metrics = future.result()
+                except Exception as e:
+                    logging.error(f"Failed to parse page: {url} ({e})")
+                    inc("parse_errors_total")
+                    continue
+                REGISTRY.merge(worker_metrics)
+                if filename:
+                    saved += 1
+                    yield url, filename
+
+    logging.info(f"Replayed {saved}/{requested} pages from {archive.path} into {folder}")
+
+
+def fetch_and_parse(
+    urls: list[str],
+    folder: str,
+    max_concurrency: int = MAX_CONCURRENCY,
+    rate: float | None = None,
+    parse_workers: int | None = None,
+    robots_url: str | None = ROBOTS_URL,
+    client: HttpClient | None = None,
+    reparse_unchanged: Collection[str] = (),
+    archive: HtmlArchive | None = None,
+) -> dict[str, str | None]:
+    """
+    Fetch pages concurrently under a rate limit and parse them in a process pool.
+
+    See iter_fetch_and_parse for the arguments.
+
+    Returns:
+        dict[str, str | None]: URL → saved JSON filename for every page fetched and parsed,
+            or None for pages the server reported as unchanged. Failed pages are omitted.
+    """
+    logging.info(f"Fetching {len(urls)} pages")
+    return dict(
+        iter_fetch_and_parse(
+            urls, folder, max_concurrency, rate, parse_workers, robots_url, client, reparse_unchanged, archive=archive
+        )
+    )
@@ -0,0 +1,209 @@
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from collections.abc import Iterator
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ARCHIVE_DIR = os.path.join(ROOT_DIR, "html_archive")
+
+PACK_FILE = "pages.warc.gz"
+
+COMPRESS_LEVEL = 6  # gzip level per record; higher levels barely shrink wiki HTML further
+
+SCAN_CHUNK = 64 * 1024  # bytes of the pack fed to the decompressor at a time when rebuilding the index
+
+
+class HtmlArchive:
+    """
+    Append-only pack of raw fetched pages, one gzip member per record, with an offset index by URL.
+
+    Like a WARC file, each record is a self-contained gzip member, so the pack
+    can be read with zcat and any record decompressed on its own from its offset.
+    A record is a JSON header line ({"url", "date", "encoding", "length"}), the
+    response body exactly as fetched, and a newline. Archiving a URL again
+    appends a new version and the index points at the latest one.
+
+    The index sidecar is rebuilt from the pack if it is missing or out of date, so
+    the pack is the only source of truth; a partly written last record left by a
+    crash is truncated away when the archive is opened (as in corpus.CorpusStore).
+    """
+
+    def __init__(self, folder: str = ARCHIVE_DIR):
+        self.folder = folder
+        self.path = os.path.join(folder, PACK_FILE)
+        self.index_path = self.path + ".idx"
+        self.offsets: dict[str, tuple[int, int]] = {}  # url → (byte offset, byte length) of latest record
+        self.indexed_size = 0  # bytes of the pack covered by the index
+        self.dirty = False
+        self.lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+        self._load_index()
+        self.file = open(self.path, "a+b")
+        self.file.truncate(self.indexed_size)  # Drop any partial record left by an interrupted write
+
+    def __enter__(self) -> "HtmlArchive":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self.offsets
+
+    def urls(self) -> list[str]:
+        """Archived URLs in pack order."""
+        return [url for url, _ in sorted(self.offsets.items(), key=lambda item: item[1][0])]
+
+    def _load_index(self) -> None:
+        """Load the sidecar index, then scan any records appended after it was last written."""
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            self.indexed_size = index["size"]
+            self.offsets = {url: (offset, length) for url, (offset, length) in index["records"].items()}
+
+        data_size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if data_size < self.indexed_size:
+            # Pack was replaced or truncated; the index cannot be trusted
+            self.offsets, self.indexed_size = {}, 0
+        if data_size > self.indexed_size:
+            self._scan_from(self.indexed_size)
+
+    def _scan_from(self, offset: int) -> None:
+        """Index the complete gzip members from `offset` to the end of the pack."""
+        position = offset  # start of the member being scanned
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            data = b""  # read from the pack but not yet fed to a decompressor
+            while True:
+                decompressor = zlib.decompressobj(wbits=31)  # one gzip member
+                head = b""  # decompressed record up to its header line
+                length = 0
+                try:
+                    while not decompressor.eof:
+                        data = data or f.read(SCAN_CHUNK)
+                        if not data:
+                            break
+                        record = decompressor.decompress(data)
+                        if b"\n" not in head:
+                            head += record
+                        length += len(data) - len(decompressor.unused_data)
+                        data = decompressor.unused_data
+                except zlib.error:
+                    break
+                if not decompressor.eof:
+                    break  # Partial record from an interrupted write; truncated away when the pack is opened
+                header = json.loads(head[: head.index(b"\n")])
+                self.offsets[header["url"]] = (position, length)
+                position += length
+        self.indexed_size = position
+        self.dirty = True
+
+    def put(self, url: str, body: bytes, encoding: str | None = None) -> None:
+        """Append a page's raw response body, superseding any earlier version."""
+        header = {"url": url, "date": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "encoding": encoding}
+        header["length"] = len(body)
+        header_line = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+        member = gzip.compress(header_line + body + b"\n", compresslevel=COMPRESS_LEVEL, mtime=0)
+        with self.lock:
+            self.file.seek(0, os.SEEK_END)
+            self.file.write(member)
+            self.offsets[url] = (self.indexed_size, len(member))
+            self.indexed_size += len(member)
+            self.dirty = True
+
+    def read(self, url: str) -> tuple[dict, bytes] | None:
+        """Return (header, raw body) of a URL's latest record, or None. Reads only that record."""
+        location = self.offsets.get(url)
+        if location is None:
+            return None
+        offset, length = location
+        with self.lock:
+            self.file.flush()
+            self.file.seek(offset)
+            member = self.file.read(length)
+        return self._decode(member)
+
+    def get(self, url: str) -> str | None:
+        """Return a URL's archived HTML as text, or None if it was never archived."""
+        record = self.read(url)
+        return self._text(*record) if record else None
+
+    @staticmethod
+    def _decode(member: bytes) -> tuple[dict, bytes]:
+        record = gzip.decompress(member)
+        split = record.index(b"\n")
+        header = json.loads(record[:split])
+        return header, record[split + 1 : split + 1 + header["length"]]
+
+    @staticmethod
+    def _text(header: dict, body: bytes) -> str:
+        return body.decode(header.get("encoding") or "utf-8", errors="replace")
+
+    def __iter__(self) -> Iterator[tuple[str, str]]:
+        """Stream (url, html) for the latest record of every URL, reading the pack sequentially."""
+        with self.lock:
+            self.file.flush()
+            live = sorted(self.offsets.values())
+        with open(self.path, "rb") as f:
+            for offset, length in live:
+                f.seek(offset)
+                header, body = self._decode(f.read(length))
+                yield header["url"], self._text(header, body)
+
+    def flush(self) -> None:
+        """Flush appended records and write the index sidecar atomically."""
+        with self.lock:
+            self.file.flush()
+            if not self.dirty:
+                return
+            records = {url: [offset, length] for url, (offset, length) in self.offsets.items()}
+            size = self.indexed_size
+            self.dirty = False
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"size": size, "records": records}, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, self.index_path)
+
+    def close(self) -> None:
+        self.flush()
+        self.file.close()
+
+    def compact(self) -> int:
+        """
+        Rewrite the pack keeping only the latest record of each URL.
+
+        Returns:
+            int: Bytes reclaimed (0, without rewriting anything, if no record was superseded).
+        """
+        with self.lock:
+            self.file.flush()
+            reclaimable = self.indexed_size - sum(length for _, length in self.offsets.values())
+        if not reclaimable:
+            return 0
+        tmp_path = self.path + ".compact"
+        with open(self.path, "rb") as source, open(tmp_path, "wb") as target:
+            offsets = {}
+            for url, (offset, length) in sorted(self.offsets.items(), key=lambda item: item[1][0]):
+                source.seek(offset)
+                offsets[url] = (target.tell(), length)
+                target.write(source.read(length))
+            size = target.tell()
+        with self.lock:
+            self.file.close()
+            os.replace(tmp_path, self.path)
+            self.offsets, self.indexed_size, self.dirty = offsets, size, True
+            self.file = open(self.path, "a+b")
+        self.flush()
+        logging.info(
+            f"Compacted {self.path} to {len(offsets)} records ({size / 1e6:.1f} MB, {reclaimable / 1e6:.1f} MB freed)"
+        )
+        return reclaimable
@@ -0,0 +1,257 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections.abc import Iterable, Iterator
+
+import requests
+from requests.adapters import HTTPAdapter
+
+HEADERS = {"User-Agent": "FriendlyResearchBot/1.0 (contact: limjiantao@gmail.com)"}
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CACHE_DIR = os.path.join(ROOT_DIR, "http_cache")
+
+POOL_SIZE = 16  # keep-alive connections per host
+
+REQUEST_TIMEOUT = 10  # seconds
+
+
+class CacheStats:
+    """Thread-safe counters for cache hits/misses and bytes saved by revalidation."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.bytes_downloaded = 0
+        self.bytes_saved = 0
+        self.lock = threading.Lock()
+
+    def record_hit(self, size: int) -> None:
+        with self.lock:
+            self.hits += 1
+            self.bytes_saved += size
+
+    def record_miss(self, size: int) -> None:
+        with self.lock:
+            self.misses += 1
+            self.bytes_downloaded += size
+
+    def as_dict(self) -> dict[str, int]:
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bytes_downloaded": self.bytes_downloaded,
+                "bytes_saved": self.bytes_saved,
+            }
+
+
+class CachedResponse:
+    """Minimal response object returned by HttpClient, whether fetched or served from cache."""
+
+    def __init__(self, url: str, status_code: int, content: bytes, encoding: str | None, not_modified: bool = False):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.encoding = encoding
+        self.not_modified = not_modified  # True when the server answered 304 and the body came from cache
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}")
+
+
+class HttpCache:
+    """On-disk response cache keyed by URL, storing validators (ETag/Last-Modified) and gzipped bodies."""
+
+    def __init__(self, folder: str = CACHE_DIR):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.folder, key[:2], key)
+
+    def load_meta(self, url: str) -> dict | None:
+        """Return the stored validators for a URL, or None if it is not cached."""
+        try:
+            with open(self._path(url) + ".json", "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def has_body(self, url: str) -> bool:
+        return os.path.exists(self._path(url) + ".gz")
+
+    def load_body(self, url: str) -> bytes | None:
+        try:
+            with gzip.open(self._path(url) + ".gz", "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def iter_body(self, url: str, chunk_size: int) -> Iterator[bytes] | None:
+        """Stream a cached body back in chunks, or return None if it is no longer cached."""
+        try:
+            f = gzip.open(self._path(url) + ".gz", "rb")
+        except OSError:
+            return None
+        return self._read_chunks(f, chunk_size)
+
+    @staticmethod
+    def _read_chunks(f, chunk_size: int) -> Iterator[bytes]:
+        with f:
+            yield from iter(lambda: f.read(chunk_size), b"")
+
+    def store(self, url: str, response: requests.Response) -> None:
+        """Store a 200 response if it carries validators the server can revalidate against."""
+        for _ in self.store_chunks(url, response, [response.content]):
+            pass
+
+    def store_chunks(self, url: str, response: requests.Response, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """
+        Pass body chunks through while writing them to the cache.
+
+        The entry is only committed once the stream has been fully consumed, and only
+        if the response carries validators the server can revalidate against.
+        """
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not etag and not last_modified:
+            yield from chunks
+            return
+
+        path = self._path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write body first, then metadata, each via a temp file, so a crash never leaves a
+        # validator pointing at a missing or truncated body
+        with gzip.open(path + ".gz.tmp", "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+                yield chunk
+        os.replace(path + ".gz.tmp", path + ".gz")
+        with open(path + ".json.tmp", "w", encoding="utf-8") as f:
+            json.dump(
+                {"url": url, "etag": etag, "last_modified": last_modified, "encoding": response.encoding},
+                f,
+            )
+        os.replace(path + ".json.tmp", path + ".json")
+
+
+class HttpClient:
+    """Shared HTTP client with a pooled keep-alive session and conditional-GET caching."""
+
+    def __init__(self, cache: HttpCache | None = None, pool_size: int = POOL_SIZE):
+        self.cache = cache
+        self.stats = CacheStats()
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _send(
+        self, url: str, timeout: float, stream: bool = False, conditional: bool = True
+    ) -> tuple[requests.Response, dict | None]:
+        """
+        Send a GET, conditional on any cached copy unless `conditional` is False.
+
+        Returns:
+            tuple: The response, and the cached metadata if the server answered 304 (else None).
+        """
+        meta = self.cache.load_meta(url) if self.cache and conditional else None
+        if meta and not self.cache.has_body(url):
+            meta = None  # Body went missing from the cache; fetch it unconditionally
+        headers = {}
+        if meta:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        response = self.session.get(url, headers=headers, timeout=timeout, stream=stream)
+        return response, (meta if response.status_code == 304 else None)
+
+    def get(self, url: str, timeout: float = REQUEST_TIMEOUT) -> CachedResponse:
+        """
+        GET a URL, revalidating any cached copy with If-None-Match/If-Modified-Since.
+
+        Returns:
+            CachedResponse: The response; `not_modified` is True when the cached body was reused.
+        """
+        response, meta = self._send(url, timeout)
+        if meta:
+            body = self.cache.load_body(url)
+            if body is not None:
+                self.stats.record_hit(len(body))
+                return CachedResponse(url, 200, body, meta.get("encoding"), not_modified=True)
+            # Body was removed after it was checked for (e.g. by pruning); fetch it unconditionally
+            response, meta = self._send(url, timeout, conditional=False)
+
+        self.stats.record_miss(len(response.content))
+        if response.status_code == 200 and self.cache:
+            self.cache.store(url, response)
+        return CachedResponse(url, response.status_code, response.content, response.encoding)
+
+    def iter_content(self, url: str, chunk_size: int = 1 << 16, timeout: float = REQUEST_TIMEOUT) -> Iterator[bytes]:
+        """Stream a URL's body in chunks, with the same revalidation and caching as get()."""
+        response, meta = self._send(url, timeout, stream=True)
+        body = self.cache.iter_body(url, chunk_size) if meta else None
+        if meta and body is None:
+            # Body was removed after it was checked for; fetch it unconditionally
+            response.close()
+            response, meta = self._send(url, timeout, stream=True, conditional=False)
+        size = 0
+        with response:
+            if body is not None:
+                for chunk in body:
+                    size += len(chunk)
+                    yield chunk
+                self.stats.record_hit(size)
+                return
+
+            response.raise_for_status()
+            chunks = response.iter_content(chunk_size)
+            if self.cache and response.status_code == 200:
+                chunks = self.cache.store_chunks(url, response, chunks)
+            for chunk in chunks:
+                size += len(chunk)
+                yield chunk
+            self.stats.record_miss(size)
+
+    def report_stats(self) -> dict[str, int]:
+        """Log and return cache hit/miss counts and bytes saved so far."""
+        stats = self.stats.as_dict()
+        total = stats["hits"] + stats["misses"]
+        hit_rate = stats["hits"] / total if total else 0.0
+        logging.info(
+            f"HTTP cache: {stats['hits']} hits, {stats['misses']} misses ({hit_rate:.1%} hit rate), "
+            f"{stats['bytes_downloaded'] / 1e6:.1f} MB downloaded, {stats['bytes_saved'] / 1e6:.1f} MB saved"
+        )
+        return stats
+
+
+_client: HttpClient | None = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> HttpClient:
+    """Return the process-wide HttpClient, creating it (with the default disk cache) on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient(HttpCache())
+        return _client
+
+
+def get(url: str, timeout: float = REQUEST_TIMEOUT) -> CachedResponse:
+    """GET a URL through the shared client."""
+    return get_client().get(url, timeout=timeout)
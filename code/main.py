@@ -1,38 +1,347 @@
-import time
+import argparse
+import json
+import logging
 import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from typing import TYPE_CHECKING
 
 from parser import MinecraftWikiParser
 from chunking import chunk_page
+from corpus import CorpusStore, import_chunk_folder, import_page_folder
+from manifest import Manifest, file_hash
+from metrics import COUNT_BUCKETS, REGISTRY, configure_logging, observe, timer
+
+# Modes that fetch (requests) or embed and index (numpy, faiss, openai) import what they need
+# when they run, so re-chunking starts quickly
+if TYPE_CHECKING:
+    from embedding import Embedder
 
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
 
+CHUNK_BATCH_SIZE = 32  # page files per worker task
+
+PROGRESS_INTERVAL = 5  # seconds between progress log lines
+
 
 def collect_and_parse():
-    with open("minecraft_urls.txt", "r", encoding="utf-8") as f:
-        urls = [line.strip() for line in f.readlines()]
+    from crawler import URLS_FILE, load_urls_from_file
+    from fetcher import fetch_and_parse
+    from html_archive import HtmlArchive
 
-    for url in urls:
-        parser = MinecraftWikiParser(url)
-        parser.save_to_file(os.path.join(ROOT_DIR, "json"))
-        time.sleep(0.1)  # Be polite with a small delay
+    urls = load_urls_from_file(URLS_FILE)
 
+    # Fetch concurrently; the rate limiter keeps us within robots.txt Crawl-delay.
+    # Raw HTML is archived so that parser changes can be replayed without the network
+    with HtmlArchive() as archive:
+        fetch_and_parse(list(urls), os.path.join(ROOT_DIR, "json"), archive=archive)
 
-def load_and_chunk():
-    source_folder = os.path.join(ROOT_DIR, "json")
-    dest_folder = os.path.join(ROOT_DIR, "chunks")
-    for filename in os.listdir(source_folder):
-        if not filename.endswith(".json"):
-            continue
-        file_path = os.path.join(source_folder, filename)
-        parser = MinecraftWikiParser.load_from_file(file_path)
+
+def replay_and_parse(
+    archive_folder: str | None = None, json_folder: str | None = None, parse_workers: int | None = None
+) -> int:
+    """
+    Re-parse every archived page into json/ without the network (see fetcher.iter_replay).
+
+    Returns:
+        int: Number of pages saved.
+    """
+    from fetcher import iter_replay
+    from html_archive import ARCHIVE_DIR, HtmlArchive
+
+    json_folder = json_folder or os.path.join(ROOT_DIR, "json")
+    start = time.monotonic()
+    with HtmlArchive(archive_folder or ARCHIVE_DIR) as archive:
+        saved = sum(1 for _ in iter_replay(archive, json_folder, parse_workers=parse_workers))
+    elapsed = time.monotonic() - start
+    logging.info(f"Replayed {saved} pages in {elapsed:.1f}s ({saved / max(elapsed, 1e-9):.0f} pages/s)")
+    return saved
+
+
+def write_json_atomic(path: str, data, **dump_kwargs) -> None:
+    """Write JSON to a temp file beside `path`, then rename it into place so readers never see a partial file."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, **dump_kwargs)
+    os.replace(tmp_path, path)
+
+
+def chunk_file(filename: str, source_folder: str, dest_folder: str) -> str:
+    """Chunk one saved page JSON file into the destination folder. Returns the chunk filename."""
+    with timer("chunk_seconds"):
+        parser = MinecraftWikiParser.load_from_file(os.path.join(source_folder, filename))
         chunks = chunk_page(parser.title, parser.url, parser.content)
+    observe("chunks_per_page", len(chunks), buckets=COUNT_BUCKETS)
+
+    # Save chunks to a file or process further
+    write_json_atomic(os.path.join(dest_folder, filename), chunks, ensure_ascii=False, indent=2)
+    return filename
+
+
+def _chunk_batch(filenames: list[str], source_folder: str, dest_folder: str) -> tuple[int, dict]:
+    """
+    Chunk a batch of files. Runs inside a worker process; batching amortises inter-process overhead.
+
+    Returns:
+        tuple: (number of files chunked, the worker's metrics recorded since its last batch).
+    """
+    for filename in filenames:
+        chunk_file(filename, source_folder, dest_folder)
+    return len(filenames), REGISTRY.pop_state()
+
+
+def load_and_chunk(
+    source_folder: str | None = None,
+    dest_folder: str | None = None,
+    workers: int = 1,
+    batch_size: int = CHUNK_BATCH_SIZE,
+) -> int:
+    """
+    Chunk every saved page JSON file.
+
+    Args:
+        source_folder (str | None): Folder of page JSON files (defaults to json/).
+        dest_folder (str | None): Folder to write chunk files to (defaults to chunks/).
+        workers (int): Number of worker processes; 1 chunks serially in this process.
+        batch_size (int): Files handed to a worker per task.
+
+    Returns:
+        int: Number of pages chunked.
+    """
+    source_folder = source_folder or os.path.join(ROOT_DIR, "json")
+    dest_folder = dest_folder or os.path.join(ROOT_DIR, "chunks")
+    os.makedirs(dest_folder, exist_ok=True)
+    filenames = sorted(filename for filename in os.listdir(source_folder) if filename.endswith(".json"))
+
+    if workers <= 1:
+        _, batch_metrics = _chunk_batch(filenames, source_folder, dest_folder)
+        REGISTRY.merge(batch_metrics)
+        return len(filenames)
+
+    batches = iter([filenames[i : i + batch_size] for i in range(0, len(filenames), batch_size)])
+    done = 0
+    start = last_report = time.monotonic()
+    with ProcessPoolExecutor(max_workers=workers, initializer=REGISTRY.reset) as pool:
+        # Keep only a few batches per worker in flight so results and errors surface promptly
+        pending = {
+            pool.submit(_chunk_batch, batch, source_folder, dest_folder) for batch in islice(batches, workers * 2)
+        }
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                count, batch_metrics = future.result()
+                done += count
+                REGISTRY.merge(batch_metrics)
+                batch = next(batches, None)
+                if batch is not None:
+                    pending.add(pool.submit(_chunk_batch, batch, source_folder, dest_folder))
+
+            now = time.monotonic()
+            if now - last_report >= PROGRESS_INTERVAL or not pending:
+                last_report = now
+                logging.info(f"Chunked {done}/{len(filenames)} pages ({done / (now - start):.0f} pages/s)")
+    return done
+
 
-        # Save chunks to a file or process further
-        with open(os.path.join(dest_folder, f"{filename}"), "w", encoding="utf-8") as f:
-            import json
+def incremental_update(
+    urls_file: str | None = None,
+    json_folder: str | None = None,
+    chunk_folder: str | None = None,
+    manifest_path: str | None = None,
+    archive_folder: str | None = None,
+    index: bool = True,
+    store_folder: str | None = None,
+    index_type: str = "flat",
+    embedder: "Embedder | None" = None,
+    cache_folder: str | None = None,
+    **fetch_kwargs,
+) -> list[str]:
+    """
+    Fetch, parse, chunk and index only the pages that changed since the last run.
 
-            json.dump(chunks, f, ensure_ascii=False, indent=2)
+    Pages whose sitemap lastmod matches the manifest are skipped entirely, pages
+    that left the sitemap have their outputs deleted, and re-fetched pages whose
+    extracted content hashes the same as before are not re-chunked. With `index`,
+    the vector store and BM25 index are then synced with the chunk folder (see
+    index_chunks): re-chunked pages get their new chunks embedded and removed
+    pages are dropped from both indexes.
+
+    Args:
+        index (bool): Sync the vector store (`store_folder`, `index_type`, `embedder`,
+            `cache_folder`, as for index_chunks) after chunking.
+        **fetch_kwargs: Passed to fetcher.fetch_and_parse (e.g. rate, client, robots_url).
+
+    Returns:
+        list of str: URLs whose chunk files were (re)written.
+    """
+    from crawler import URLS_FILE, load_urls_from_file
+    from fetcher import fetch_and_parse
+    from html_archive import ARCHIVE_DIR, HtmlArchive
+
+    urls_file = urls_file or URLS_FILE
+    json_folder = json_folder or os.path.join(ROOT_DIR, "json")
+    chunk_folder = chunk_folder or os.path.join(ROOT_DIR, "chunks")
+    manifest = Manifest(manifest_path or os.path.join(ROOT_DIR, "manifest.json"))
+    os.makedirs(chunk_folder, exist_ok=True)
+
+    sitemap = load_urls_from_file(urls_file)
+
+    removed = manifest.removed_urls(sitemap)
+    for url in removed:
+        manifest.remove(url, json_folder, chunk_folder)
+
+    changed = manifest.changed_urls(sitemap)
+    logging.info(f"Incremental update: {len(changed)} changed, {len(removed)} removed, {len(sitemap)} total")
+
+    rechunked = []
+    # Pages missing from the manifest have no known outputs, so parse them even if the HTTP cache says 304
+    unknown = [url for url in changed if url not in manifest.entries]
+    with HtmlArchive(archive_folder or ARCHIVE_DIR) as archive:
+        fetched = fetch_and_parse(changed, json_folder, reparse_unchanged=unknown, archive=archive, **fetch_kwargs)
+    for url, filename in fetched.items():
+        previous = manifest.entries.get(url)
+        if filename is None:
+            # Server says unchanged (304); just record the new lastmod
+            if previous:
+                previous["lastmod"] = sitemap[url]
+            continue
+
+        content_hash = file_hash(os.path.join(json_folder, filename))
+        if previous and previous["content_hash"] == content_hash and previous["chunk_file"]:
+            manifest.update(url, sitemap[url], content_hash, filename, previous["chunk_file"])
+            continue
+
+        chunk_filename = chunk_file(filename, json_folder, chunk_folder)
+        manifest.update(url, sitemap[url], content_hash, filename, chunk_filename)
+        # The page title (and so the filename) may have changed; remove the old outputs
+        if previous and previous["json_file"] != filename:
+            manifest.delete_outputs(previous, json_folder, chunk_folder)
+        rechunked.append(url)
+
+    manifest.save()
+    logging.info(f"Incremental update: re-chunked {len(rechunked)} pages")
+    if index:
+        # Syncing the whole folder only embeds chunks the store does not have yet, and also
+        # catches up on changes a previous run chunked but did not get to index
+        index_chunks(chunk_folder, store_folder, index_type, embedder, cache_folder)
+    return rechunked
+
+
+def pack_corpus(
+    json_folder: str | None = None,
+    chunk_folder: str | None = None,
+    corpus_folder: str | None = None,
+    archive_folder: str | None = None,
+) -> None:
+    """
+    Rebuild packed corpus stores (pages.jsonl, chunks.jsonl) from the per-file json/ and chunks/ layouts.
+
+    The HTML archive is compacted too, dropping pages' superseded versions.
+    """
+    from html_archive import ARCHIVE_DIR, PACK_FILE, HtmlArchive
+
+    json_folder = json_folder or os.path.join(ROOT_DIR, "json")
+    chunk_folder = chunk_folder or os.path.join(ROOT_DIR, "chunks")
+    corpus_folder = corpus_folder or os.path.join(ROOT_DIR, "corpus")
+    for folder, store_name, import_folder in (
+        (json_folder, "pages.jsonl", import_page_folder),
+        (chunk_folder, "chunks.jsonl", import_chunk_folder),
+    ):
+        if not os.path.isdir(folder):
+            continue
+        store_path = os.path.join(corpus_folder, store_name)
+        for path in (store_path, store_path + ".idx"):
+            if os.path.exists(path):
+                os.remove(path)
+        with CorpusStore(store_path) as store:
+            import_folder(folder, store)
+
+    archive_folder = archive_folder or ARCHIVE_DIR
+    if os.path.exists(os.path.join(archive_folder, PACK_FILE)):
+        with HtmlArchive(archive_folder) as archive:
+            archive.compact()
+
+
+def index_chunks(
+    chunk_folder: str | None = None,
+    store_folder: str | None = None,
+    index_type: str = "flat",
+    embedder: "Embedder | None" = None,
+    cache_folder: str | None = None,
+) -> None:
+    """
+    Embed new chunks and sync the vector store and its BM25 index with chunks/.
+
+    Unchanged chunks are neither re-embedded nor re-indexed, and the embedding
+    cache is compacted down to the chunks the store still holds.
+    """
+    from bm25 import LEXICAL_FILE, BM25Index
+    from embedding import OpenAIEmbedder
+    from embedding_cache import CACHE_DIR, EmbeddingCache
+    from vector_store import VectorStore, sync_chunk_folder
+
+    cache_folder = cache_folder or CACHE_DIR
+    chunk_folder = chunk_folder or os.path.join(ROOT_DIR, "chunks")
+    store_folder = store_folder or os.path.join(ROOT_DIR, "vector_store")
+    embedder = embedder or OpenAIEmbedder()
+    with EmbeddingCache(embedder.model, embedder.dimension, cache_folder) as cache, VectorStore(
+        store_folder, index_type=index_type
+    ) as store:
+        sync_chunk_folder(
+            chunk_folder, store, lambda texts: cache.embed(texts, embedder), cached=lambda text: text in cache
+        )
+        # Vectors of chunks that were edited or removed since they were embedded are never read again
+        cache.compact(store.texts())
+
+        lexical_path = os.path.join(store_folder, LEXICAL_FILE)
+        lexical = BM25Index.load(lexical_path) if os.path.exists(lexical_path) else BM25Index()
+        lexical.sync(store)
+        lexical.save(lexical_path)
 
 
 if __name__ == "__main__":
-    load_and_chunk()
+    arg_parser = argparse.ArgumentParser(description="Minecraft Wiki processing")
+    arg_parser.add_argument(
+        "mode",
+        nargs="?",
+        choices=["chunk", "incremental", "replay", "pack", "index"],
+        default="chunk",
+        help=(
+            "'chunk' re-chunks every saved page; "
+            "'incremental' refreshes and re-indexes only pages changed since the last run; "
+            "'replay' re-parses every page in the HTML archive into json/ without the network; "
+            "'pack' imports json/ and chunks/ into packed corpus files "
+            "and compacts the HTML archive; "
+            "'index' embeds new chunks and syncs the vector and BM25 indexes"
+        ),
+    )
+    arg_parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Worker processes for chunking, or parsing in 'replay' mode (1 = serial)",
+    )
+    arg_parser.add_argument(
+        "--index-type",
+        default="flat",
+        choices=["flat", "ivf_flat", "ivf_pq", "hnsw"],
+        help="FAISS index type for a new vector store ('index' and 'incremental' modes)",
+    )
+    arg_parser.add_argument("--metrics", help="Write run metrics here at the end (.prom for Prometheus text, else JSON)")
+    args = arg_parser.parse_args()
+
+    configure_logging()
+
+    if args.mode == "incremental":
+        incremental_update(index_type=args.index_type)
+    elif args.mode == "replay":
+        replay_and_parse(parse_workers=args.workers)
+    elif args.mode == "pack":
+        pack_corpus()
+    elif args.mode == "index":
+        index_chunks(index_type=args.index_type)
+    else:
+        load_and_chunk(workers=args.workers)
+    if args.metrics:
+        REGISTRY.dump(args.metrics)
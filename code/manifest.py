@@ -0,0 +1,92 @@
+import hashlib
+import json
+import logging
+import os
+from typing import TypedDict
+
+
+class ManifestEntry(TypedDict):
+    lastmod: str | None  # <lastmod> from the sitemap when the page was last processed
+    content_hash: str | None  # sha256 of the saved page JSON
+    json_file: str | None  # filename inside the json folder
+    chunk_file: str | None  # filename inside the chunks folder
+
+
+def file_hash(path: str) -> str:
+    """Return the sha256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """
+    Record of what was produced for every crawled URL: URL → lastmod → content hash → output files.
+
+    Used by the incremental mode to work out which pages changed or disappeared
+    since the previous run.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: dict[str, ManifestEntry] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def save(self) -> None:
+        """Write the manifest atomically so an interrupted run never leaves it half-written."""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def changed_urls(self, sitemap: dict[str, str | None]) -> list[str]:
+        """
+        Return URLs that are new, or whose sitemap lastmod differs from the recorded one.
+
+        URLs without a lastmod are always returned; the HTTP cache's conditional GET
+        then decides whether they really changed.
+        """
+        changed = []
+        for url, lastmod in sitemap.items():
+            entry = self.entries.get(url)
+            if entry is None or lastmod is None or entry["lastmod"] != lastmod or not entry["chunk_file"]:
+                changed.append(url)
+        return changed
+
+    def removed_urls(self, sitemap: dict[str, str | None]) -> list[str]:
+        """Return URLs recorded in the manifest that are no longer in the sitemap."""
+        return [url for url in self.entries if url not in sitemap]
+
+    def update(self, url: str, lastmod: str | None, content_hash: str, json_file: str, chunk_file: str | None) -> None:
+        self.entries[url] = {
+            "lastmod": lastmod,
+            "content_hash": content_hash,
+            "json_file": json_file,
+            "chunk_file": chunk_file,
+        }
+
+    def remove(self, url: str, json_folder: str, chunk_folder: str) -> None:
+        """Drop a URL from the manifest and delete its output files (unless another URL still uses them)."""
+        entry = self.entries.pop(url, None)
+        if entry is None:
+            return
+        self.delete_outputs(entry, json_folder, chunk_folder)
+
+    def delete_outputs(self, entry: ManifestEntry, json_folder: str, chunk_folder: str) -> None:
+        """Delete an entry's output files, keeping any that another manifest entry still references."""
+        json_in_use = {e["json_file"] for e in self.entries.values()}
+        chunks_in_use = {e["chunk_file"] for e in self.entries.values()}
+        for folder, filename, in_use in (
+            (json_folder, entry["json_file"], json_in_use),
+            (chunk_folder, entry["chunk_file"], chunks_in_use),
+        ):
+            if not filename or filename in in_use:
+                continue
+            path = os.path.join(folder, filename)
+            if os.path.exists(path):
+                os.remove(path)
+                logging.info(f"Deleted stale output: {path}")
@@ -0,0 +1,307 @@
+import bisect
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+LOG_FILE = os.path.join(ROOT_DIR, "output.txt")
+
+LOG_FORMAT = "%(asctime)s - %(message)s"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)  # seconds
+
+SIZE_BUCKETS = tuple(float(1 << shift) for shift in range(10, 25, 2))  # bytes, 1 KiB to 16 MiB
+
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000)  # items, e.g. chunks per page
+
+PROFILE_TOP = 25  # functions / allocation sites listed in each profile summary
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def configure_logging(filename: str | None = LOG_FILE, level: int = logging.INFO, filemode: str = "w") -> None:
+    """
+    Send log records to `filename` (or stderr if None), once per process.
+
+    Entry points call this instead of modules configuring logging on import,
+    where whichever module was imported first won and the next one's
+    filemode="w" could truncate the log mid-run.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    if filename is None:
+        logging.basicConfig(level=level, format=LOG_FORMAT)
+    else:
+        logging.basicConfig(filename=filename, level=level, format=LOG_FORMAT, filemode=filemode)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style, also tracking min and max."""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "Histogram") -> None:
+        if other.buckets != self.buckets:
+            raise ValueError("Cannot merge histograms with different buckets")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by linear interpolation within its bucket, clamped to the observed range."""
+        if not self.count:
+            return math.nan
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i else self.min
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                lower, upper = max(lower, self.min), min(upper, self.max)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.max
+
+    def summary(self) -> dict:
+        if not self.count:
+            return {"count": 0, "sum": 0.0}
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.sum / self.count,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+        }
+
+
+class Metrics:
+    """
+    Thread-safe registry of counters, gauges and histograms, keyed by name and labels.
+
+    Worker processes keep their own registry; they hand it back with `pop_state`
+    and the parent folds it in with `merge`, so process pools report like threads.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters: dict[str, dict[Labels, float]] = {}
+        self.gauges: dict[str, dict[Labels, float]] = {}
+        self.histograms: dict[str, dict[Labels, Histogram]] = {}
+
+    @staticmethod
+    def _key(labels: dict[str, str] | None) -> Labels:
+        return tuple(sorted((k, str(v)) for k, v in labels.items())) if labels else ()
+
+    def inc(self, name: str, value: float = 1, labels: dict[str, str] | None = None) -> None:
+        key = self._key(labels)
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, labels: dict[str, str] | None = None) -> None:
+        with self.lock:
+            self.gauges.setdefault(name, {})[self._key(labels)] = value
+
+    def observe(
+        self,
+        name: str,
+        value: float,
+        labels: dict[str, str] | None = None,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        key = self._key(labels)
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, labels: dict[str, str] | None = None) -> Iterator[None]:
+        """Observe the seconds spent in the block into histogram `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, labels)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.counters, self.gauges, self.histograms = {}, {}, {}
+
+    def pop_state(self) -> dict:
+        """Return everything recorded so far (picklable) and start again from empty."""
+        with self.lock:
+            state = {"counters": self.counters, "gauges": self.gauges, "histograms": self.histograms}
+            self.counters, self.gauges, self.histograms = {}, {}, {}
+        return state
+
+    def merge(self, state: dict) -> None:
+        """Fold in a state returned by pop_state (e.g. from a worker process)."""
+        with self.lock:
+            for name, series in state["counters"].items():
+                mine = self.counters.setdefault(name, {})
+                for key, value in series.items():
+                    mine[key] = mine.get(key, 0) + value
+            for name, series in state["gauges"].items():
+                self.gauges.setdefault(name, {}).update(series)
+            for name, series in state["histograms"].items():
+                mine = self.histograms.setdefault(name, {})
+                for key, histogram in series.items():
+                    if key in mine:
+                        mine[key].merge(histogram)
+                    else:
+                        mine[key] = histogram
+
+    def to_dict(self) -> dict:
+        """Counters, gauges and histogram summaries (count, sum, min, max, mean, p50/p90/p99) as plain JSON data."""
+
+        def series(values: dict[Labels, object], convert) -> list[dict]:
+            return [{"labels": dict(key), **convert(value)} for key, value in sorted(values.items())]
+
+        with self.lock:
+            return {
+                "counters": {n: series(s, lambda v: {"value": v}) for n, s in sorted(self.counters.items())},
+                "gauges": {n: series(s, lambda v: {"value": v}) for n, s in sorted(self.gauges.items())},
+                "histograms": {n: series(s, Histogram.summary) for n, s in sorted(self.histograms.items())},
+            }
+
+    def to_prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+
+        def escape(value: str) -> str:
+            return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+        def label_text(key: Labels, extra: Labels = ()) -> str:
+            pairs = key + extra
+            if not pairs:
+                return ""
+            escaped = (f'{k}="{escape(v)}"' for k, v in pairs)
+            return "{" + ",".join(escaped) + "}"
+
+        lines = []
+        with self.lock:
+            for kind, metrics in (("counter", self.counters), ("gauge", self.gauges)):
+                for name, series in sorted(metrics.items()):
+                    lines.append(f"# TYPE {name} {kind}")
+                    lines.extend(f"{name}{label_text(key)} {value:g}" for key, value in sorted(series.items()))
+            for name, series in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + (math.inf,), histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == math.inf else f"{bound:g}"
+                        lines.append(f"{name}_bucket{label_text(key, (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{label_text(key)} {histogram.sum:g}")
+                    lines.append(f"{name}_count{label_text(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str) -> None:
+        """Write the metrics to `path`: Prometheus text for .prom/.txt files, JSON otherwise."""
+        text = self.to_prometheus() if path.endswith((".prom", ".txt")) else json.dumps(self.to_dict(), indent=2)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+        logging.info(f"Wrote metrics to {path}")
+
+
+REGISTRY = Metrics()  # process-wide registry the pipeline modules record into
+
+
+def inc(name: str, value: float = 1, labels: dict[str, str] | None = None) -> None:
+    REGISTRY.inc(name, value, labels)
+
+
+def observe(
+    name: str, value: float, labels: dict[str, str] | None = None, buckets: Sequence[float] = LATENCY_BUCKETS
+) -> None:
+    REGISTRY.observe(name, value, labels, buckets)
+
+
+def timer(name: str, labels: dict[str, str] | None = None):
+    return REGISTRY.timer(name, labels)
+
+
+class Profiler:
+    """
+    Opt-in per-stage profiling: cProfile for CPU, tracemalloc for memory.
+
+    cProfile only sees the thread a stage runs on, so work a stage hands to a
+    process pool (e.g. page parsing) shows up as waiting. tracemalloc traces the
+    whole process, so with stages running concurrently a stage's snapshot also
+    holds what the others allocated; its peak is still a useful upper bound.
+    """
+
+    def __init__(self, folder: str, cpu: bool = True, memory: bool = False, top: int = PROFILE_TOP):
+        self.folder = folder
+        self.cpu = cpu
+        self.memory = memory
+        self.top = top
+        os.makedirs(folder, exist_ok=True)
+        import tracemalloc
+
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def profile(self, name: str) -> Iterator[None]:
+        """Profile the block, writing <name>.prof / <name>.memory.txt and logging the hottest entries."""
+        import cProfile
+        import io
+        import pstats
+
+        profiler = cProfile.Profile() if self.cpu else None
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                path = os.path.join(self.folder, f"{name}.prof")
+                profiler.dump_stats(path)
+                summary = io.StringIO()
+                pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(self.top)
+                logging.info(f"CPU profile of {name} saved to {path}\n{summary.getvalue()}")
+            if self.memory:
+                self._snapshot(name)
+
+    def _snapshot(self, name: str) -> None:
+        import tracemalloc
+
+        current, peak = tracemalloc.get_traced_memory()
+        REGISTRY.set("tracemalloc_peak_bytes", peak, {"stage": name})
+        stats = tracemalloc.take_snapshot().statistics("lineno")[: self.top]
+        lines = [f"current {current / 1e6:.1f} MB, peak {peak / 1e6:.1f} MB"] + [str(stat) for stat in stats]
+        path = os.path.join(self.folder, f"{name}.memory.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        logging.info(f"Memory profile of {name} saved to {path}: {lines[0]}")
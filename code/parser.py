@@ -1,281 +1,333 @@
+import importlib.util
 import os
 import re
-import requests
-from bs4 import BeautifulSoup
 import logging
 import json
-from typing import TypedDict, Literal, Union
-
-# Configure logging
-logging.basicConfig(
-    filename="output.txt",
-    level=logging.INFO,
-    format="%(asctime)s - %(message)s",
-    filemode="w",  # 'w' to overwrite, 'a' to append
+from collections.abc import Callable
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+# Block types live in blocks.py and are re-exported here for existing imports
+from blocks import (  # noqa: F401
+    CalculatorParameter,
+    CalculatorTableBlock,
+    ContentBlock,
+    ContentItem,
+    DropTableBlock,
+    InfoboxBlock,
+    ListBlock,
+    ParagraphBlock,
+    TableBlock,
 )
 
-HEADERS = {"User-Agent": "FriendlyResearchBot/1.0 (contact: limjiantao@gmail.com)"}
+if TYPE_CHECKING:
+    from bs4 import Tag
 
-# region Types
+    from html_archive import HtmlArchive
 
+# BeautifulSoup tree builders _extract is verified against (see tests/test_parser.py), fastest first; all are in
+# requirements.txt, so every install parses with the same one
+PARSER_BACKENDS = ["lxml", "html.parser"]
 
-# --- Block Types ---
-class ParagraphBlock(TypedDict):
-    type: Literal["paragraph"]
-    section: str
-    text: str
+CONTENT_CLASS_PATTERN = re.compile(r"(?:^|\s)mw-parser-output(?:\s|$)")
 
+TITLE_PATTERN = re.compile(r'<h1\b[^>]*\bid="firstHeading"[^>]*>.*?</h1>', re.DOTALL)
 
-class ListBlock(TypedDict):
-    type: Literal["list"]
-    section: str
-    items: list[str]
 
+@lru_cache(maxsize=None)
+def content_strainer():
+    """
+    SoupStrainer for the article body: only it is needed, so skip building a tree for the page chrome around it.
 
-class TableBlock(TypedDict):
-    type: Literal["table"]
-    section: str
-    data: list[list[str]]
+    The class is matched as a regex because the strainer sees the raw, unsplit class attribute.
+    Built on first use so that importing this module does not import bs4.
+    """
+    from bs4 import SoupStrainer
 
+    return SoupStrainer("div", class_=CONTENT_CLASS_PATTERN)
 
-class InfoboxBlock(TypedDict):
-    type: Literal["infobox"]
-    section: str
-    data: dict[str, str]
 
+def page_title(html: str, backend: str | None = None) -> str | None:
+    """Read a page's title from its firstHeading snippet, without building a tree for the rest of the page."""
+    title_match = TITLE_PATTERN.search(html)
+    if title_match is None:
+        return None
+    from bs4 import BeautifulSoup
 
-class DropTableBlock(TypedDict):
-    type: Literal["droptable"]
-    section: str
-    data: list[list[list[str]]]  # tables → rows → columns
+    return BeautifulSoup(title_match.group(0), backend or default_backend()).get_text()
 
 
-class CalculatorParameter(TypedDict):
-    type: Literal["slider", "radio"]
-    min: str | None
-    max: str | None
-    options: list[str]
+def page_filename(title: str) -> str:
+    """Name of the JSON file a page with this title is saved as (invalid filename characters replaced)."""
+    return re.sub(r'[<>:"/\\|?*]', "_", title) + ".json"
 
 
-class CalculatorTableBlock(TypedDict):
-    type: Literal["calculator_table"]
-    section: str
-    data: list[list[list[str]]]
-    parameters: dict[str, CalculatorParameter]
-    legend_type: str
+def default_backend() -> str:
+    """Return the fastest installed parser backend (lxml, unless requirements.txt was not installed)."""
+    for backend in PARSER_BACKENDS:
+        if backend == "html.parser" or importlib.util.find_spec(backend) is not None:
+            return backend
+    return "html.parser"
 
 
-# --- Union of all blocks ---
-ContentBlock = Union[
-    ParagraphBlock,
-    ListBlock,
-    TableBlock,
-    InfoboxBlock,
-    DropTableBlock,
-    CalculatorTableBlock,
-]
+def best_label(element) -> str:
+    """
+    Try to get the best label for an element.
+    Priority: text > <a> title > <img> alt
+    """
+    text = element.get_text()
+    if text.strip():
+        return text
+    a_tag = element.find("a")
+    if a_tag and a_tag.get("title"):
+        return a_tag["title"]
+    img_tag = element.find("img")
+    if img_tag and img_tag.get("alt"):
+        return img_tag["alt"]
+    return ""
 
 
-# --- Main page type ---
-class ContentItem(TypedDict):
-    title: str
-    url: str
-    content: list[ContentBlock]
+def table_rows(table) -> list[list[str]]:
+    """Cell labels of every non-empty row of a table."""
+    rows = []
+    for row in table.find_all("tr"):
+        cols = [best_label(col) for col in row.find_all(["td", "th"])]
+        if cols:
+            rows.append(cols)
+    return rows
+
 
+HEADER_LEVELS = {"h2": 2, "h3": 3, "h4": 4}  # headers that start a section, by depth in the section path
 
-# endregion
+# Handlers for top-level article elements by tag name, as (required class or None, handler), in priority order.
+# A handler gets the element and its section path and returns a ContentBlock, or None to skip the element.
+BLOCK_HANDLERS: dict[str, list[tuple[str | None, Callable[["Tag", str], ContentBlock | None]]]] = {}
+
+
+def block_handler(tag: str, css_class: str | None = None):
+    """
+    Register the decorated function as the handler for `tag` elements (with `css_class`, if given).
+
+    Handlers for the same tag are tried in registration order, so register the
+    more specific ones first. New block types plug in here without touching _extract.
+    """
+
+    def register(handler):
+        BLOCK_HANDLERS.setdefault(tag, []).append((css_class, handler))
+        return handler
+
+    return register
+
+
+def find_handler(element) -> Callable[["Tag", str], ContentBlock | None] | None:
+    """The first registered handler matching an element, or None (e.g. for text nodes)."""
+    handlers = BLOCK_HANDLERS.get(element.name)
+    if not handlers:
+        return None
+    classes = element.get("class", [])
+    for css_class, handler in handlers:
+        if css_class is None or css_class in classes:
+            return handler
+    return None
+
+
+@block_handler("p")
+def paragraph_block(element, section: str) -> ParagraphBlock | None:
+    paragraph_text = element.get_text().strip()
+    if paragraph_text:
+        return {"type": "paragraph", "section": section, "text": paragraph_text}
+    return None
+
+
+@block_handler("ul")
+@block_handler("ol")
+def list_block(element, section: str) -> ListBlock | None:
+    items = [li.get_text() for li in element.find_all("li")]
+    if items:
+        return {"type": "list", "section": section, "items": items}
+    return None
+
+
+@block_handler("table")
+def table_block(element, section: str) -> TableBlock | None:
+    table_data = table_rows(element)
+    if table_data:
+        return {"type": "table", "section": section, "data": table_data}
+    return None
+
+
+@block_handler("div", "infobox")
+def infobox_block(element, section: str) -> InfoboxBlock | None:
+    infobox_data = {}
+    for row in element.find_all("tr"):
+        header = row.find("th")
+        value = row.find("td")
+        if header and value:
+            infobox_data[header.get_text().strip()] = best_label(value).strip()
+    if infobox_data:
+        return {"type": "infobox", "section": section, "data": infobox_data}
+    return None
+
+
+@block_handler("div", "droptable-tabber")
+def droptable_block(element, section: str) -> DropTableBlock | None:
+    drop_tables = [rows for rows in map(table_rows, element.find_all("table")) if rows]
+    if drop_tables:
+        return {"type": "droptable", "section": section, "data": drop_tables}
+    return None
+
+
+def calculator_fields(element, field_type: str) -> tuple[list, dict[str | None, str]]:
+    """
+    Collect a calculator's input fields of one type and its field labels in one scan of `element`.
+
+    Returns:
+        tuple: (the fields in document order, {data-for: text of the first label for it}).
+            Labels without data-for are keyed by None, as fields without an id look them up.
+    """
+    fields = []
+    labels: dict[str | None, str] = {}
+    for span in element.find_all("span"):
+        classes = span.get("class", [])
+        if "calculator-field-label" in classes:
+            key = span.get("data-for")
+            if key not in labels:
+                labels[key] = span.get_text(strip=True)
+        if "calculator-field" in classes and span.get("data-calculator-type") == field_type:
+            fields.append(span)
+    return fields, labels
+
+
+@block_handler("div", "calculator-container")
+def calculator_table_block(element, section: str) -> CalculatorTableBlock | None:
+    """Calculator widget (interactive table for block breaking, etc.)."""
+    table = element.find("table")
+    if not table:
+        return None
+    table_data = table_rows(table)
+    if not table_data:
+        return None
+
+    # Extract parameter information from interactive controls
+    parameters: dict[str, CalculatorParameter] = {}
+
+    # Extract slider parameters
+    sliders, labels = calculator_fields(element, "range")
+    for slider in sliders:
+        slider_id = slider.get("id")
+        parameters[labels.get(slider_id, slider_id)] = {
+            "type": "slider",
+            "min": slider.get("data-calculator-min", "0"),
+            "max": slider.get("data-calculator-max", "0"),
+            "options": slider.get("data-calculator-datalist", "").split(";"),
+        }
+
+    # Extract radio button groups; a radio's label is looked up within its own group
+    for radiogroup in element.find_all("div", {"role": "radiogroup"}):
+        group_label = radiogroup.get("aria-label", "unknown")
+        radios, labels = calculator_fields(radiogroup, "radio")
+        options = [labels.get(radio.get("id"), radio.get("id")) for radio in radios]
+        parameters[group_label] = {"type": "radio", "options": options}
+
+    # NOTE: Can extend this to extract other interactive elements:
+    # - Checkboxes: element.find_all('input', {'type': 'checkbox'})
+    # - Dropdowns: element.find_all('select')
+    # For each, extract the available options and default values
+
+    return {
+        "type": "calculator_table",
+        "section": section,
+        "data": table_data,
+        "parameters": parameters,
+        "legend_type": "breaking_table",
+    }
 
 
 class MinecraftWikiParser:
     """Parser for extracting structured content from Minecraft Wiki pages."""
 
-    def __init__(self, url):
+    def __init__(
+        self, url, html: str | None = None, backend: str | None = None, archive: "HtmlArchive | None" = None
+    ):
         self.url: str = url
         self.title: str = None
         self.content: ContentItem = None
-        self.parse()  # Automatically parse on initialization
+        # Automatically parse on initialization, fetching the page (or reading it from the archive) unless HTML is given
+        if html is None:
+            self.parse(backend, archive)
+        else:
+            self.parse_html(html, backend)
+
+    def parse(self, backend: str | None = None, archive: "HtmlArchive | None" = None):
+        """Parse the page and extract content into a list, reading it from `archive` instead of the network if given."""
+        if archive is not None:
+            html = archive.get(self.url)
+            if html is None:
+                logging.error(f"Page not in archive: {self.url}")
+                return
+            self.parse_html(html, backend)
+            return
+
+        import http_client
 
-    def parse(self):
-        """Parse the page and extract content into a list."""
         # Fetch HTML
-        response = requests.get(self.url, headers=HEADERS)
+        response = http_client.get(self.url)
         if response.status_code != 200:
             logging.error(f"Failed to fetch page: {self.url}")
             return
 
-        # Create BeautifulSoup object
-        soup = BeautifulSoup(response.text, "html.parser")
+        self.parse_html(response.text, backend)
+
+    def parse_html(self, html: str, backend: str | None = None):
+        """
+        Parse already-fetched HTML and extract content into a list.
+
+        Args:
+            html (str): Full page HTML.
+            backend (str | None): One of PARSER_BACKENDS; defaults to the fastest installed.
+        """
+        from bs4 import BeautifulSoup
+
+        backend = backend or default_backend()
 
-        # Extract title
-        self.title = soup.find("h1", {"id": "firstHeading"}).get_text()
+        self.title = page_title(html, backend)
+        if self.title is None:
+            logging.error(f"No title found on page: {self.url}")
+            return
+
+        # Create BeautifulSoup object for the article body only
+        soup = BeautifulSoup(html, backend, parse_only=content_strainer())
 
         # Build tree structure
         self._extract(soup)
 
     def _extract(self, soup):
-        """Extract the content from BeautifulSoup object."""
+        """
+        Extract the content from BeautifulSoup object.
+
+        One pass over the article's top-level elements: headers update the
+        section path, every other element goes to the first handler registered
+        for its tag (and class) in BLOCK_HANDLERS.
+        """
         main_content = soup.find("div", {"class": "mw-parser-output"})
         content = []
         section_hierarchy = ["Introduction"]  # Track section path as a list
+        section = "Introduction"  # " > ".join(section_hierarchy), rebuilt only when a header changes it
 
         for element in main_content.children:
-            if element.name in ["h2", "h3", "h4"]:
+            level = HEADER_LEVELS.get(element.name)
+            if level is not None:
                 # Header - update section hierarchy but don't append to content
-                header_text = element.get_text().replace("[edit | edit source]", "").strip()
-                header_level = int(element.name[1])  # 2, 3, or 4
-
-                # Update hierarchy based on level
                 # h2 replaces everything, h3 replaces from index 1, h4 replaces from index 2
-                if header_level == 2:
-                    section_hierarchy = [header_text]
-                elif header_level == 3:
-                    section_hierarchy = section_hierarchy[:1] + [header_text]
-                elif header_level == 4:
-                    section_hierarchy = section_hierarchy[:2] + [header_text]
-            elif element.name == "p":
-                # Paragraph
-                paragraph_text = element.get_text().strip()
-                if paragraph_text:
-                    content.append(
-                        {
-                            "type": "paragraph",
-                            "section": " > ".join(section_hierarchy),
-                            "text": paragraph_text,
-                        }
-                    )
-            elif element.name in ["ul", "ol"]:
-                # List
-                items = [li.get_text() for li in element.find_all("li")]
-                if items:
-                    content.append(
-                        {
-                            "type": "list",
-                            "section": " > ".join(section_hierarchy),
-                            "items": items,
-                        }
-                    )
-            elif element.name == "table":
-                # Table (simple extraction)
-                table_data = []
-                for row in element.find_all("tr"):
-                    cols = [self._get_best_label(col) for col in row.find_all(["td", "th"])]
-                    if cols:
-                        table_data.append(cols)
-                if table_data:
-                    content.append(
-                        {
-                            "type": "table",
-                            "section": " > ".join(section_hierarchy),
-                            "data": table_data,
-                        }
-                    )
-            elif element.name == "div" and "infobox" in element.get("class", []):
-                # Infobox
-                infobox_data = {}
-                for row in element.find_all("tr"):
-                    header = row.find("th")
-                    value = row.find("td")
-                    if header and value:
-                        infobox_data[header.get_text().strip()] = self._get_best_label(value).strip()
-                if infobox_data:
-                    content.append(
-                        {
-                            "type": "infobox",
-                            "section": " > ".join(section_hierarchy),
-                            "data": infobox_data,
-                        }
-                    )
-            elif element.name == "div" and "droptable-tabber" in element.get("class", []):
-                # Droptable
-                drop_tables = []
-                for table in element.find_all("table"):
-                    table_data = []
-                    for row in table.find_all("tr"):
-                        cols = [self._get_best_label(col) for col in row.find_all(["td", "th"])]
-                        if cols:
-                            table_data.append(cols)
-                    if table_data:
-                        drop_tables.append(table_data)
-                if drop_tables:
-                    content.append(
-                        {
-                            "type": "droptable",
-                            "section": " > ".join(section_hierarchy),
-                            "data": drop_tables,
-                        }
-                    )
-            elif element.name == "div" and "calculator-container" in element.get("class", []):
-                # Calculator widget (interactive table for block breaking, etc.)
-                table = element.find("table")
-                if table:
-                    table_data = []
-                    for row in table.find_all("tr"):
-                        cols = [self._get_best_label(col) for col in row.find_all(["td", "th"])]
-                        if cols:
-                            table_data.append(cols)
-
-                    # Extract parameter information from interactive controls
-                    parameters = {}
-
-                    # Extract slider parameters
-                    for slider in element.find_all(
-                        "span",
-                        {"class": "calculator-field", "data-calculator-type": "range"},
-                    ):
-                        slider_id = slider.get("id")
-                        label_span = element.find(
-                            "span",
-                            {"class": "calculator-field-label", "data-for": slider_id},
-                        )
-                        label = label_span.get_text(strip=True) if label_span else slider_id
-                        min_val = slider.get("data-calculator-min", "0")
-                        max_val = slider.get("data-calculator-max", "0")
-                        datalist = slider.get("data-calculator-datalist", "").split(";")
-                        parameters[label] = {
-                            "type": "slider",
-                            "min": min_val,
-                            "max": max_val,
-                            "options": datalist,
-                        }
-
-                    # Extract radio button groups
-                    for radiogroup in element.find_all("div", {"role": "radiogroup"}):
-                        group_label = radiogroup.get("aria-label", "unknown")
-                        options = []
-                        for radio_field in radiogroup.find_all(
-                            "span",
-                            {
-                                "class": "calculator-field",
-                                "data-calculator-type": "radio",
-                            },
-                        ):
-                            radio_id = radio_field.get("id")
-                            label_span = radiogroup.find(
-                                "span",
-                                {
-                                    "class": "calculator-field-label",
-                                    "data-for": radio_id,
-                                },
-                            )
-                            label = label_span.get_text(strip=True) if label_span else radio_id
-                            options.append(label)
-                        parameters[group_label] = {"type": "radio", "options": options}
-
-                    # NOTE: Can extend this to extract other interactive elements:
-                    # - Checkboxes: element.find_all('input', {'type': 'checkbox'})
-                    # - Dropdowns: element.find_all('select')
-                    # For each, extract the available options and default values
-
-                    if table_data:
-                        content.append(
-                            {
-                                "type": "calculator_table",
-                                "section": " > ".join(section_hierarchy),
-                                "data": table_data,
-                                "parameters": parameters,
-                                "legend_type": "breaking_table",
-                            }
-                        )
+                header_text = element.get_text().replace("[edit | edit source]", "").strip()
+                section_hierarchy = section_hierarchy[: level - 2] + [header_text]
+                section = " > ".join(section_hierarchy)
+                continue
+            handler = find_handler(element)
+            if handler is not None:
+                block = handler(element, section)
+                if block:
+                    content.append(block)
 
         self.content = content
 
@@ -284,16 +336,7 @@ class MinecraftWikiParser:
         Try to get the best label for an element.
         Priority: text > <a> title > <img> alt
         """
-        text = element.get_text()
-        if text.strip():
-            return text
-        a_tag = element.find("a")
-        if a_tag and a_tag.get("title"):
-            return a_tag["title"]
-        img_tag = element.find("img")
-        if img_tag and img_tag.get("alt"):
-            return img_tag["alt"]
-        return ""
+        return best_label(element)
 
     def to_json(self):
         """Convert the extracted content to JSON format."""
@@ -305,8 +348,7 @@ class MinecraftWikiParser:
             logging.error("Cannot save: title or content is missing")
             return
 
-        # Sanitize filename (remove invalid characters)
-        filename = re.sub(r'[<>:"/\\|?*]', "_", self.title) + ".json"
+        filename = page_filename(self.title)
 
         filepath = os.path.join(folder, filename)
         with open(filepath, "w", encoding="utf-8") as f:
@@ -317,21 +359,31 @@ class MinecraftWikiParser:
                 ensure_ascii=False,
             )
 
-        logging.info(f"Saved content to {filename}")
+        logging.debug(f"Saved content to {filename}")
         return filename
 
-    def load_from_file(filepath):
-        """Load a MinecraftWikiParser instance from a JSON file."""
-        with open(filepath, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        parser = MinecraftWikiParser(data["url"])
+    @classmethod
+    def from_dict(cls, data: ContentItem) -> "MinecraftWikiParser":
+        """Build a MinecraftWikiParser from already-extracted content, without fetching or parsing."""
+        parser = cls.__new__(cls)
+        parser.url = data["url"]
         parser.title = data["title"]
         parser.content = data["content"]
         return parser
 
+    @classmethod
+    def load_from_file(cls, filepath) -> "MinecraftWikiParser":
+        """Load a MinecraftWikiParser instance from a JSON file (no network access)."""
+        with open(filepath, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        return cls.from_dict(data)
+
 
 if __name__ == "__main__":
+    from metrics import configure_logging
+
+    configure_logging()
     # Example usage
     parser = MinecraftWikiParser("https://minecraft.wiki/w/Cobblestone")
     parser.save_to_file("json")
@@ -0,0 +1,494 @@
+import argparse
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import nullcontext
+from typing import TYPE_CHECKING
+
+from crawler import URLS_FILE, SitemapEntry, iter_page_urls, load_urls_from_file, save_urls_to_file
+from metrics import REGISTRY, Profiler, configure_logging, inc
+
+if TYPE_CHECKING:
+    from embedding import Embedder
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+STAGES = ("crawl", "parse", "chunk", "embed", "index")
+
+DEFAULT_STAGES = ("crawl", "parse", "chunk", "index")  # embed is opt-in: it cannot skip duplicates (see Pipeline)
+
+QUEUE_SIZE = 256  # items waiting between two stages before the upstream one blocks
+
+EMBED_BATCH_CHUNKS = 512  # chunks the embed stage collects before sending them to the embedding cache
+
+PROGRESS_INTERVAL = 5  # seconds between progress log lines
+
+_DONE = object()  # Put on a stage's output queue when it has finished
+
+
+class PipelineStopped(Exception):
+    """Raised inside a stage when another stage failed and the pipeline is shutting down."""
+
+
+class Checkpoint:
+    """
+    Append-only record of the items a stage has finished, one "key<TAB>value" line each.
+
+    Lines are flushed as they are written, so after a crash at most the item in
+    progress is lost; a partly written last line is dropped when the file is reopened.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path, "r+", encoding="utf-8") as f:
+                data = f.read()
+                complete = data.rfind("\n") + 1
+                for line in data[:complete].splitlines():
+                    key, _, value = line.partition("\t")
+                    self.done[key] = value
+                if complete < len(data):
+                    f.seek(0)
+                    f.truncate(len(data[:complete].encode("utf-8")))
+        self.file = open(path, "a", encoding="utf-8")
+
+    def __len__(self) -> int:
+        return len(self.done)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.done
+
+    def get(self, key: str) -> str | None:
+        return self.done.get(key)
+
+    def mark(self, key: str, value: str = "") -> None:
+        self.done[key] = value
+        self.file.write(f"{key}\t{value}\n")
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+    def clear(self) -> None:
+        """Forget every finished item and delete the file."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.done = {}
+
+
+def select_stages(names: Iterable[str]) -> list[str]:
+    """Validate stage names, returning them in pipeline order ("all" selects every stage)."""
+    names = set(names)
+    if "all" in names:
+        return list(STAGES)
+    unknown = names - set(STAGES)
+    if unknown:
+        raise ValueError(f"Unknown stages: {', '.join(sorted(unknown))} (choose from {', '.join(STAGES)})")
+    return [stage for stage in STAGES if stage in names]
+
+
+class Pipeline:
+    """
+    Crawl → parse → chunk → embed → index, with the stages running concurrently.
+
+    Every stage runs on its own thread and hands its outputs to the next one
+    through a bounded queue, so a slow stage holds back the ones before it
+    instead of letting work pile up in memory:
+
+    - crawl streams page URLs from the sitemaps and saves them to the URLs file;
+    - parse fetches and parses each page into the json folder, archiving its raw
+      HTML (see html_archive.py); with `replay` it reads pages from that archive
+      instead of the network, and crawl is skipped;
+    - chunk writes each page's chunk file into the chunks folder;
+    - embed (not run by default) sends new chunk texts to the embedding cache,
+      a batch at a time;
+    - index runs once the others have finished: it dedupes the chunk folder and
+      syncs the vector store and BM25 index (main.index_chunks), embedding the
+      chunks it keeps that are not cached yet.
+
+    A stage whose predecessor is not selected reads that predecessor's output
+    from disk instead (the URLs file, or the json or chunks folder; when replaying,
+    parse reads every page in the archive). Duplicates are only known once the
+    whole chunk folder is there, so the embed stage embeds every chunk, duplicates
+    included; it only pays off when embedding during the crawl matters more than
+    the tokens dedupe would save.
+
+    Each stage records the items it finished in a Checkpoint, so a run that was
+    interrupted or failed skips them when started again. The checkpoints are
+    deleted once a run completes, so the next run starts afresh.
+
+    Every stage records its wall time, the items it passed on and how long it
+    was blocked on its input or output queue into metrics.REGISTRY, alongside
+    what the stages themselves record (fetch latency and bytes, parse time,
+    chunks per page, embedding batch latency, index add time). The registry is
+    written to `metrics_path` at the end of the run, and a Profiler, if given,
+    profiles every stage.
+    """
+
+    def __init__(
+        self,
+        work_dir: str = ROOT_DIR,
+        urls_file: str | None = None,
+        json_dir: str | None = None,
+        chunk_dir: str | None = None,
+        store_dir: str | None = None,
+        checkpoint_dir: str | None = None,
+        archive_dir: str | None = None,
+        replay: bool = False,
+        cache_dir: str | None = None,
+        embedder: "Embedder | None" = None,
+        index_type: str = "flat",
+        crawl: Callable[[], Iterable[SitemapEntry]] = iter_page_urls,
+        queue_size: int = QUEUE_SIZE,
+        metrics_path: str | None = None,
+        profiler: Profiler | None = None,
+        **fetch_kwargs,
+    ):
+        """
+        Args:
+            work_dir (str): Folder the outputs go in unless given individually.
+            urls_file (str | None): Crawled URLs (defaults to minecraft_urls.txt in work_dir).
+            json_dir, chunk_dir, store_dir, checkpoint_dir, archive_dir (str | None): Output folders
+                (default to json/, chunks/, vector_store/, checkpoints/ and html_archive/ in work_dir).
+            replay (bool): Parse pages from the HTML archive instead of fetching them.
+            cache_dir (str | None): Embedding cache folder (defaults to embedding_cache.CACHE_DIR).
+            embedder (Embedder | None): Embedding provider (defaults to OpenAIEmbedder).
+            index_type (str): FAISS index type for a new vector store.
+            crawl (callable): Returns the (url, lastmod) entries to crawl.
+            queue_size (int): Capacity of the queue between two stages.
+            metrics_path (str | None): Where to write metrics after a run (.prom for Prometheus text, else JSON).
+            profiler (Profiler | None): Profiles each stage when given.
+            **fetch_kwargs: Passed to fetcher.iter_fetch_and_parse (e.g. rate, max_concurrency).
+        """
+        self.urls_file = urls_file or os.path.join(work_dir, os.path.basename(URLS_FILE))
+        self.json_dir = json_dir or os.path.join(work_dir, "json")
+        self.chunk_dir = chunk_dir or os.path.join(work_dir, "chunks")
+        self.store_dir = store_dir or os.path.join(work_dir, "vector_store")
+        self.checkpoint_dir = checkpoint_dir or os.path.join(work_dir, "checkpoints")
+        self.archive_dir = archive_dir or os.path.join(work_dir, "html_archive")
+        self.replay = replay
+        self.cache_dir = cache_dir
+        self._embedder = embedder
+        self.index_type = index_type
+        self.crawl = crawl
+        self.queue_size = queue_size
+        self.metrics_path = metrics_path
+        self.profiler = profiler
+        self.fetch_kwargs = fetch_kwargs
+        self.stop = threading.Event()
+        self.counts: dict[str, int] = {}
+        self.queues: dict[str, queue.Queue] = {}
+
+    @property
+    def embedder(self) -> "Embedder":
+        if self._embedder is None:
+            from embedding import OpenAIEmbedder
+
+            self._embedder = OpenAIEmbedder()
+        return self._embedder
+
+    def run(self, stages: Iterable[str] = DEFAULT_STAGES, fresh: bool = False) -> dict[str, int]:
+        """
+        Run the selected stages, resuming from their checkpoints unless `fresh`.
+
+        Returns:
+            dict[str, int]: Items each stage passed on (URLs, pages, chunk files), resumed ones included.
+        """
+        stages = select_stages(stages)
+        if self.replay:
+            stages = [stage for stage in stages if stage != "crawl"]  # Replayed pages come from the archive
+        streamed = [stage for stage in stages if stage != "index"]
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        paths = {stage: os.path.join(self.checkpoint_dir, f"{stage}.txt") for stage in streamed}
+        if fresh:
+            for path in paths.values():
+                if os.path.exists(path):
+                    os.remove(path)
+        checkpoints = {stage: Checkpoint(path) for stage, path in paths.items()}
+        resumed = {stage: len(checkpoint) for stage, checkpoint in checkpoints.items() if len(checkpoint)}
+        if resumed:
+            logging.info(f"Pipeline: resuming from checkpoints ({', '.join(f'{s} {n}' for s, n in resumed.items())})")
+
+        self.stop.clear()
+        self.counts = {stage: 0 for stage in streamed}
+        self.queues = {}
+        errors: list[BaseException] = []
+        threads = []
+        for stage in streamed:
+            upstream = STAGES[STAGES.index(stage) - 1] if stage != STAGES[0] else None
+            items = self._receive(self.queues[upstream], stage) if upstream in self.queues else self._source(stage)
+            downstream = STAGES[STAGES.index(stage) + 1]
+            if downstream in streamed:
+                self.queues[stage] = queue.Queue(maxsize=self.queue_size)
+            thread = threading.Thread(
+                target=self._run_stage,
+                args=(stage, items, checkpoints[stage], errors),
+                name=f"pipeline-{stage}",
+                daemon=True,
+            )
+            threads.append(thread)
+
+        start = time.monotonic()
+        try:
+            for thread in threads:
+                thread.start()
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=PROGRESS_INTERVAL / len(threads))
+                if any(thread.is_alive() for thread in threads):
+                    self._log_progress(start)
+
+            if errors:
+                raise errors[0]
+            if "index" in stages:
+                from main import index_chunks
+
+                logging.info("Pipeline: index")
+                with self._profile("index"), REGISTRY.timer("pipeline_stage_seconds", {"stage": "index"}):
+                    index_chunks(self.chunk_dir, self.store_dir, self.index_type, self.embedder, self.cache_dir)
+            for checkpoint in checkpoints.values():
+                checkpoint.clear()
+        except BaseException:
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+            raise
+        finally:
+            for checkpoint in checkpoints.values():
+                checkpoint.close()
+            REGISTRY.set("pipeline_run_seconds", time.monotonic() - start)
+            if self.metrics_path:
+                REGISTRY.dump(self.metrics_path)
+        self._log_progress(start)
+        return self.counts
+
+    def _log_progress(self, start: float) -> None:
+        parts = []
+        for stage, count in self.counts.items():
+            waiting = f" ({self.queues[stage].qsize()} queued)" if stage in self.queues else ""
+            parts.append(f"{stage} {count}{waiting}")
+        logging.info(f"Pipeline after {time.monotonic() - start:.0f}s: {', '.join(parts)}")
+
+    def _run_stage(self, stage: str, items: Iterator, checkpoint: Checkpoint, errors: list[BaseException]) -> None:
+        outbox = self.queues.get(stage)
+
+        def emit(item) -> None:
+            self.counts[stage] += 1
+            inc("pipeline_items_total", labels={"stage": stage})
+            if outbox is not None:
+                self._put(outbox, item, stage)
+
+        try:
+            with self._profile(stage), REGISTRY.timer("pipeline_stage_seconds", {"stage": stage}):
+                getattr(self, f"_{stage}")(items, checkpoint, emit)
+            logging.info(f"Pipeline: {stage} finished ({self.counts[stage]} items)")
+        except PipelineStopped:
+            pass
+        except BaseException as e:
+            logging.exception(f"Pipeline: {stage} failed")
+            errors.append(e)
+            self.stop.set()
+        finally:
+            if outbox is not None and not self.stop.is_set():
+                try:
+                    self._put(outbox, _DONE, stage)
+                except PipelineStopped:
+                    pass
+
+    def _profile(self, stage: str):
+        return self.profiler.profile(stage) if self.profiler is not None else nullcontext()
+
+    def _put(self, outbox: queue.Queue, item, stage: str) -> None:
+        # Give up if a stage failed, instead of blocking forever on a queue nobody reads
+        start = time.perf_counter()
+        while not self.stop.is_set():
+            try:
+                outbox.put(item, timeout=0.1)
+                inc("pipeline_blocked_seconds", time.perf_counter() - start, {"stage": stage, "on": "output"})
+                return
+            except queue.Full:
+                continue
+        raise PipelineStopped
+
+    def _receive(self, inbox: queue.Queue, stage: str) -> Iterator:
+        while not self.stop.is_set():
+            start = time.perf_counter()
+            try:
+                item = inbox.get(timeout=0.1)
+            except queue.Empty:
+                inc("pipeline_blocked_seconds", time.perf_counter() - start, {"stage": stage, "on": "input"})
+                continue
+            inc("pipeline_blocked_seconds", time.perf_counter() - start, {"stage": stage, "on": "input"})
+            if item is _DONE:
+                return
+            yield item
+        raise PipelineStopped
+
+    def _source(self, stage: str) -> Iterator:
+        """Inputs of a stage whose predecessor is not running, read from that predecessor's output on disk."""
+        if stage == "parse":
+            return iter(() if self.replay else load_urls_from_file(self.urls_file))  # replay lists the archive itself
+        folder = {"chunk": self.json_dir, "embed": self.chunk_dir}.get(stage)
+        if folder is None:
+            return iter(())
+        return iter(sorted(filename for filename in os.listdir(folder) if filename.endswith(".json")))
+
+    def _crawl(self, items: Iterator, checkpoint: Checkpoint, emit: Callable) -> None:
+        if "urls" in checkpoint and os.path.exists(self.urls_file):
+            for url in load_urls_from_file(self.urls_file):
+                emit(url)
+            return
+
+        def entries() -> Iterator[SitemapEntry]:
+            for entry in self.crawl():
+                emit(entry[0])
+                yield entry
+
+        # Only replace the URLs file once the crawl is complete
+        tmp_path = f"{self.urls_file}.tmp"
+        save_urls_to_file(entries(), tmp_path)
+        os.replace(tmp_path, self.urls_file)
+        checkpoint.mark("urls")
+
+    def _parse(self, items: Iterator, checkpoint: Checkpoint, emit: Callable) -> None:
+        from fetcher import iter_fetch_and_parse, iter_replay
+        from html_archive import HtmlArchive
+
+        def pending(urls: Iterable[str]) -> Iterator[str]:
+            for url in urls:
+                filename = checkpoint.get(url)
+                if filename is None:
+                    yield url
+                else:
+                    emit(filename)
+
+        with HtmlArchive(self.archive_dir) as archive:
+            if self.replay:
+                # Every archived page, in pack order so the archive is read sequentially
+                urls = pending(archive.urls())
+                parsed = iter_replay(archive, self.json_dir, urls, self.fetch_kwargs.get("parse_workers"))
+            else:
+                # Pages the HTTP cache reports unchanged are parsed again from the cached body, since chunk needs them
+                parsed = iter_fetch_and_parse(
+                    pending(items), self.json_dir, skip_unchanged=False, archive=archive, **self.fetch_kwargs
+                )
+            for url, filename in parsed:
+                checkpoint.mark(url, filename)
+                emit(filename)
+
+    def _chunk(self, items: Iterator, checkpoint: Checkpoint, emit: Callable) -> None:
+        from main import chunk_file
+
+        os.makedirs(self.chunk_dir, exist_ok=True)
+        for filename in items:
+            if filename not in checkpoint:
+                chunk_file(filename, self.json_dir, self.chunk_dir)
+                checkpoint.mark(filename)
+            emit(filename)
+
+    def _embed(self, items: Iterator, checkpoint: Checkpoint, emit: Callable) -> None:
+        from embedding_cache import CACHE_DIR, EmbeddingCache
+
+        embedder = self.embedder
+        with EmbeddingCache(embedder.model, embedder.dimension, self.cache_dir or CACHE_DIR) as cache:
+            filenames: list[str] = []
+            texts: list[str] = []
+
+            def flush() -> None:
+                if texts:
+                    cache.embed(texts, embedder)
+                for filename in filenames:
+                    checkpoint.mark(filename)
+                    emit(filename)
+                filenames.clear()
+                texts.clear()
+
+            for filename in items:
+                if filename in checkpoint:
+                    emit(filename)
+                    continue
+                with open(os.path.join(self.chunk_dir, filename), "r", encoding="utf-8") as f:
+                    texts.extend(chunk["text"] for chunk in json.load(f))
+                filenames.append(filename)
+                if len(texts) >= EMBED_BATCH_CHUNKS:
+                    flush()
+            flush()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Run the crawl → parse → chunk → embed → index pipeline")
+    arg_parser.add_argument(
+        "--stages",
+        default=",".join(DEFAULT_STAGES),
+        type=lambda value: value.split(","),
+        help=f"Comma-separated stages to run ({','.join(STAGES)}, or all); default {','.join(DEFAULT_STAGES)}",
+    )
+    arg_parser.add_argument("--work-dir", default=ROOT_DIR, help="Folder for every output not set individually")
+    arg_parser.add_argument("--urls-file")
+    arg_parser.add_argument("--json-dir")
+    arg_parser.add_argument("--chunk-dir")
+    arg_parser.add_argument("--store-dir")
+    arg_parser.add_argument("--checkpoint-dir")
+    arg_parser.add_argument("--archive-dir", help="Raw HTML archive (default html_archive/ in the work dir)")
+    arg_parser.add_argument(
+        "--replay", action="store_true", help="Parse pages from the HTML archive instead of the network (skips crawl)"
+    )
+    arg_parser.add_argument("--cache-dir", help="Embedding cache folder (default embedding_cache/ beside the code)")
+    arg_parser.add_argument("--fresh", action="store_true", help="Ignore checkpoints left by an interrupted run")
+    arg_parser.add_argument(
+        "--index-type",
+        default="flat",
+        choices=["flat", "ivf_flat", "ivf_pq", "hnsw"],
+        help="FAISS index type for a new vector store",
+    )
+    arg_parser.add_argument("--fake-embedder", type=int, metavar="DIM", help="Use a FakeEmbedder of this dimension")
+    arg_parser.add_argument("--rate", type=float, help="Requests per second (capped by robots.txt Crawl-delay)")
+    arg_parser.add_argument("--parse-workers", type=int, help="Parser processes (defaults to CPU count)")
+    arg_parser.add_argument(
+        "--metrics", help="Metrics file written at the end (.prom for Prometheus text, else JSON; default metrics.json)"
+    )
+    arg_parser.add_argument("--profile", choices=["cpu", "memory", "all"], help="Profile every stage")
+    arg_parser.add_argument("--profile-dir", help="Folder for profiles (default profiles/ in the work dir)")
+    args = arg_parser.parse_args()
+
+    configure_logging()
+
+    try:
+        selected = select_stages(args.stages)
+    except ValueError as e:
+        arg_parser.error(str(e))
+    embedder = None
+    if args.fake_embedder:
+        from embedding import FakeEmbedder
+
+        embedder = FakeEmbedder(args.fake_embedder)
+    pipeline = Pipeline(
+        work_dir=args.work_dir,
+        urls_file=args.urls_file,
+        json_dir=args.json_dir,
+        chunk_dir=args.chunk_dir,
+        store_dir=args.store_dir,
+        checkpoint_dir=args.checkpoint_dir,
+        archive_dir=args.archive_dir,
+        replay=args.replay,
+        cache_dir=args.cache_dir,
+        embedder=embedder,
+        index_type=args.index_type,
+        metrics_path=args.metrics or os.path.join(args.work_dir, "metrics.json"),
+        profiler=Profiler(
+            args.profile_dir or os.path.join(args.work_dir, "profiles"),
+            cpu=args.profile in ("cpu", "all"),
+            memory=args.profile in ("memory", "all"),
+        )
+        if args.profile
+        else None,
+        rate=args.rate,
+        parse_workers=args.parse_workers,
+    )
+    pipeline.run(selected, fresh=args.fresh)
@@ -0,0 +1,334 @@
+import argparse
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from bm25 import LEXICAL_FILE, BM25Index, reciprocal_rank_fusion
+from embedding import Embedder, FakeEmbedder, OpenAIEmbedder, embed_batched
+from metrics import configure_logging
+from vector_store import STORE_DIR, SearchHit, VectorStore
+
+DEFAULT_K = 5
+
+MAX_K = 100
+
+MAX_BATCH_SIZE = 64  # questions searched together in one FAISS call
+
+MAX_BATCH_WAIT = 0.002  # seconds to wait for more questions before searching a partial batch
+
+CACHE_SIZE = 4096  # questions kept in each LRU cache
+
+FUSION_DEPTH = 50  # hits taken from each of the lexical and vector rankings before fusing them
+
+PREFILTER_CANDIDATES = 1000  # top BM25 matches a prefiltered vector search is restricted to
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache."""
+
+    def __init__(self, maxsize: int = CACHE_SIZE):
+        self.maxsize = maxsize
+        self.items: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            value = self.items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value) -> None:
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            if len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+
+def normalize_question(question: str) -> str:
+    """Collapse whitespace and case so trivially different phrasings share cache entries."""
+    return " ".join(question.split()).lower()
+
+
+def copy_hits(hits: list[SearchHit]) -> list[SearchHit]:
+    """Copies of search hits, sources included, that a caller can change without touching the cached ones."""
+    return [{**hit, "sources": [dict(source) for source in hit["sources"]]} for hit in hits]
+
+
+class Retriever:
+    """
+    Answers questions with the top-k chunks from a VectorStore.
+
+    Questions are queued and a single worker thread drains them in micro-batches
+    (up to `max_batch_size`, waiting at most `max_batch_wait` for stragglers):
+    the uncached questions of a batch are embedded in one request and the whole
+    batch is searched with one FAISS call. Results and query embeddings are kept
+    in LRU caches, so a repeated question never reaches the queue. The caches are
+    keyed by the normalized question (see normalize_question), but what gets
+    embedded is the question as it was first asked.
+
+    With a BM25Index (`lexical`), vector and BM25 rankings are merged by
+    reciprocal rank fusion, so exact item names the embedding misses still
+    surface. With `prefilter`, vector search is also restricted to the lexical
+    candidates, which avoids a full-index search for questions that name things.
+
+    The worker thread owns all access to the store.
+    """
+
+    def __init__(
+        self,
+        store: VectorStore,
+        embedder: Embedder,
+        max_batch_size: int = MAX_BATCH_SIZE,
+        max_batch_wait: float = MAX_BATCH_WAIT,
+        cache_size: int = CACHE_SIZE,
+        lexical: BM25Index | None = None,
+        prefilter: bool = False,
+        fusion_depth: int = FUSION_DEPTH,
+        prefilter_candidates: int = PREFILTER_CANDIDATES,
+    ):
+        self.store = store
+        self.embedder = embedder
+        self.lexical = lexical
+        self.prefilter = prefilter
+        self.fusion_depth = fusion_depth
+        self.prefilter_candidates = prefilter_candidates
+        self.max_batch_size = max_batch_size
+        self.max_batch_wait = max_batch_wait
+        self.results = LRUCache(cache_size)  # (normalized question, k) → hits
+        self.embeddings = LRUCache(cache_size)  # normalized question → vector
+        self.batches = 0
+        self.batched_questions = 0
+        self.queue: queue.Queue = queue.Queue()
+        self.worker = threading.Thread(target=self._run, name="retriever", daemon=True)
+        self.worker.start()
+
+    def retrieve(self, question: str, k: int = DEFAULT_K) -> list[SearchHit]:
+        """
+        Return the `k` chunks most similar to a question, best first.
+
+        Args:
+            question (str): The user's question.
+            k (int): Number of chunks to return.
+
+        Returns:
+            list of SearchHit: Chunk text and metadata with a similarity score; the caller's own copy.
+        """
+        key = (normalize_question(question), k)
+        hits = self.results.get(key)
+        if hits is not None:
+            return copy_hits(hits)
+        future: Future = Future()
+        self.queue.put((key[0], question, k, future))
+        return future.result()
+
+    def close(self) -> None:
+        self.queue.put(None)
+        self.worker.join()
+
+    def __enter__(self) -> "Retriever":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _run(self) -> None:
+        while True:
+            request = self.queue.get()
+            if request is None:
+                return
+            batch = [request]
+            deadline = time.monotonic() + self.max_batch_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    request = self.queue.get(timeout=timeout) if timeout > 0 else self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    self.queue.put(None)  # Finish this batch, then stop
+                    break
+                batch.append(request)
+
+            try:
+                self._search_batch(batch)
+            except Exception as e:
+                logging.error(f"Retrieval batch of {len(batch)} failed: {e}")
+                for _, _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _search_batch(self, batch: list[tuple[str, str, int, Future]]) -> None:
+        texts: dict[str, str] = {}  # normalized question → the question as first asked
+        for question, text, _, _ in batch:
+            texts.setdefault(question, text)
+        questions = list(texts)
+        vectors = {question: self.embeddings.get(question) for question in questions}
+        missing = [question for question, vector in vectors.items() if vector is None]
+        if missing:
+            embedded = embed_batched([texts[question] for question in missing], self.embedder, max_concurrency=1)
+            for question, vector in zip(missing, embedded):
+                vectors[question] = vector
+                self.embeddings.put(question, vector)
+
+        k = max(k for _, _, k, _ in batch)
+        matrix = np.vstack([vectors[question] for question in questions])
+        if self.lexical is None:
+            hits_by_question = dict(zip(questions, self.store.search(matrix, k)))
+        else:
+            hits_by_question = dict(zip(questions, self._hybrid_search(list(texts.values()), matrix, k)))
+        self.batches += 1
+        self.batched_questions += len(batch)
+        for question, _, k, future in batch:
+            hits = hits_by_question[question][:k]
+            self.results.put((question, k), hits)
+            future.set_result(copy_hits(hits))
+
+    def _hybrid_search(self, questions: list[str], matrix: np.ndarray, k: int) -> list[list[SearchHit]]:
+        """Fuse BM25 and vector rankings for each question; scores of the returned hits are RRF scores."""
+        depth = max(k, self.fusion_depth)
+        lexical_depth = max(depth, self.prefilter_candidates) if self.prefilter else depth
+        lexical = [[chunk_id for chunk_id, _ in self.lexical.search(question, lexical_depth)] for question in questions]
+        vector_hits: list[list[SearchHit]] = [[] for _ in questions]
+        # Questions with no lexical match are always searched against the whole index
+        full = [i for i in range(len(questions)) if not (self.prefilter and lexical[i])]
+        restricted = [i for i in range(len(questions)) if self.prefilter and lexical[i]]
+        if full:
+            for i, hits in zip(full, self.store.search(matrix[full], depth)):
+                vector_hits[i] = hits
+        if restricted:
+            candidates = [lexical[i] for i in restricted]
+            for i, hits in zip(restricted, self.store.search(matrix[restricted], depth, candidates=candidates)):
+                vector_hits[i] = hits
+
+        fused = [
+            reciprocal_rank_fusion([[hit["id"] for hit in hits], ids[:depth]])[:k] for hits, ids in zip(vector_hits, lexical)
+        ]
+        rows = {hit["id"]: hit for hits in vector_hits for hit in hits}
+        rows.update(self.store.get({chunk_id for ranking in fused for chunk_id, _ in ranking if chunk_id not in rows}))
+        return [
+            [{**rows[chunk_id], "score": score} for chunk_id, score in ranking if chunk_id in rows] for ranking in fused
+        ]
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "result_cache_hits": self.results.hits,
+            "result_cache_misses": self.results.misses,
+            "embedding_cache_hits": self.embeddings.hits,
+            "batches": self.batches,
+            "mean_batch_size": self.batched_questions / self.batches if self.batches else 0.0,
+        }
+
+
+class RetrievalHandler(BaseHTTPRequestHandler):
+    """
+    JSON retrieval endpoint.
+
+    GET /search?q=<question>&k=<k> or POST /search with {"question": ..., "k": ...}
+    returns {"question", "results", "took_ms"}; GET /stats returns retriever stats.
+    """
+
+    retriever: Retriever  # set on the subclass created by make_server
+    protocol_version = "HTTP/1.1"  # keep-alive, so clients don't pay for a connection per query
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        if url.path == "/stats":
+            self._send_json(200, self.retriever.stats())
+        elif url.path == "/search":
+            params = parse_qs(url.query)
+            self._search(params.get("q", [""])[0], params.get("k", [DEFAULT_K])[0])
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self) -> None:
+        if urlparse(self.path).path != "/search":
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": "body must be JSON"})
+            return
+        self._search(body.get("question", ""), body.get("k", DEFAULT_K))
+
+    def _search(self, question: str, k) -> None:
+        try:
+            k = int(k)
+        except (TypeError, ValueError):
+            self._send_json(400, {"error": "k must be an integer"})
+            return
+        if not question.strip() or not 1 <= k <= MAX_K:
+            self._send_json(400, {"error": f"question is required and k must be between 1 and {MAX_K}"})
+            return
+        start = time.perf_counter()
+        try:
+            results = self.retriever.retrieve(question, k)
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+            return
+        took_ms = (time.perf_counter() - start) * 1000
+        self._send_json(200, {"question": question, "results": results, "took_ms": round(took_ms, 3)})
+
+    def _send_json(self, status: int, data) -> None:
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        logging.debug(f"{self.address_string()} {format % args}")
+
+
+def make_server(retriever: Retriever, host: str = "127.0.0.1", port: int = 8000) -> ThreadingHTTPServer:
+    """Create (but do not start) an HTTP server answering with `retriever`; port 0 picks a free port."""
+    handler = type("BoundRetrievalHandler", (RetrievalHandler,), {"retriever": retriever})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Serve top-k chunk retrieval over HTTP")
+    arg_parser.add_argument("--store", default=STORE_DIR, help="Vector store folder (see main.py index)")
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8000)
+    arg_parser.add_argument("--fake-embedder", type=int, metavar="DIM", help="Use a FakeEmbedder of this dimension")
+    arg_parser.add_argument("--hybrid", action="store_true", help="Fuse BM25 (lexical.npz in the store) with vector hits")
+    arg_parser.add_argument("--prefilter", action="store_true", help="With --hybrid, restrict vector search to BM25 matches")
+    args = arg_parser.parse_args()
+
+    configure_logging()
+    embedder = FakeEmbedder(args.fake_embedder) if args.fake_embedder else OpenAIEmbedder()
+    lexical = BM25Index.load(os.path.join(args.store, LEXICAL_FILE)) if args.hybrid else None
+    with VectorStore(args.store, read_only=True) as store, Retriever(
+        store, embedder, lexical=lexical, prefilter=args.prefilter
+    ) as retriever:
+        server = make_server(retriever, args.host, args.port)
+        logging.info(f"Serving retrieval on http://{args.host}:{server.server_port}/search")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
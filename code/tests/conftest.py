@@ -0,0 +1,135 @@
+import email.utils
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class StaticSite:
+    """
+    Files under `folder` served over HTTP on localhost, in a child process.
+
+    Responses carry an ETag (a hash of the file) and a Last-Modified date (its
+    mtime) and conditional GETs are answered with 304, so tests can change a
+    page on disk between fetches. Every request is appended to `log_path` as a
+    JSON line (path, status, conditional headers, monotonic start/end times)
+    before its response is sent.
+    """
+
+    def __init__(self, folder: str, delay: float = 0.0):
+        self.folder = folder
+        self.delay = delay  # seconds each request takes to answer
+        self.log_path = folder.rstrip(os.sep) + ".requests.log"
+        self.process = None
+        self.base_url = None
+
+    def write(self, path: str, body: str) -> str:
+        """Write a page to be served at `path`, returning its URL."""
+        file_path = os.path.join(self.folder, path.lstrip("/"))
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(body)
+        return self.base_url + path
+
+    def requests(self) -> list[dict]:
+        if not os.path.exists(self.log_path):
+            return []
+        with open(self.log_path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def __enter__(self) -> "StaticSite":
+        os.makedirs(self.folder, exist_ok=True)
+        ready = multiprocessing.get_context("fork").Queue()
+        self.process = multiprocessing.get_context("fork").Process(
+            target=serve_folder, args=(self.folder, self.log_path, self.delay, ready), daemon=True
+        )
+        self.process.start()
+        self.base_url = f"http://127.0.0.1:{ready.get(timeout=30)}"
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.process.terminate()
+        self.process.join()
+
+
+def serve_folder(folder: str, log_path: str, delay: float, ready) -> None:
+    log_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            start = time.monotonic()
+            if delay:
+                time.sleep(delay)
+            path = os.path.join(folder, self.path.lstrip("/"))
+            headers = {}
+            if not os.path.isfile(path):
+                status, body = 404, b"Not found"
+            else:
+                with open(path, "rb") as f:
+                    body = f.read()
+                etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+                mtime = int(os.path.getmtime(path))
+                headers = {"ETag": etag, "Last-Modified": email.utils.formatdate(mtime, usegmt=True)}
+                status = 200
+                if_none_match = self.headers.get("If-None-Match")
+                if_modified_since = self.headers.get("If-Modified-Since")
+                if if_none_match is not None:
+                    if etag == if_none_match:
+                        status = 304
+                elif if_modified_since is not None:
+                    if mtime <= email.utils.parsedate_to_datetime(if_modified_since).timestamp():
+                        status = 304
+            entry = {
+                "path": self.path,
+                "status": status,
+                "if_none_match": self.headers.get("If-None-Match"),
+                "if_modified_since": self.headers.get("If-Modified-Since"),
+                "start": start,
+                "end": time.monotonic(),
+            }
+            with log_lock, open(log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            if status == 304:
+                self.end_headers()
+                return
+            self.send_header("Content-Type", "text/html; charset=UTF-8" if status == 200 else "text/plain")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    ready.put(server.server_port)
+    server.serve_forever()
+
+
+@pytest.fixture
+def static_site(tmp_path):
+    """Start a StaticSite over tmp_path/site; call it with `delay=` to slow responses down."""
+    sites = []
+
+    def start(delay: float = 0.0) -> StaticSite:
+        site = StaticSite(str(tmp_path / f"site{len(sites)}"), delay).__enter__()
+        sites.append(site)
+        return site
+
+    yield start
+    for site in sites:
+        site.__exit__()
@@ -0,0 +1,120 @@
+import pytest
+
+from bm25 import BM25Index, reciprocal_rank_fusion, tokenize
+from embedding import FakeEmbedder
+from vector_store import VectorStore
+
+# Three chunks of 3, 2 and 4 tokens: average length 3
+CORPUS = {
+    101: "Stone stone dirt",
+    102: "dirt, sand",
+    -(2**62): "SAND sand sand gravel",  # any int64 chunk id
+}
+
+
+def build(corpus: dict[int, str]) -> BM25Index:
+    index = BM25Index()
+    for chunk_id, text in corpus.items():
+        index.add(chunk_id, text)
+    return index
+
+
+def test_tokenize():
+    assert tokenize("Dirt, SAND & gravel-2") == ["dirt", "sand", "gravel", "2"]
+
+
+def test_scores_match_hand_computed_bm25():
+    index = build(CORPUS)
+    # "stone": df 1, idf = ln(1 + 2.5 / 1.5); chunk 101 has tf 2 at average length, norm = k1
+    assert index.search("stone") == [(101, pytest.approx(0.980829 * 2 * 2.2 / (2 + 1.2), rel=1e-5))]
+    # "dirt" and "sand": df 2 each, idf = ln(1 + 1.5 / 2.5)
+    #   102: length 2, norm = 1.2 * (0.25 + 0.75 * 2 / 3) = 0.9, tf 1 for both terms
+    #   gravel chunk: length 4, norm = 1.2 * (0.25 + 0.75 * 4 / 3) = 1.5, sand tf 3
+    #   101: length 3, norm = 1.2, dirt tf 1
+    assert index.search("sand dirt") == [
+        (102, pytest.approx(2 * 0.470004 * 2.2 / 1.9, rel=1e-5)),
+        (-(2**62), pytest.approx(0.470004 * 3 * 2.2 / 4.5, rel=1e-5)),
+        (101, pytest.approx(0.470004, rel=1e-5)),
+    ]
+    assert [chunk_id for chunk_id, _ in index.search("sand dirt", k=2)] == [102, -(2**62)]
+    assert index.search("sand dirt", candidates=[101, 999]) == [(101, pytest.approx(0.470004, rel=1e-5))]
+    assert index.search("obsidian") == []
+    assert BM25Index().search("stone") == []
+
+
+def test_readding_a_chunk_replaces_its_text():
+    index = build(CORPUS)
+    index.add(101, "gravel")
+    assert len(index) == 3
+    assert index.search("stone") == []
+    assert [chunk_id for chunk_id, _ in index.search("gravel")] == [101, -(2**62)]
+
+
+def test_compact_after_delete_matches_a_fresh_index():
+    index = build(CORPUS)
+    assert index.remove(102)
+    assert not index.remove(102)
+    before = {query: index.search(query) for query in ("sand dirt", "stone gravel", "dirt")}
+
+    index.compact()
+    assert len(index.chunk_ids) == len(index) == 2
+    fresh = build({chunk_id: text for chunk_id, text in CORPUS.items() if chunk_id != 102})
+    for query, hits in before.items():
+        assert index.search(query) == hits == fresh.search(query)
+
+
+def test_maybe_compact_waits_for_enough_removals():
+    index = build({chunk_id: f"chunk {chunk_id}" for chunk_id in range(8)})
+    index.remove(0)
+    index.maybe_compact()
+    assert len(index.chunk_ids) == 8
+    index.remove(1)
+    index.maybe_compact()
+    assert len(index.chunk_ids) == 6
+
+
+def test_save_load_roundtrip(tmp_path):
+    index = BM25Index(k1=1.5, b=0.5)
+    for chunk_id, text in CORPUS.items():
+        index.add(chunk_id, text)
+    index.remove(101)
+    path = str(tmp_path / "lexical.npz")
+    index.save(path)
+
+    loaded = BM25Index.load(path)
+    assert (loaded.k1, loaded.b) == (1.5, 0.5)
+    assert len(loaded) == 2 and 101 not in loaded and -(2**62) in loaded
+    assert loaded.total_length == index.total_length == 6
+    for query in ("sand dirt", "stone", "gravel", "dirt sand stone gravel"):
+        assert loaded.search(query) == index.search(query)
+
+    BM25Index().save(path)
+    assert len(BM25Index.load(path)) == 0
+
+
+def test_sync_follows_vector_store(tmp_path):
+    embedder = FakeEmbedder()
+
+    def page(title: str, texts: list[str]) -> tuple[str, list[dict]]:
+        url = f"https://example.org/w/{title}"
+        return url, [{"text": text, "metadata": {"title": title, "url": url}} for text in texts]
+
+    with VectorStore(str(tmp_path)) as store:
+        store.upsert_pages([page("Stone", ["stone", "cobblestone"]), page("Dirt", ["dirt"])], embedder.embed)
+        index = BM25Index()
+        assert index.sync(store) == (3, 0)
+
+        store.remove_page("https://example.org/w/Dirt")
+        assert index.sync(store) == (0, 1)
+        assert set(index.numbers) == store.ids()
+        assert index.search("dirt") == []
+        hits = index.search("cobblestone")
+        assert [store.get([chunk_id])[chunk_id]["text"] for chunk_id, _ in hits] == ["cobblestone"]
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1]], k=60)
+    assert [item for item, _ in fused] == [1, 3, 2]
+    assert fused[0][1] == pytest.approx(1 / 61 + 1 / 62)
+    weighted = reciprocal_rank_fusion([[1, 2], [2, 1]], k=60, weights=[1.0, 3.0])
+    assert [item for item, _ in weighted] == [2, 1]
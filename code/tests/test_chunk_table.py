@@ -0,0 +1,68 @@
+import pytest
+
+from chunk_table import ChunkTable
+from main import write_json_atomic
+
+
+def meta(title, url, section="Usage", content_type="paragraph") -> dict:
+    return {"title": title, "url": url, "section": section, "content_type": content_type}
+
+
+STONE = "https://minecraft.wiki/w/Stone"
+
+SNOW = "https://minecraft.wiki/w/Snow_☃"
+
+PAGES = {
+    STONE: [
+        {"text": "[Stone | Usage]\nStone is mined with a pickaxe.", "metadata": meta("Stone", STONE)},
+        {"text": "[Stone | Usage]\n", "metadata": meta("Stone", STONE)},  # header, empty body
+        {"text": "[Stone | Usage]", "metadata": meta("Stone", STONE)},  # header without its newline
+        {"text": "", "metadata": meta("Stone", STONE, "Trivia")},
+        {"text": "No header on this one.", "metadata": meta("Stone", STONE, "Trivia")},
+        {"text": "[Stone | Trivia]\nHeader of another section.", "metadata": meta("Stone", STONE)},
+        {"text": "[Stone | ]\nEmpty section name.", "metadata": meta("Stone", STONE, "")},
+        {"text": "[Stone | None]\nNo section.", "metadata": meta("Stone", STONE, None)},
+        {"text": "[Stone | Usage]\nNo content type.", "metadata": {"title": "Stone", "url": STONE, "section": "Usage"}},
+        {"text": "[Stone | Usage]\nKeys reordered.", "metadata": {"url": STONE, "title": "Stone", "section": "Usage"}},
+        {"text": "Extra keys.", "metadata": {**meta("Stone", STONE), "sources": [{"url": SNOW}]}},
+    ],
+    SNOW: [
+        {"text": "[Snow ☃ | Über]\nSchnee fällt 🌨 – 雪が降る.", "metadata": meta("Snow ☃", SNOW, "Über")},
+        # Combining accent, zero-width space, astral character, trailing newline
+        {"text": "[Snow ☃ | Über]\ne\u0301\u200b\U0001f9f1\n", "metadata": meta("Snow ☃", SNOW, "Über")},
+        {"text": "[ | ]\nEmpty title and section.", "metadata": meta("", SNOW, "")},
+    ],
+}
+
+
+def test_chunks_roundtrip_through_table():
+    chunks = [chunk for page in PAGES.values() for chunk in page]
+    table = ChunkTable(chunks)
+    assert len(table) == len(chunks)
+    assert table.to_chunks() == chunks
+    assert list(table.texts()) == [chunk["text"] for chunk in chunks]
+    # Matching "[title | section]" lines are stored as a flag, others are kept in the text
+    assert list(table.has_header[:6]) == [1, 1, 0, 0, 0, 0]
+    assert [table[i].to_dict() for i in range(len(table))] == chunks
+    assert table[-1]["metadata"] == chunks[-1]["metadata"]
+    with pytest.raises(IndexError):
+        table[len(chunks)]
+
+
+def test_chunk_files_roundtrip_through_folder(tmp_path):
+    for i, (url, chunks) in enumerate(PAGES.items()):
+        write_json_atomic(str(tmp_path / f"page_{i}.json"), chunks, ensure_ascii=False, indent=2)
+    write_json_atomic(str(tmp_path / "page_2.json"), [])  # a page with no chunks is skipped
+    (tmp_path / "notes.txt").write_text("not a chunk file")
+
+    table, pages = ChunkTable.from_folder(str(tmp_path))
+    assert [url for url, _ in pages] == list(PAGES)
+    for url, rows in pages:
+        assert table.to_chunks(rows) == PAGES[url]
+
+    # Chunk dicts written back out load into an identical table
+    for i, (url, rows) in enumerate(pages):
+        write_json_atomic(str(tmp_path / f"page_{i}.json"), table.to_chunks(rows), ensure_ascii=False)
+    reloaded, _ = ChunkTable.from_folder(str(tmp_path))
+    assert reloaded.to_chunks() == table.to_chunks()
+    assert reloaded.buffer == table.buffer
@@ -0,0 +1,71 @@
+import pytest
+
+from chunking import TOKEN_MODEL, chunk_page, dedupe_rows, split_units, table_units
+from tokens import count_tokens
+
+HEADER = "[Stone | Obtaining]"
+
+TABLE_HEADER = "Block name | Hardness value | Blast resistance | Best tool | Luminous | Flammable | Renewable"
+
+
+def long_table(rows: int = 60) -> list[str]:
+    return [TABLE_HEADER] + [f"Block {i} | {i / 10} | {i} | Pickaxe | No | No | Yes" for i in range(rows)]
+
+
+@pytest.mark.parametrize("overlap", [0, 20, 40, 80])
+@pytest.mark.parametrize("max_tokens", [64, 128, 256])
+def test_pieces_fit_max_tokens(max_tokens, overlap):
+    units = [("An introductory line that is not part of the table.", None)] + table_units(long_table())
+    pieces = split_units(HEADER, units, max_tokens, overlap, TOKEN_MODEL)
+    assert len(pieces) > 1
+    for piece in pieces:
+        assert count_tokens(piece, TOKEN_MODEL) <= max_tokens
+
+
+def test_pieces_repeat_headers_and_overlap():
+    rows = long_table()
+    pieces = split_units(HEADER, table_units(rows), 128, 40, TOKEN_MODEL)
+    for piece in pieces:
+        assert piece.split("\n")[:2] == [HEADER, TABLE_HEADER]
+    for previous, piece in zip(pieces, pieces[1:]):
+        # The next piece starts with the last row of the previous one
+        assert piece.split("\n")[2] in previous.split("\n")[2:]
+    # Apart from the overlap, every row appears exactly once, in order
+    seen = []
+    for piece in pieces:
+        seen.extend(row for row in piece.split("\n")[2:] if not seen or row not in seen)
+    assert seen == rows[1:]
+
+
+def test_chunk_page_splits_long_table():
+    content = [{"type": "table", "section": "Obtaining", "data": [row.split(" | ") for row in long_table()]}]
+    chunks = chunk_page("Stone", "https://minecraft.wiki/w/Stone", content, max_tokens=128, overlap=40, legends={})
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert count_tokens(chunk["text"], TOKEN_MODEL) <= 128
+        assert chunk["metadata"]["content_type"] == "table"
+
+
+@pytest.mark.parametrize(
+    "rows, expected",
+    [
+        ([], []),
+        ([TABLE_HEADER], [TABLE_HEADER]),
+        (["Name | Value", "A | 1", "B | 2", "A | 1"], ["Name | Value", "A | 1", "B | 2"]),
+        (["Name | Value", "Name | Value", "A | 1", "Name | Value"], ["Name | Value", "Name | Value", "A | 1"]),
+    ],
+    ids=["empty", "header-only", "repeated-row", "row-matching-header"],
+)
+def test_dedupe_rows(rows, expected):
+    assert dedupe_rows(rows) == expected
+
+
+def test_chunk_page_keeps_header_only_tables():
+    header = TABLE_HEADER.split(" | ")
+    content = [
+        {"type": "table", "section": "Obtaining", "data": [header]},
+        {"type": "droptable", "section": "Obtaining", "data": [[header], []]},
+    ]
+    chunks = chunk_page("Stone", "https://minecraft.wiki/w/Stone", content, legends={})
+    assert [chunk["text"] for chunk in chunks] == [f"{HEADER}\n{TABLE_HEADER}"] * 2
+    assert [chunk["metadata"]["content_type"] for chunk in chunks] == ["table", "droptable"]
@@ -0,0 +1,69 @@
+import random
+
+from dedup import chunk_body, dedupe_chunks, find_duplicates
+
+WORDS = "stone dirt sand gravel iron gold diamond redstone torch lantern chest furnace hopper piston lever".split()
+
+
+def passage(seed: int, words: int = 80) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) + str(rng.randrange(100)) for _ in range(words))
+
+
+def chunk(title: str, section: str, body: str) -> dict:
+    return {"text": f"[{title} | {section}]\n{body}", "metadata": {"title": title, "section": section}}
+
+
+def test_chunk_body_strips_header():
+    assert chunk_body("[Stone | Obtaining]\nMined with a pickaxe.") == "Mined with a pickaxe."
+    assert chunk_body("Mined with a pickaxe.") == "Mined with a pickaxe."
+
+
+def test_near_duplicates_collapse_and_distinct_texts_stay():
+    base = passage(0)
+    words = base.split()
+    near = " ".join(words[:40] + ["obsidian"] + words[41:])  # one word of 80 changed
+    texts = [base, passage(1), near, passage(2), " ".join(words[::-1])]
+    assert find_duplicates(texts) == [0, 1, 0, 3, 4]
+
+
+def test_exact_duplicates_ignore_case_and_whitespace():
+    texts = ["Drops  cobblestone\nwhen mined", "drops cobblestone when MINED", "Drops cobble", "drops   COBBLE"]
+    assert find_duplicates(texts) == [0, 0, 2, 2]
+
+
+def test_short_texts_only_match_exactly():
+    # Too short to shingle, so never near-duplicates of each other
+    assert find_duplicates(["Yes", "No", "Yes", "Yes!"]) == [0, 1, 0, 3]
+
+
+def test_duplicates_point_at_their_first_copy():
+    base = passage(3)
+    words = base.split()
+    variants = [" ".join(words[:i] + ["obsidian"] + words[i + 1 :]) for i in (10, 50)]
+    assert find_duplicates([passage(4), *variants, base]) == [0, 1, 1, 1]
+
+
+def test_dedupe_chunks_compares_bodies_across_pages():
+    shared = passage(5)
+    words = shared.split()
+    chunks = [
+        chunk("Stone", "Usage", shared),
+        chunk("Dirt", "Usage", shared),  # same body, different page
+        chunk("Sand", "Usage", " ".join(words[:20] + ["obsidian"] + words[21:])),
+        chunk("Sand", "Trivia", passage(6)),
+    ]
+    canonical, report = dedupe_chunks(chunks)
+    assert canonical == [0, 0, 0, 3]
+    assert report["chunks"] == 4
+    assert report["unique"] == 2
+    assert (report["exact_duplicates"], report["near_duplicates"]) == (1, 1)
+    assert 0 < report["tokens_saved"] < report["tokens"]
+
+
+def test_threshold_controls_near_duplicates():
+    base = passage(7)
+    words = base.split()
+    edited = " ".join(words[:20] + ["obsidian"] * 10 + words[30:])  # 10 of 80 words replaced
+    assert find_duplicates([base, edited], threshold=0.5) == [0, 0]
+    assert find_duplicates([base, edited], threshold=0.95) == [0, 1]
@@ -0,0 +1,95 @@
+import os
+
+import numpy as np
+import pytest
+
+from embedding import FakeEmbedder
+from embedding_cache import EmbeddingCache
+
+
+class RecordingEmbedder(FakeEmbedder):
+    """A FakeEmbedder that records every batch it is asked to embed."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batches: list[list[str]] = []
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        self.batches.append(list(texts))
+        return super().embed(texts)
+
+
+def sent(embedder: RecordingEmbedder) -> list[str]:
+    return [text for batch in embedder.batches for text in batch]
+
+
+def test_hits_and_misses(tmp_path):
+    embedder = RecordingEmbedder()
+    with EmbeddingCache(embedder.model, embedder.dimension, str(tmp_path)) as cache:
+        first = cache.embed(["stone", "dirt"], embedder)
+        assert (cache.hits, cache.misses) == (0, 2)
+
+        second = cache.embed(["dirt", "sand", "stone"], embedder)
+        assert (cache.hits, cache.misses) == (2, 3)
+        assert cache.hit_rate() == pytest.approx(2 / 5)
+        assert sent(embedder) == ["stone", "dirt", "sand"]
+
+    np.testing.assert_array_equal(second, np.vstack([first[1], embedder.embed(["sand"])[0], first[0]]))
+    assert "stone" in cache and "gravel" not in cache
+
+
+def test_distinct_misses_are_sent_once(tmp_path):
+    embedder = RecordingEmbedder()
+    texts = ["stone", "dirt", "stone", "stone", "dirt", "sand"]
+    with EmbeddingCache(embedder.model, embedder.dimension, str(tmp_path)) as cache:
+        vectors = cache.embed(texts, embedder)
+        assert sent(embedder) == ["stone", "dirt", "sand"]
+        assert (cache.hits, cache.misses) == (0, 6)
+        assert len(cache) == 3
+    np.testing.assert_array_equal(vectors, FakeEmbedder().embed(texts))
+
+
+def test_reopen_keeps_vectors(tmp_path):
+    embedder = RecordingEmbedder()
+    with EmbeddingCache(embedder.model, embedder.dimension, str(tmp_path)) as cache:
+        expected = cache.embed(["stone", "dirt"], embedder)
+
+    with EmbeddingCache(embedder.model, embedder.dimension, str(tmp_path)) as cache:
+        np.testing.assert_array_equal(cache.embed(["stone", "dirt"], embedder), expected)
+        assert cache.hits == 2
+    assert len(embedder.batches) == 1
+
+    with pytest.raises(ValueError):
+        EmbeddingCache(embedder.model, 32, str(tmp_path))
+
+
+def test_compact_then_reopen(tmp_path):
+    embedder = RecordingEmbedder()
+    texts = [f"chunk {i}" for i in range(10)]
+    with EmbeddingCache(embedder.model, embedder.dimension, str(tmp_path)) as cache:
+        expected = cache.embed(texts, embedder)
+        assert cache.compact(texts) == 0
+        assert cache.generation == 0
+
+        assert cache.compact(texts[::2]) == 5
+        assert cache.generation == 1
+        assert len(cache) == 5
+        folder = cache.folder
+
+    assert sorted(os.listdir(folder)) == ["keys.1.bin", "meta.json", "vectors.1.f32"]
+
+    with EmbeddingCache(embedder.model, embedder.dimension, str(tmp_path)) as cache:
+        assert cache.generation == 1
+        assert [text in cache for text in texts] == [i % 2 == 0 for i in range(10)]
+        np.testing.assert_array_equal(cache.embed(texts[::2], embedder), expected[::2])
+        assert len(embedder.batches) == 1
+
+        # Evicted texts are embedded again, and a second compaction moves on to the next generation
+        cache.embed(texts[1:3], embedder)
+        assert sent(embedder)[10:] == ["chunk 1"]
+        assert cache.compact(texts[1:3]) == 4
+        assert cache.generation == 2
+
+    with EmbeddingCache(embedder.model, embedder.dimension, str(tmp_path)) as cache:
+        assert len(cache) == 2
+        np.testing.assert_array_equal(cache.embed(texts[1:3], embedder), expected[1:3])
@@ -0,0 +1,93 @@
+import os
+import time
+
+from benchmarks.synthetic_wiki import page_html
+from fetcher import TokenBucket, fetch_and_parse, iter_fetch_and_parse
+from http_client import HttpCache, HttpClient
+from parser import page_filename, page_title
+
+
+def write_pages(site, count: int) -> list[str]:
+    return [site.write(f"/w/Synthetic_Block_{n}", page_html(n)) for n in range(count)]
+
+
+def page_requests(site) -> list[dict]:
+    return [request for request in site.requests() if request["path"].startswith("/w/")]
+
+
+def test_token_bucket_does_not_burst():
+    bucket = TokenBucket(rate=20, capacity=1)
+    start = time.monotonic()
+    for _ in range(4):
+        bucket.acquire()
+    # The first token is there from the start; each later one takes 1 / rate
+    assert time.monotonic() - start >= 3 / 20 - 0.01
+
+
+def test_requests_are_spaced_by_crawl_delay(tmp_path, static_site):
+    site = static_site()
+    urls = write_pages(site, 3)
+    robots_url = site.write("/robots.txt", "User-agent: *\nCrawl-delay: 1\n")
+    client = HttpClient(HttpCache(str(tmp_path / "http_cache")))
+
+    # The requested rate is capped by Crawl-delay, and concurrency does not let requests burst past it
+    pages = iter_fetch_and_parse(
+        urls, str(tmp_path / "json"), max_concurrency=4, rate=50, parse_workers=1, robots_url=robots_url, client=client
+    )
+    results = list(pages)
+    requests = page_requests(site)
+    starts = sorted(request["start"] for request in requests)
+    assert len(requests) == 3
+    for previous, start in zip(starts, starts[1:]):
+        assert start - previous >= 0.95
+
+    # Every page is yielded once, in the order its fetch completed
+    served = [site.base_url + request["path"] for request in sorted(requests, key=lambda request: request["end"])]
+    assert [url for url, _ in results] == served
+
+
+def test_in_flight_requests_are_bounded(tmp_path, static_site):
+    site = static_site(delay=0.2)
+    urls = write_pages(site, 8)
+    client = HttpClient(HttpCache(str(tmp_path / "http_cache")))
+
+    saved = fetch_and_parse(
+        urls, str(tmp_path / "json"), max_concurrency=3, rate=1000, parse_workers=1, robots_url=None, client=client
+    )
+
+    requests = page_requests(site)
+    assert sorted(request["path"] for request in requests) == sorted(url[len(site.base_url) :] for url in urls)
+    events = sorted([(request["start"], 1) for request in requests] + [(request["end"], -1) for request in requests])
+    in_flight = peak = 0
+    for _, change in events:
+        in_flight += change
+        peak = max(peak, in_flight)
+    assert peak == 3
+
+    # Every page is saved, each under its own title
+    assert saved == {url: page_filename(page_title(page_html(n))) for n, url in enumerate(urls)}
+
+
+def test_unchanged_page_is_skipped_only_while_its_json_exists(tmp_path, static_site):
+    site = static_site()
+    url = write_pages(site, 1)[0]
+    folder = str(tmp_path / "json")
+    client = HttpClient(HttpCache(str(tmp_path / "http_cache")))
+    options = {"parse_workers": 1, "robots_url": None, "rate": 1000, "client": client}
+
+    filename = fetch_and_parse([url], folder, **options)[url]
+    assert filename == page_filename(page_title(page_html(0)))
+
+    # 304 with the JSON in place: nothing to parse
+    assert fetch_and_parse([url], folder, **options) == {url: None}
+    assert [request["status"] for request in page_requests(site)] == [200, 304]
+
+    # 304 with the JSON gone: the cached body is parsed again
+    os.remove(os.path.join(folder, filename))
+    assert fetch_and_parse([url], folder, **options) == {url: filename}
+    assert os.path.exists(os.path.join(folder, filename))
+    assert [request["status"] for request in page_requests(site)] == [200, 304, 304]
+
+    # Asked for explicitly, or with skip_unchanged off, an unchanged page is parsed too
+    assert fetch_and_parse([url], folder, reparse_unchanged=[url], **options) == {url: filename}
+    assert dict(iter_fetch_and_parse([url], folder, skip_unchanged=False, **options)) == {url: filename}
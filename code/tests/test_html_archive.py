@@ -0,0 +1,124 @@
+import gzip
+import os
+import random
+
+from html_archive import PACK_FILE, SCAN_CHUNK, HtmlArchive
+from main import pack_corpus
+
+
+def page(n: int) -> bytes:
+    return f"<html><body><h1>Page {n}</h1><p>Ünïcode body {n}</p></body></html>".encode()
+
+
+def large_page(seed: int) -> bytes:
+    # Incompressible, so its gzip member spans several SCAN_CHUNK reads
+    return random.Random(seed).randbytes(3 * SCAN_CHUNK).hex().encode()
+
+
+def fill(folder: str) -> dict[str, bytes]:
+    pages = {f"https://example.org/w/Page_{n}": page(n) for n in range(5)}
+    pages["https://example.org/w/Large"] = large_page(0)
+    with HtmlArchive(folder) as archive:
+        for url, body in pages.items():
+            archive.put(url, body, "utf-8")
+    return pages
+
+
+def assert_holds(archive: HtmlArchive, pages: dict[str, bytes]) -> None:
+    assert sorted(archive.urls()) == sorted(pages)
+    for url, body in pages.items():
+        assert archive.read(url)[1] == body
+    assert dict(archive) == {url: body.decode() for url, body in pages.items()}
+
+
+def test_index_is_rebuilt_from_pack(tmp_path):
+    folder = str(tmp_path)
+    pages = fill(folder)
+    with HtmlArchive(folder) as archive:
+        offsets = dict(archive.offsets)
+
+    os.remove(os.path.join(folder, PACK_FILE + ".idx"))
+    with HtmlArchive(folder) as archive:
+        assert archive.offsets == offsets
+        assert_holds(archive, pages)
+
+
+def test_partial_last_member_is_dropped(tmp_path):
+    folder = str(tmp_path)
+    pages = fill(folder)
+    path = os.path.join(folder, PACK_FILE)
+    complete_size = os.path.getsize(path)
+    # A crash mid-write: records appended after the index was last written, the last one cut short
+    appended = {"https://example.org/w/Late": page(9)}
+    with open(path, "ab") as f:
+        for url, body in appended.items():
+            header = f'{{"url":"{url}","date":"2024-01-01T00:00:00Z","encoding":"utf-8","length":{len(body)}}}\n'
+            f.write(gzip.compress(header.encode() + body + b"\n"))
+        size_before_partial = f.tell()
+        f.write(gzip.compress(b'{"url":"https://example.org/w/Torn"}\n' + large_page(1))[: SCAN_CHUNK + 100])
+    pages.update(appended)
+    assert size_before_partial > complete_size
+
+    with HtmlArchive(folder) as archive:
+        assert "https://example.org/w/Torn" not in archive
+        assert os.path.getsize(path) == archive.indexed_size == size_before_partial
+        assert_holds(archive, pages)
+        archive.put("https://example.org/w/After", page(10))
+    pages["https://example.org/w/After"] = page(10)
+
+    # The same holds when the whole index has to be rebuilt
+    os.remove(path + ".idx")
+    with open(path, "ab") as f:
+        f.write(gzip.compress(b"truncated record")[:10])
+    with HtmlArchive(folder) as archive:
+        assert_holds(archive, pages)
+
+
+def test_corrupt_member_stops_the_scan(tmp_path):
+    folder = str(tmp_path)
+    pages = fill(folder)
+    path = os.path.join(folder, PACK_FILE)
+    size = os.path.getsize(path)
+    with open(path, "ab") as f:
+        f.write(b"\x1f\x8b\x08\x00not a deflate stream at all")
+    os.remove(path + ".idx")
+    with HtmlArchive(folder) as archive:
+        assert archive.indexed_size == size
+        assert_holds(archive, pages)
+
+
+def test_compact_keeps_latest_versions(tmp_path):
+    folder = str(tmp_path)
+    pages = fill(folder)
+    with HtmlArchive(folder) as archive:
+        assert archive.compact() == 0
+        for n in range(3):
+            url = f"https://example.org/w/Page_{n}"
+            pages[url] = page(n) + b"<!-- edited -->"
+            archive.put(url, pages[url])
+        size = archive.indexed_size
+        reclaimed = archive.compact()
+        assert reclaimed > 0
+        assert os.path.getsize(archive.path) == size - reclaimed
+        assert_holds(archive, pages)
+        archive.put("https://example.org/w/New", page(11))
+    pages["https://example.org/w/New"] = page(11)
+
+    with HtmlArchive(folder) as archive:
+        assert_holds(archive, pages)
+    os.remove(os.path.join(folder, PACK_FILE + ".idx"))
+    with HtmlArchive(folder) as archive:
+        assert_holds(archive, pages)
+
+
+def test_pack_mode_compacts_archive(tmp_path):
+    folder = str(tmp_path / "archive")
+    pages = fill(folder)
+    with HtmlArchive(folder) as archive:
+        archive.put("https://example.org/w/Page_0", page(0))
+        size = archive.indexed_size
+
+    pack_corpus(str(tmp_path / "json"), str(tmp_path / "chunks"), str(tmp_path / "corpus"), folder)
+    with HtmlArchive(folder) as archive:
+        assert archive.indexed_size < size
+        assert_holds(archive, pages)
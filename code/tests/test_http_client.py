@@ -0,0 +1,85 @@
+import json
+import os
+
+from http_client import HttpCache, HttpClient
+
+PAGE = "<html><body><p>Stone is a block found in the Overworld.</p></body></html>"
+
+
+def test_revalidates_with_etag_and_reuses_body(tmp_path, static_site):
+    site = static_site()
+    url = site.write("/w/Stone", PAGE)
+    client = HttpClient(HttpCache(str(tmp_path)))
+
+    first = client.get(url)
+    assert (first.status_code, first.not_modified, first.text) == (200, False, PAGE)
+
+    second = client.get(url)
+    assert (second.status_code, second.not_modified, second.content) == (200, True, first.content)
+    assert b"".join(client.iter_content(url)) == first.content
+
+    requests = site.requests()
+    assert [request["status"] for request in requests] == [200, 304, 304]
+    assert requests[0]["if_none_match"] is None and requests[0]["if_modified_since"] is None
+    for request in requests[1:]:
+        assert request["if_none_match"] and request["if_modified_since"]
+    assert client.stats.as_dict()["hits"] == 2
+
+    # A changed page is downloaded again and replaces the cached copy
+    site.write("/w/Stone", PAGE.replace("Overworld", "Nether"))
+    third = client.get(url)
+    assert (third.not_modified, third.text) == (False, PAGE.replace("Overworld", "Nether"))
+    assert client.get(url).not_modified
+
+
+def test_revalidates_with_last_modified_alone(tmp_path, static_site):
+    site = static_site()
+    url = site.write("/w/Stone", PAGE)
+    cache = HttpCache(str(tmp_path))
+    client = HttpClient(cache)
+    client.get(url)
+
+    # As for a server that sends no ETag
+    meta_path = cache._path(url) + ".json"
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    meta["etag"] = None
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    response = client.get(url)
+    assert (response.not_modified, response.text) == (True, PAGE)
+    request = site.requests()[-1]
+    assert request["if_none_match"] is None
+    assert request["if_modified_since"] == meta["last_modified"]
+    assert request["status"] == 304
+
+
+class VanishingBodyCache(HttpCache):
+    """A cache whose bodies are pruned right after has_body reports them present."""
+
+    def has_body(self, url: str) -> bool:
+        present = super().has_body(url)
+        if present:
+            os.remove(self._path(url) + ".gz")
+        return present
+
+
+def test_body_removed_after_check_is_refetched_once(tmp_path, static_site):
+    site = static_site()
+    url = site.write("/w/Stone", PAGE)
+    HttpClient(HttpCache(str(tmp_path))).get(url)
+    client = HttpClient(VanishingBodyCache(str(tmp_path)))
+
+    response = client.get(url)
+    assert (response.status_code, response.not_modified, response.text) == (200, False, PAGE)
+    requests = site.requests()[1:]
+    assert [request["status"] for request in requests] == [304, 200]
+    assert requests[1]["if_none_match"] is None and requests[1]["if_modified_since"] is None
+    # The refetched body went back into the cache
+    assert HttpClient(HttpCache(str(tmp_path))).get(url).not_modified
+
+    assert b"".join(client.iter_content(url)).decode() == PAGE
+    requests = site.requests()[4:]
+    assert [request["status"] for request in requests] == [304, 200]
+    assert requests[1]["if_none_match"] is None and requests[1]["if_modified_since"] is None
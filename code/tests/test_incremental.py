@@ -0,0 +1,93 @@
+import os
+
+from benchmarks.synthetic_wiki import page_html
+from embedding import FakeEmbedder
+from embedding_cache import EmbeddingCache
+from http_client import HttpCache, HttpClient
+from main import incremental_update
+from manifest import Manifest
+from vector_store import VectorStore
+
+NEW_TEXT = "Synthetic blocks can now be waxed to stop them weathering."
+
+
+def write_urls(path: str, sitemap: dict[str, str]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(f"{url}\t{lastmod}\n" for url, lastmod in sitemap.items())
+
+
+def test_manifest_changed_and_removed_urls(tmp_path):
+    manifest = Manifest(str(tmp_path / "manifest.json"))
+    manifest.update("https://example.org/w/A", "2024-01-01", "a", "A.json", "A.json")
+    manifest.update("https://example.org/w/B", "2024-01-01", "b", "B.json", "B.json")
+    manifest.update("https://example.org/w/C", "2024-01-01", "c", "C.json", None)
+    manifest.save()
+
+    manifest = Manifest(str(tmp_path / "manifest.json"))
+    sitemap = {
+        "https://example.org/w/A": "2024-01-01",  # unchanged
+        "https://example.org/w/C": "2024-01-01",  # never chunked
+        "https://example.org/w/D": "2024-01-01",  # new
+        "https://example.org/w/E": None,  # no lastmod: left to the HTTP cache
+    }
+    assert manifest.changed_urls(sitemap) == [
+        "https://example.org/w/C",
+        "https://example.org/w/D",
+        "https://example.org/w/E",
+    ]
+    assert manifest.removed_urls(sitemap) == ["https://example.org/w/B"]
+    assert manifest.changed_urls({"https://example.org/w/A": "2024-02-01"}) == ["https://example.org/w/A"]
+
+
+def test_incremental_update_indexes_changed_and_removed_pages(tmp_path, static_site):
+    site = static_site()
+    urls = [site.write(f"/w/Synthetic_Block_{n}", page_html(n)) for n in range(3)]
+    folders = {
+        "urls_file": str(tmp_path / "urls.txt"),
+        "json_folder": str(tmp_path / "json"),
+        "chunk_folder": str(tmp_path / "chunks"),
+        "manifest_path": str(tmp_path / "manifest.json"),
+        "archive_folder": str(tmp_path / "archive"),
+        "store_folder": str(tmp_path / "store"),
+        "cache_folder": str(tmp_path / "embeddings"),
+    }
+    options = {
+        "embedder": FakeEmbedder(),
+        "client": HttpClient(HttpCache(str(tmp_path / "http_cache"))),
+        "robots_url": None,
+        "rate": 1000,
+        "parse_workers": 1,
+    }
+
+    write_urls(folders["urls_file"], {url: "2024-01-01" for url in urls})
+    assert sorted(incremental_update(**folders, **options)) == urls
+    with VectorStore(folders["store_folder"], read_only=True) as store:
+        assert store.urls() == set(urls)
+    removed_entry = Manifest(folders["manifest_path"]).entries[urls[2]]
+
+    # Page 1 is edited (and its lastmod bumped), page 2 leaves the sitemap, page 0 is untouched
+    site.write("/w/Synthetic_Block_1", page_html(1).replace("<p>", f"<p>{NEW_TEXT}</p><p>", 1))
+    write_urls(folders["urls_file"], {urls[0]: "2024-01-01", urls[1]: "2024-02-01"})
+    requests_before = len(site.requests())
+    assert incremental_update(**folders, **options) == [urls[1]]
+    assert [request["path"] for request in site.requests()[requests_before:]] == ["/w/Synthetic_Block_1"]
+
+    manifest = Manifest(folders["manifest_path"])
+    assert set(manifest.entries) == set(urls[:2])
+    assert manifest.entries[urls[1]]["lastmod"] == "2024-02-01"
+    assert not os.path.exists(os.path.join(folders["json_folder"], removed_entry["json_file"]))
+    assert not os.path.exists(os.path.join(folders["chunk_folder"], removed_entry["chunk_file"]))
+
+    with VectorStore(folders["store_folder"], read_only=True) as store:
+        assert store.urls() == set(urls[:2])
+        rows = store.get(store.page_ids(urls[1])).values()
+        assert any(NEW_TEXT in row["text"] for row in rows)
+        query = options["embedder"].embed([next(row["text"] for row in rows if NEW_TEXT in row["text"])])
+        assert NEW_TEXT in store.search(query, k=1)[0][0]["text"]
+        live_texts = set(store.texts())
+
+    # The edited and removed chunks' vectors were compacted out of the embedding cache
+    embedder = options["embedder"]
+    with EmbeddingCache(embedder.model, embedder.dimension, folders["cache_folder"]) as cache:
+        assert cache.generation == 1
+        assert len(cache) == len(live_texts)
@@ -0,0 +1,53 @@
+import glob
+import json
+import os
+
+import pytest
+
+from parser import PARSER_BACKENDS, MinecraftWikiParser, default_backend
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "fixtures")
+
+FIXTURES = sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.html")))
+
+
+def require_backend(backend: str) -> None:
+    if backend != "html.parser":
+        pytest.importorskip(backend)
+
+
+def test_fixtures_present():
+    assert FIXTURES
+
+
+@pytest.mark.parametrize("backend", PARSER_BACKENDS)
+@pytest.mark.parametrize("path", FIXTURES, ids=lambda path: os.path.basename(path))
+def test_golden_output(path, backend):
+    """Every backend extracts exactly the saved golden output (regenerate with bench_parse.py --update)."""
+    require_backend(backend)
+    with open(path, "r", encoding="utf-8") as f:
+        html = f.read()
+    with open(path[: -len(".html")] + ".expected.json", "r", encoding="utf-8") as f:
+        golden = json.load(f)
+    parser = MinecraftWikiParser(golden["url"], html=html, backend=backend)
+    assert parser.title == golden["title"]
+    assert parser.content == golden["content"]
+
+
+@pytest.mark.parametrize("backend", PARSER_BACKENDS)
+def test_backends_agree_on_synthetic_pages(backend):
+    """Synthetic pages cover every block type; all backends must extract them like html.parser."""
+    require_backend(backend)
+    from benchmarks.synthetic_wiki import page_html
+
+    for number in range(20):
+        html = page_html(number)
+        expected = MinecraftWikiParser("https://example.org/w/Page", html=html, backend="html.parser")
+        parser = MinecraftWikiParser("https://example.org/w/Page", html=html, backend=backend)
+        assert parser.title == expected.title
+        assert parser.content == expected.content
+        assert {block["type"] for block in parser.content} >= {"paragraph", "list", "table", "infobox"}
+
+
+def test_default_backend_is_listed():
+    assert default_backend() in PARSER_BACKENDS
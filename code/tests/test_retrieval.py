@@ -0,0 +1,66 @@
+from bm25 import BM25Index
+from embedding import FakeEmbedder
+from retrieval import Retriever, normalize_question
+from vector_store import VectorStore
+
+
+class RecordingEmbedder(FakeEmbedder):
+    def __init__(self):
+        super().__init__()
+        self.calls: list[list[str]] = []
+
+    def embed(self, texts):
+        self.calls.append(list(texts))
+        return super().embed(texts)
+
+
+def fill(folder: str, embedder: FakeEmbedder) -> None:
+    pages = []
+    for title in ("Stone", "Dirt", "Sand"):
+        url = f"https://example.org/w/{title}"
+        texts = [f"{title} is a block", f"{title} can be mined", f"Crafting with {title}"]
+        pages.append((url, [{"text": text, "metadata": {"title": title, "url": url}} for text in texts]))
+    with VectorStore(folder) as store:
+        store.upsert_pages(pages, embedder.embed)
+        store.save()
+
+
+def test_normalize_question():
+    assert normalize_question("  How do I\tmine\nSTONE? ") == "how do i mine stone?"
+
+
+def test_original_question_is_embedded_and_normalized_form_is_cached(tmp_path):
+    embedder = RecordingEmbedder()
+    fill(str(tmp_path), embedder)
+    embedder.calls.clear()
+    with VectorStore(str(tmp_path), read_only=True) as store:
+        with Retriever(store, embedder, max_batch_wait=0) as retriever:
+            hits = retriever.retrieve("How do I mine  Stone?", k=2)
+            assert embedder.calls == [["How do I mine  Stone?"]]
+            assert len(hits) == 2
+
+            assert retriever.retrieve("how do i mine stone?", k=2) == hits
+            assert retriever.results.hits == 1
+            # A different k misses the result cache but reuses the query embedding
+            assert retriever.retrieve(" HOW DO I MINE STONE? ", k=3)[:2] == hits
+            assert embedder.calls == [["How do I mine  Stone?"]]
+            assert retriever.embeddings.hits == 1
+
+
+def test_cached_results_cannot_be_mutated_by_callers(tmp_path):
+    embedder = FakeEmbedder()
+    fill(str(tmp_path), embedder)
+    with VectorStore(str(tmp_path), read_only=True) as store:
+        lexical = BM25Index()
+        lexical.sync(store)
+        with Retriever(store, embedder, max_batch_wait=0, lexical=lexical) as retriever:
+            first = retriever.retrieve("Stone block", k=2)
+            expected = [{**hit, "sources": [dict(source) for source in hit["sources"]]} for hit in first]
+            first[0]["text"] = "changed"
+            first[0]["sources"].append({"url": "https://example.org/w/Other"})
+            first.pop()
+
+            second = retriever.retrieve("stone block", k=2)
+            assert second == expected
+            second[0]["metadata"] = {}
+            assert retriever.retrieve("Stone  Block", k=2) == expected
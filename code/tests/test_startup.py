@@ -0,0 +1,22 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+CODE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize(
+    "module, deferred",
+    [
+        ("embedding", ["numpy", "faiss", "openai"]),
+        ("main", ["numpy", "faiss", "openai", "embedding", "vector_store"]),
+        ("pipeline", ["numpy", "faiss", "openai", "embedding", "embedding_cache", "main", "fetcher", "html_archive"]),
+    ],
+)
+def test_heavy_imports_are_deferred(module, deferred):
+    """Importing an entry point must not load what only some of its functions need (see bench_startup.py)."""
+    code = f"import sys, {module}; print(','.join(name for name in {deferred!r} if name in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=CODE_DIR, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
@@ -0,0 +1,169 @@
+import json
+import os
+
+import pytest
+
+from embedding import FakeEmbedder
+from vector_store import VectorStore, sync_chunk_folder
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat")
+
+
+def page_chunks(url: str, texts: list[str]) -> list[dict]:
+    title = url.rsplit("/", 1)[-1]
+    return [
+        {"text": text, "metadata": {"title": title, "url": url, "section": "Usage", "content_type": "paragraph"}}
+        for text in texts
+    ]
+
+
+def page_texts(name: str, n: int = 3) -> list[str]:
+    return [f"{name} fact {i}: {name.lower()} blocks behave in way number {i}." for i in range(n)]
+
+
+class CountingEmbed:
+    """An embed callable that records every call it gets."""
+
+    def __init__(self, embedder: FakeEmbedder):
+        self.embedder = embedder
+        self.calls: list[list[str]] = []
+
+    def __call__(self, texts: list[str]):
+        self.calls.append(list(texts))
+        return self.embedder.embed(texts)
+
+
+def top_text(store: VectorStore, embedder: FakeEmbedder, text: str) -> str | None:
+    hits = store.search(embedder.embed([text]), k=1)[0]
+    return hits[0]["text"] if hits else None
+
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_upsert_remove_reopen(tmp_path, index_type):
+    embedder = FakeEmbedder()
+    folder = str(tmp_path / "store")
+    stone = page_chunks("https://example.org/w/Stone", page_texts("Stone"))
+    dirt = page_chunks("https://example.org/w/Dirt", page_texts("Dirt"))
+
+    with VectorStore(folder, index_type=index_type) as store:
+        assert store.upsert_pages([(c[0]["metadata"]["url"], c) for c in (stone, dirt)], embedder.embed) == (6, 0)
+        store.save()
+
+    with VectorStore(folder) as store:
+        assert store.index_type == index_type
+        assert len(store) == 6
+        assert top_text(store, embedder, dirt[1]["text"]) == dirt[1]["text"]
+
+        # Change one chunk of a page, then drop the other page
+        changed = stone[:2] + page_chunks(stone[0]["metadata"]["url"], ["Stone can be smelted into smooth stone."])
+        assert store.upsert_page(stone[0]["metadata"]["url"], changed, embedder.embed) == (1, 1)
+        assert store.remove_page(dirt[0]["metadata"]["url"]) == 3
+        store.save()
+
+    with VectorStore(folder, read_only=True) as store:
+        assert store.urls() == {"https://example.org/w/Stone"}
+        ids = store.page_ids("https://example.org/w/Stone")
+        rows = store.get(ids)
+        assert [rows[row_id]["text"] for row_id in ids] == [chunk["text"] for chunk in changed]
+        assert top_text(store, embedder, changed[2]["text"]) == changed[2]["text"]
+        for chunk in dirt + stone[2:]:
+            assert top_text(store, embedder, chunk["text"]) != chunk["text"]
+    assert sorted(os.listdir(folder)) == ["index.2.faiss", "metadata.sqlite"]
+
+
+def test_upsert_unchanged_page_embeds_nothing(tmp_path):
+    embed = CountingEmbed(FakeEmbedder())
+    chunks = page_chunks("https://example.org/w/Stone", page_texts("Stone"))
+    with VectorStore(str(tmp_path)) as store:
+        store.upsert_page("https://example.org/w/Stone", chunks, embed)
+        assert store.upsert_page("https://example.org/w/Stone", chunks, embed) == (0, 0)
+    assert len(embed.calls) == 1
+
+
+def test_hnsw_keeps_stale_vectors_out_of_results(tmp_path):
+    embedder = FakeEmbedder()
+    folder = str(tmp_path)
+    pages = {name: page_chunks(f"https://example.org/w/{name}", page_texts(name)) for name in ("Stone", "Dirt", "Sand")}
+    with VectorStore(folder, index_type="hnsw") as store:
+        store.upsert_pages([(chunks[0]["metadata"]["url"], chunks) for chunks in pages.values()], embedder.embed)
+        store.save()
+        store.remove_page("https://example.org/w/Dirt")
+        store.save()
+
+    with VectorStore(folder) as store:
+        # HNSW cannot delete: the vectors stay in the graph and are counted as stale
+        assert store.stale == 3
+        assert store.index.ntotal == 9
+        query = embedder.embed([pages["Dirt"][0]["text"]])
+        hits = store.search(query, k=6)[0]
+        assert len(hits) == 6
+        assert all(hit["url"] != "https://example.org/w/Dirt" for hit in hits)
+
+        store.build(pages["Stone"], embedder.embed([chunk["text"] for chunk in pages["Stone"]]))
+        assert store.stale == 0
+        assert store.index.ntotal == 3
+
+
+def test_ivf_buffers_vectors_until_trained(tmp_path):
+    embedder = FakeEmbedder()
+    folder = str(tmp_path)
+    stone = page_chunks("https://example.org/w/Stone", page_texts("Stone", 40))
+    dirt = page_chunks("https://example.org/w/Dirt", page_texts("Dirt", 40))
+    with VectorStore(folder, index_type="ivf_flat") as store:
+        store.upsert_page("https://example.org/w/Stone", stone, embedder.embed)
+        store.upsert_page("https://example.org/w/Dirt", dirt, embedder.embed)
+        # Nothing is trained on the first page alone: both pages wait in the buffer
+        assert store.index is None
+        assert sum(len(ids) for ids, _ in store.untrained) == 80
+
+        # Vectors removed while buffered never reach the index
+        store.remove_page("https://example.org/w/Dirt")
+        assert sum(len(ids) for ids, _ in store.untrained) == 40
+        store.save()
+        assert store.untrained == []
+        assert store.index.is_trained
+        assert store.index.ntotal == 40
+
+    with VectorStore(folder) as store:
+        assert store.index.ntotal == 40
+        assert top_text(store, embedder, stone[7]["text"]) == stone[7]["text"]
+
+
+def test_ivf_search_trains_buffered_vectors(tmp_path):
+    embedder = FakeEmbedder()
+    chunks = page_chunks("https://example.org/w/Stone", page_texts("Stone", 40))
+    with VectorStore(str(tmp_path), index_type="ivf_flat") as store:
+        store.upsert_page("https://example.org/w/Stone", chunks, embedder.embed)
+        assert store.index is None
+        assert top_text(store, embedder, chunks[3]["text"]) == chunks[3]["text"]
+        assert store.untrained == []
+
+
+def write_chunk_files(folder, pages: dict[str, list[str]]) -> None:
+    os.makedirs(folder, exist_ok=True)
+    for name, texts in pages.items():
+        with open(os.path.join(folder, f"{name}.json"), "w", encoding="utf-8") as f:
+            json.dump(page_chunks(f"https://example.org/w/{name}", texts), f)
+
+
+def test_sync_embeds_all_pages_in_one_call(tmp_path):
+    embed = CountingEmbed(FakeEmbedder())
+    chunk_folder = str(tmp_path / "chunks")
+    names = [f"Block_{i}" for i in range(12)]
+    write_chunk_files(chunk_folder, {name: page_texts(name) for name in names})
+
+    with VectorStore(str(tmp_path / "store")) as store:
+        assert sync_chunk_folder(chunk_folder, store, embed, dedupe=False) == (36, 0)
+        assert len(embed.calls) == 1
+        assert len(embed.calls[0]) == 36
+
+        # Only the edited page's new chunk is embedded; a page with no chunk file is removed
+        os.remove(os.path.join(chunk_folder, "Block_0.json"))
+        write_chunk_files(chunk_folder, {"Block_1": page_texts("Block_1", 2) + ["Block 1 is now renewable."]})
+        assert sync_chunk_folder(chunk_folder, store, embed, dedupe=False) == (1, 4)
+        assert embed.calls[1:] == [["Block 1 is now renewable."]]
+
+        # Nothing new: no embed call at all
+        assert sync_chunk_folder(chunk_folder, store, embed, dedupe=False) == (0, 0)
+        assert len(embed.calls) == 2
+        assert len(store) == 33
@@ -0,0 +1,32 @@
+import logging
+
+CHARS_PER_TOKEN = 4  # rough average for English text when no tokenizer is available
+
+_encodings: dict[str, object] = {}
+
+
+def get_encoding(model: str):
+    """Return the tiktoken encoding for a model, or None if tiktoken is unavailable."""
+    if model not in _encodings:
+        try:
+            import tiktoken
+
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except ImportError:
+            logging.warning(
+                f"tiktoken is not installed; estimating {model} token counts as characters / {CHARS_PER_TOKEN}"
+            )
+            _encodings[model] = None
+        except Exception as e:
+            # Unknown model, or the encoding files could not be downloaded
+            logging.warning(f"No tokenizer for {model}, estimating token counts: {e}")
+            _encodings[model] = None
+    return _encodings[model]
+
+
+def count_tokens(text: str, model: str) -> int:
+    """Count the tokens a model will see for `text` (estimated from length without tiktoken)."""
+    encoding = get_encoding(model)
+    if encoding is None:
+        return max(1, -(-len(text) // CHARS_PER_TOKEN))
+    return len(encoding.encode(text, disallowed_special=()))
@@ -0,0 +1,484 @@
+import hashlib
+import logging
+import os
+import sqlite3
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from typing import TypedDict
+
+import numpy as np
+
+from chunk_table import ChunkTable
+from chunking import TOKEN_MODEL, ChunkType
+from dedup import THRESHOLD, dedupe_chunks, log_report
+from embedding import build_index, load_index, prepare_vectors, save_index
+from metrics import inc, timer
+from tokens import count_tokens
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+STORE_DIR = os.path.join(ROOT_DIR, "vector_store")
+
+TRAINED_INDEX_TYPES = ("ivf_flat", "ivf_pq")  # index types that must be trained before vectors are added
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    title TEXT,
+    section TEXT,
+    content_type TEXT,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chunks_url ON chunks (url);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS sources (id INTEGER NOT NULL, url TEXT NOT NULL, title TEXT, section TEXT);
+CREATE INDEX IF NOT EXISTS sources_id ON sources (id);
+"""
+
+
+class SearchHit(TypedDict):
+    id: int
+    score: float
+    url: str
+    title: str
+    section: str
+    content_type: str
+    text: str
+    sources: list[dict[str, str]]  # other pages/sections whose duplicate of this chunk was not indexed
+
+
+def chunk_id(url: str, text: str, occurrence: int = 0) -> int:
+    """
+    Stable 63-bit id for a chunk, derived from its page URL and text.
+
+    An unchanged chunk keeps its id across re-chunking, so updating a page only
+    touches the chunks that actually changed. `occurrence` tells apart identical
+    chunks on the same page.
+    """
+    digest = hashlib.blake2b(f"{url}\0{text}\0{occurrence}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") & 0x7FFF_FFFF_FFFF_FFFF  # FAISS ids are signed; -1 means "no result"
+
+
+def page_chunk_ids(url: str, chunks: Sequence[ChunkType]) -> list[int]:
+    seen: dict[str, int] = {}
+    ids = []
+    for chunk in chunks:
+        occurrence = seen.get(chunk["text"], 0)
+        seen[chunk["text"]] = occurrence + 1
+        ids.append(chunk_id(url, chunk["text"], occurrence))
+    return ids
+
+
+class VectorStore:
+    """
+    FAISS index plus an SQLite table of chunk metadata, keyed by the same stable ids.
+
+    The index is built with the chunk ids (see build_index), so search hits map
+    straight to metadata rows and pages can be added, replaced or removed without
+    a rebuild. Index types that cannot delete vectors (HNSW) leave stale vectors
+    behind; hits without a metadata row are dropped until the next `build`.
+
+    Changes are held in an open SQLite transaction until `save`, which writes a
+    new index file generation and commits the metadata (including the generation
+    number) together, so the two can never disagree on disk.
+
+    IVF indexes are trained once, on every vector added to the empty store before
+    the first `save` (or search), rather than on whichever page happens to come
+    first; until then new vectors are buffered.
+    """
+
+    def __init__(
+        self,
+        folder: str = STORE_DIR,
+        index_type: str = "flat",
+        metric: str = "cosine",
+        read_only: bool = False,
+        **index_kwargs,
+    ):
+        self.folder = folder
+        self.read_only = read_only
+        self.index_kwargs = index_kwargs
+        db_path = os.path.join(folder, "metadata.sqlite")
+        if read_only:
+            self.db = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            os.makedirs(folder, exist_ok=True)
+            self.db = sqlite3.connect(db_path)
+            self.db.executescript(SCHEMA)
+
+        meta = dict(self.db.execute("SELECT key, value FROM meta"))
+        self.has_sources = bool(self.db.execute("SELECT 1 FROM sqlite_master WHERE name = 'sources'").fetchone())
+        self.index_type = meta.get("index_type", index_type)
+        self.metric = meta.get("metric", metric)
+        self.generation = int(meta.get("generation", 0))
+        self.stale = int(meta.get("stale", 0))  # vectors left in an index that cannot remove them
+
+        self.index = None
+        self.untrained: list[tuple[np.ndarray, np.ndarray]] = []  # (ids, vectors) waiting for the index to be trained
+        if self.generation:
+            # A memory-mapped index is read-only, so only map it when the store will not be modified
+            self.index = load_index(self._index_path(self.generation), mmap=read_only)
+        logging.info(f"Opened vector store {folder}: {len(self)} chunks, {self.index_type} index ({self.metric})")
+
+    def _index_path(self, generation: int) -> str:
+        return os.path.join(self.folder, f"index.{generation}.faiss")
+
+    def __len__(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def __enter__(self) -> "VectorStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def urls(self) -> set[str]:
+        return {url for (url,) in self.db.execute("SELECT DISTINCT url FROM chunks")}
+
+    def ids(self) -> set[int]:
+        return {row_id for (row_id,) in self.db.execute("SELECT id FROM chunks")}
+
+    def texts(self) -> Iterator[str]:
+        for (text,) in self.db.execute("SELECT text FROM chunks"):
+            yield text
+
+    def page_ids(self, url: str) -> list[int]:
+        return [row_id for (row_id,) in self.db.execute("SELECT id FROM chunks WHERE url = ? ORDER BY position", (url,))]
+
+    def _insert_rows(self, ids: Sequence[int], chunks: Sequence[ChunkType], positions: Sequence[int]) -> None:
+        self.db.executemany(
+            "INSERT OR REPLACE INTO chunks (id, url, position, title, section, content_type, text) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    row_id,
+                    chunk["metadata"]["url"],
+                    position,
+                    chunk["metadata"].get("title"),
+                    chunk["metadata"].get("section"),
+                    chunk["metadata"].get("content_type"),
+                    chunk["text"],
+                )
+                for row_id, chunk, position in zip(ids, chunks, positions)
+            ),
+        )
+
+    def _add_vectors(self, ids: Sequence[int], vectors: np.ndarray) -> None:
+        ids = np.asarray(ids, dtype=np.int64)
+        if self.index is None and self.index_type in TRAINED_INDEX_TYPES:
+            self.untrained.append((ids, np.asarray(vectors, dtype=np.float32)))
+            return
+        with timer("index_add_seconds", {"index_type": self.index_type}):
+            if self.index is None:
+                self.index = build_index(vectors, self.index_type, self.metric, ids=ids, **self.index_kwargs)
+            else:
+                self.index.add_with_ids(prepare_vectors(vectors, self.metric), ids)
+        inc("index_vectors_added_total", len(ids))
+
+    def _train(self) -> None:
+        """Build (and train) the index over all buffered vectors."""
+        if not self.untrained:
+            return
+        ids = np.concatenate([ids for ids, _ in self.untrained])
+        vectors = np.vstack([vectors for _, vectors in self.untrained])
+        self.untrained = []
+        with timer("index_add_seconds", {"index_type": self.index_type}):
+            self.index = build_index(vectors, self.index_type, self.metric, ids=ids, **self.index_kwargs)
+        inc("index_vectors_added_total", len(ids))
+
+    def _remove_vectors(self, ids: Sequence[int]) -> None:
+        if self.untrained and ids:
+            removed = np.asarray(ids, dtype=np.int64)
+            buffered = []
+            for buffered_ids, vectors in self.untrained:
+                keep = ~np.isin(buffered_ids, removed)
+                buffered.append((buffered_ids[keep], vectors[keep]))
+            self.untrained = buffered
+        if self.index is None or not ids:
+            return
+        try:
+            self.index.remove_ids(np.asarray(ids, dtype=np.int64))
+        except RuntimeError:
+            # e.g. HNSW: the vectors stay in the graph but no longer resolve to metadata
+            self.stale += len(ids)
+
+    def build(self, chunks: Sequence[ChunkType], vectors: np.ndarray) -> None:
+        """Replace the whole store with `chunks`, retraining the index on their vectors."""
+        self.db.execute("DELETE FROM chunks")
+        self.db.execute("DELETE FROM sources")
+        self.index = None
+        self.untrained = []
+        self.stale = 0
+        by_page: dict[str, list[int]] = {}
+        for i, chunk in enumerate(chunks):
+            by_page.setdefault(chunk["metadata"]["url"], []).append(i)
+
+        ids, order = [], []
+        for url, indices in by_page.items():
+            page_chunks = [chunks[i] for i in indices]
+            ids.extend(page_chunk_ids(url, page_chunks))
+            self._insert_rows(ids[len(order) :], page_chunks, range(len(page_chunks)))
+            order.extend(indices)
+        if ids:
+            self._add_vectors(ids, np.asarray(vectors)[order])
+            self._train()
+        logging.info(f"Built vector store with {len(ids)} chunks from {len(by_page)} pages")
+
+    def _replace_page_rows(self, url: str, chunks: Sequence[ChunkType]) -> tuple[list[int], list[int], int]:
+        """
+        Point a page's rows at `chunks`, dropping the vectors of chunks it no longer has.
+
+        Returns:
+            tuple: (ids of `chunks`, positions in `chunks` that still need a vector, chunks removed).
+        """
+        new_ids = page_chunk_ids(url, chunks)
+        old_ids = set(self.page_ids(url))
+        current = set(new_ids)
+        removed = [row_id for row_id in old_ids if row_id not in current]
+        added = [i for i, row_id in enumerate(new_ids) if row_id not in old_ids]
+
+        self._remove_vectors(removed)
+        self.db.executemany("DELETE FROM chunks WHERE id = ?", ((row_id,) for row_id in removed))
+        # Re-insert every row so positions follow the page's current chunk order
+        self._insert_rows(new_ids, chunks, range(len(chunks)))
+        return new_ids, added, len(removed)
+
+    def upsert_pages(
+        self, pages: Iterable[tuple[str, Sequence[ChunkType]]], embed: Callable[[list[str]], np.ndarray]
+    ) -> tuple[int, int]:
+        """
+        Make the store hold exactly the given chunks for each (url, chunks) page.
+
+        Chunks whose id is already stored are kept as they are. The new chunks of
+        every page are passed to `embed` (e.g. EmbeddingCache.embed bound to an
+        embedder) in a single call, so batching spans pages rather than stopping
+        at each one.
+
+        Returns:
+            tuple: (chunks added, chunks removed).
+        """
+        added_ids: list[int] = []
+        added_texts: list[str] = []
+        removed = 0
+        for url, chunks in pages:
+            ids, page_added, page_removed = self._replace_page_rows(url, chunks)
+            added_ids.extend(ids[i] for i in page_added)
+            added_texts.extend(chunks[i]["text"] for i in page_added)
+            removed += page_removed
+        if added_ids:
+            self._add_vectors(added_ids, embed(added_texts))
+        return len(added_ids), removed
+
+    def upsert_page(self, url: str, chunks: Sequence[ChunkType], embed: Callable[[list[str]], np.ndarray]) -> tuple[int, int]:
+        """
+        Make the store hold exactly `chunks` for a page; see upsert_pages.
+
+        Returns:
+            tuple: (chunks added, chunks removed).
+        """
+        return self.upsert_pages([(url, chunks)], embed)
+
+    def remove_page(self, url: str) -> int:
+        """Remove every chunk of a page. Returns the number removed."""
+        ids = self.page_ids(url)
+        self._remove_vectors(ids)
+        self.db.execute("DELETE FROM chunks WHERE url = ?", (url,))
+        return len(ids)
+
+    def get(self, ids: Sequence[int]) -> dict[int, SearchHit]:
+        """Fetch metadata rows by id (ids with no row are left out)."""
+        rows: dict[int, SearchHit] = {}
+        ids = list(ids)
+        for start in range(0, len(ids), 500):  # Stay under SQLite's bound-parameter limit
+            batch = ids[start : start + 500]
+            query = (
+                "SELECT id, url, title, section, content_type, text FROM chunks "
+                f"WHERE id IN ({','.join('?' * len(batch))})"
+            )
+            for row_id, url, title, section, content_type, text in self.db.execute(query, batch):
+                rows[row_id] = {
+                    "id": row_id,
+                    "score": 0.0,
+                    "url": url,
+                    "title": title,
+                    "section": section,
+                    "content_type": content_type,
+                    "text": text,
+                    "sources": [],
+                }
+            if self.has_sources:
+                query = f"SELECT id, url, title, section FROM sources WHERE id IN ({','.join('?' * len(batch))})"
+                for row_id, url, title, section in self.db.execute(query, batch):
+                    if row_id in rows:
+                        rows[row_id]["sources"].append({"url": url, "title": title, "section": section})
+        return rows
+
+    def set_sources(self, sources: Iterable[tuple[int, str, str | None, str | None]]) -> None:
+        """Replace all back-references: (canonical chunk id, url, title, section) of each duplicate left out."""
+        self.db.execute("DELETE FROM sources")
+        self.db.executemany("INSERT INTO sources (id, url, title, section) VALUES (?, ?, ?, ?)", sources)
+
+    def _reconstruct(self, ids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Look up stored vectors by id, skipping ids not in the index. Returns (ids found, vectors)."""
+        try:
+            return ids, self.index.reconstruct_batch(ids)
+        except RuntimeError:
+            found, vectors = [], []
+            for row_id in ids:
+                try:
+                    vectors.append(self.index.reconstruct(int(row_id)))
+                    found.append(row_id)
+                except RuntimeError:
+                    pass
+            if not found:
+                return np.empty(0, dtype=np.int64), np.empty((0, self.index.d), dtype=np.float32)
+            return np.asarray(found, dtype=np.int64), np.vstack(vectors)
+
+    def _search_candidates(
+        self, queries: np.ndarray, candidates: Sequence[Sequence[int]], k: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Exact search of each query over its own candidate ids, shaped like index.search output."""
+        scores = np.full((len(queries), k), np.inf if self.metric == "l2" else -np.inf, dtype=np.float32)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        for i, (query, query_candidates) in enumerate(zip(queries, candidates)):
+            found, vectors = self._reconstruct(np.unique(np.asarray(query_candidates, dtype=np.int64)))
+            if not len(found):
+                continue
+            if self.metric == "l2":
+                distances = ((vectors - query) ** 2).sum(axis=1)
+                order = np.argsort(distances)[:k]
+            else:
+                distances = vectors @ query
+                order = np.argsort(-distances)[:k]
+            scores[i, : len(order)] = distances[order]
+            ids[i, : len(order)] = found[order]
+        return scores, ids
+
+    def search(
+        self, queries: np.ndarray, k: int = 5, candidates: Sequence[Sequence[int]] | None = None
+    ) -> list[list[SearchHit]]:
+        """
+        Search with a (n, dimension) matrix of query embeddings.
+
+        Args:
+            queries (np.ndarray): Query embeddings, one row per query.
+            k (int): Hits to return per query.
+            candidates (sequence of sequences of int | None): Per-query chunk ids to restrict the
+                search to (e.g. lexical matches); these are scored exactly against their stored
+                vectors instead of searching the whole index.
+
+        Returns:
+            list of list of SearchHit: The top `k` hits for each query, best first. Scores are
+            L2 distances for the "l2" metric and similarities for "ip" and "cosine".
+        """
+        self._train()
+        if self.index is None or self.index.ntotal == 0:
+            return [[] for _ in range(len(queries))]
+        queries = prepare_vectors(np.atleast_2d(queries), self.metric)
+        if candidates is not None:
+            scores, ids = self._search_candidates(queries, candidates, k)
+        else:
+            fetch = min(self.index.ntotal, k + self.stale)
+            scores, ids = self.index.search(queries, fetch)
+        rows = self.get({int(row_id) for row_id in ids.ravel() if row_id >= 0})
+
+        results = []
+        for query_scores, query_ids in zip(scores, ids):
+            hits: list[SearchHit] = []
+            seen: set[int] = set()
+            for score, row_id in zip(query_scores, query_ids):
+                row = rows.get(int(row_id))
+                if row is None or row_id in seen:
+                    continue  # No result, a stale vector, or a duplicate left by one
+                seen.add(row_id)
+                hits.append({**row, "score": float(score)})
+                if len(hits) == k:
+                    break
+            results.append(hits)
+        return results
+
+    def save(self) -> None:
+        """Write the index as a new generation and commit metadata with it."""
+        if self.read_only:
+            raise RuntimeError("Vector store was opened read-only")
+        self._train()
+        old_generation = self.generation
+        if self.index is not None:
+            self.generation += 1
+            save_index(self.index, self._index_path(self.generation))
+        meta = {
+            "index_type": self.index_type,
+            "metric": self.metric,
+            "generation": self.generation,
+            "stale": self.stale,
+        }
+        self.db.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", ((k, str(v)) for k, v in meta.items()))
+        self.db.commit()
+        if old_generation and old_generation != self.generation:
+            os.remove(self._index_path(old_generation))
+
+    def close(self) -> None:
+        self.db.close()
+        self.index = None
+
+
+def sync_chunk_folder(
+    folder: str,
+    store: VectorStore,
+    embed: Callable[[list[str]], np.ndarray],
+    dedupe: bool = True,
+    threshold: float = THRESHOLD,
+    cached: Callable[[str], bool] | None = None,
+) -> tuple[int, int]:
+    """
+    Bring a store in line with a folder of per-page chunk files (as written by main.load_and_chunk).
+
+    Every page's chunk ids are diffed against the store and pages with no chunk
+    file are removed, so only chunks that are new since the last sync get
+    embedded, all in one `embed` call.
+
+    With `dedupe`, exact and near-duplicate chunks across the whole folder (see
+    dedup.py) are indexed once, under the first page in filename order; every
+    other copy is recorded as a back-reference in the `sources` of that chunk.
+    Given `cached` (e.g. an EmbeddingCache's `in` test), duplicates that were
+    already embedded are not counted as tokens saved.
+
+    Returns:
+        tuple: (chunks added, chunks removed).
+    """
+    # The whole folder is held for dedupe, so keep it compact; chunk dicts are built a page at a time
+    table, pages = ChunkTable.from_folder(folder)
+
+    sources = []
+    if dedupe:
+        canonical, report = dedupe_chunks(table, threshold)
+        ids: dict[int, int] = {}  # row in table → id of the chunk as indexed
+        kept_pages = []
+        for url, rows in pages:
+            kept = [i for i in rows if canonical[i] == i]
+            ids.update(zip(kept, page_chunk_ids(url, [table[i] for i in kept])))
+            kept_pages.append((url, kept))
+        pages = kept_pages
+        embedded = 0  # tokens of duplicates embedded before dedupe could skip them
+        for i, chunk in enumerate(table):
+            if canonical[i] != i:
+                metadata = chunk["metadata"]
+                sources.append((ids[canonical[i]], metadata["url"], metadata.get("title"), metadata.get("section")))
+                if cached is not None and cached(chunk["text"]):
+                    embedded += count_tokens(chunk["text"], TOKEN_MODEL)
+        report["tokens_saved"] -= embedded
+        if embedded:
+            logging.info(f"Dedupe: {embedded} tokens of duplicate chunks had already been embedded")
+
+    # Chunk dicts are built a page at a time; the new chunks of all pages are embedded together
+    added, removed = store.upsert_pages(((url, table.to_chunks(rows)) for url, rows in pages), embed)
+
+    for url in store.urls() - {url for url, _ in pages}:
+        removed += store.remove_page(url)
+    store.set_sources(sources)
+    store.save()
+    if dedupe:
+        log_report(report, store.index.d if store.index is not None else None)
+    logging.info(f"Synced vector store with {folder}: {added} chunks added, {removed} removed, {len(store)} total")
+    return added, removed